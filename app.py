@@ -1,16 +1,35 @@
 # app.py
+import csv
+import io
 import os
-from flask import Flask, request, jsonify
+import re
+import zlib
+from datetime import timezone
+from functools import partial
+from operator import itemgetter
+from flask import Blueprint, Flask, current_app, request, jsonify, abort, Response, stream_with_context
 from marshmallow.exceptions import ValidationError
-from flasgger import Swagger # Importar Swagger
+from sqlalchemy import insert, update, delete, select, func, table, column, literal_column
+from sqlalchemy.exc import IntegrityError
+from werkzeug.local import LocalProxy
 
 # Importaciones locales
-from config import Config
-from models import db, Producto
-from schemas import ma, ProductoSchema, producto_schema, productos_schema
+from config import configuraciones
+from cache import CacheLRU
+from comandos import productos_cli
+from compresion import SUFIJOS_ETAG, CompresionRespuestas, codificacion_propia
+from especificacion import FuenteEspecificacion
+from consultas import (ParametroInvalido, aplicar_filtros, cursor_siguiente, etag_lista, leer_campos, leer_entero,
+                       leer_filtros_productos, productos_eliminados, sentencia_validadores_lista)
+from estadisticas import leer_estadisticas
+from metricas import MetricasAPI, TIPO_CONTENIDO
+from perfilado import PerfiladorPeticiones
+from serializacion import ProveedorJSONRapido, CAMPOS_PRODUCTO, COLUMNAS_PRODUCTO, fila_a_producto, proyeccion_productos
+from models import ENTERO_MAXIMO, db, Producto, configurar_pragmas_sqlite
+from schemas import MENSAJE_ID_EXISTENTE, ma, producto_schema, productos_schema, producto_nuevo_schema, producto_parcial_schema, productos_bulk_schema, productos_parciales_bulk_schema
 
-# Inicialización de la aplicación Flask
-app = Flask(__name__)
+# Las rutas de la API se registran en este blueprint, que create_app() añade a cada aplicación.
+bp = Blueprint('productos', __name__)
 
 # Configuración básica de Swagger/Flasgger
 swagger_config = {
@@ -84,24 +103,352 @@ swagger_template = {
     }
 }
 
-# Inicializar Flasgger con la aplicación, la configuración y el template
-swagger = Swagger(app, config=swagger_config, template=swagger_template)
+def _registrar_swagger(app):
+    """
+    Inicializa Flasgger. Se importa aquí para no pagar su carga cuando está
+    desactivado. Si no está instalado devuelve None.
+    """
+    try:
+        from flasgger import Swagger
+    except ImportError:
+        app.logger.warning("Flasgger no está instalado: /apidocs/ no estará disponible.")
+        return None
+    return Swagger(app, config=swagger_config, template=swagger_template)
+
+def _registrar_especificacion(app, swagger):
+    """
+    Sirve /apispec_1.json desde memoria (ver especificacion.py) en lugar de la vista
+    de Flasgger. Sin Flasgger, se sirve el archivo OPENAPI_ARCHIVO si existe.
+    """
+    spec = swagger_config["specs"][0]
+    generar = partial(swagger.get_apispecs, endpoint=spec["endpoint"]) if swagger is not None else None
+    fuente = FuenteEspecificacion(generar, app.config['OPENAPI_ARCHIVO'])
+    app.extensions['openapi'] = fuente
+    if swagger is not None:
+        app.view_functions[f"flasgger.{spec['endpoint']}"] = servir_especificacion
+    elif fuente.disponible:
+        app.add_url_rule(spec["route"], spec["endpoint"], servir_especificacion)
+
+def create_app(config=None):
+    """
+    Crea y configura la aplicación Flask.
+
+    `config` puede ser el nombre de un perfil de config.configuraciones, una clase
+    u objeto de configuración, o None para usar el perfil indicado en la variable
+    de entorno APP_CONFIG (por defecto, desarrollo).
+
+    No crea las tablas: eso es un paso explícito (`flask --app app productos init-db`),
+    para que cada worker no ejecute DDL al arrancar.
+    """
+    app = Flask(__name__)
+    # Codificación JSON más rápida (usa orjson si está instalado; ver serializacion.py).
+    app.json = ProveedorJSONRapido(app)
+
+    if config is None:
+        config = os.environ.get('APP_CONFIG', 'development')
+    if isinstance(config, str):
+        config = configuraciones[config]
+    app.config.from_object(config)
+
+    # Crear la carpeta 'instance' (donde está la base SQLite por defecto) si no existe
+    os.makedirs(app.instance_path, exist_ok=True)
+
+    # Inicializar extensiones
+    db.init_app(app)
+    ma.init_app(app)
 
-# Carga la configuración de la aplicación
-app.config.from_object(Config)
+    # Los PRAGMA deben registrarse antes de abrir la primera conexión.
+    with app.app_context():
+        configurar_pragmas_sqlite(db.engine, app.config['SQLITE_PRAGMAS'])
 
-# Crear la carpeta 'instance' si no existe
-instance_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance')
-if not os.path.exists(instance_path):
-    os.makedirs(instance_path)
+    # Caché de productos serializados para GET /productos/<id> (ver cache.py).
+    app.extensions['cache_productos'] = CacheLRU(app.config['CACHE_PRODUCTOS_TAMANO'], app.config['CACHE_PRODUCTOS_TTL'])
+
+    # Métricas de peticiones HTTP y de sentencias SQL, expuestas en GET /metrics (ver metricas.py).
+    app.extensions['metricas'] = MetricasAPI()
+    if app.config['METRICAS_HABILITADAS']:
+        app.extensions['metricas'].instrumentar_aplicacion(app)
+        with app.app_context():
+            app.extensions['metricas'].instrumentar_motor(db.engine)
+
+    # Compresión de las respuestas según Accept-Encoding, con caché de cuerpos comprimidos (ver compresion.py).
+    app.extensions['compresion'] = CompresionRespuestas.desde_configuracion(app.config)
+    if app.config['COMPRESION_HABILITADA']:
+        app.extensions['compresion'].instrumentar_aplicacion(app)
+
+    # Perfilado de las peticiones con el encabezado de administración (ver perfilado.py).
+    app.extensions['perfilado'] = PerfiladorPeticiones.desde_configuracion(app.config)
+    if app.config['PERFILADO_HABILITADO']:
+        app.extensions['perfilado'].instrumentar_aplicacion(app)
+        with app.app_context():
+            app.extensions['perfilado'].instrumentar_motor(db.engine)
+
+    # Documentación interactiva en /apidocs/ (opcional: SWAGGER_HABILITADO) y
+    # especificación OpenAPI precalculada en /apispec_1.json.
+    swagger = _registrar_swagger(app) if app.config['SWAGGER_HABILITADO'] else None
+    _registrar_especificacion(app, swagger)
+
+    app.register_blueprint(bp)
+    app.cli.add_command(productos_cli)
+    return app
+
+def __getattr__(nombre):
+    # `from app import app` (gunicorn app:app, las pruebas y los benchmarks) crea la
+    # aplicación con la configuración por defecto la primera vez que se pide, y no
+    # al importar el módulo.
+    if nombre == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+# Caché y métricas de la aplicación que atiende la petición actual.
+cache_productos = LocalProxy(lambda: current_app.extensions['cache_productos'])
+metricas = LocalProxy(lambda: current_app.extensions['metricas'])
+
+# --- Funciones auxiliares ---
+
+# Cantidad máxima de valores por cláusula IN. SQLite limita el número de parámetros
+# por sentencia, así que las listas largas de IDs se consultan en lotes.
+TAMANO_LOTE_IN = 500
+
+def _en_lotes(elementos, tamano):
+    """Divide una lista en sublistas de como máximo `tamano` elementos."""
+    for inicio in range(0, len(elementos), tamano):
+        yield elementos[inicio:inicio + tamano]
+
+def _ids_existentes(ids):
+    """Devuelve el conjunto de IDs de `ids` que existen en la tabla de productos."""
+    existentes = set()
+    for lote in _en_lotes(ids, TAMANO_LOTE_IN):
+        existentes.update(db.session.execute(select(Producto.id).where(Producto.id.in_(lote))).scalars())
+    return existentes
+
+def _conflictos_de_ids(filas):
+    """
+    Errores por índice de las filas de un alta masiva cuyo ID explícito ya existe
+    o se repite en la misma lista.
+    """
+    existentes = _ids_existentes([fila['id'] for fila in filas if fila.get('id') is not None])
+    vistos = set()
+    errores = {}
+    for indice, fila in enumerate(filas):
+        producto_id = fila.get('id')
+        if producto_id is None:
+            continue
+        if producto_id in existentes:
+            errores[indice] = {"id": [MENSAJE_ID_EXISTENTE]}
+        elif producto_id in vistos:
+            errores[indice] = {"id": ["El ID está repetido en la lista."]}
+        vistos.add(producto_id)
+    return errores
 
-# Inicializar extensiones
-db.init_app(app)
-ma.init_app(app)
+def _respuesta_ids_existentes(mensajes):
+    """409 de un alta con IDs explícitos que ya existen; `mensajes` sigue el formato de los errores de validación."""
+    return jsonify({"error": "ProductoExistente", "mensajes": mensajes}), 409
+
+def _es_entero_positivo(valor):
+    """Indica si `valor` es un entero positivo que cabe en un INTEGER de SQLite (se excluyen los booleanos)."""
+    return isinstance(valor, int) and not isinstance(valor, bool) and 0 < valor <= ENTERO_MAXIMO
+
+def _es_id_valido(valor):
+    """Un ID válido es un entero positivo (ver validar_id en schemas.py)."""
+    return _es_entero_positivo(valor)
+
+def _consulta_productos_filtrada(filtros=None):
+    """
+    Construye la consulta de GET /productos a partir de los filtros, el orden y
+    el cursor `after_id` de la query string (ver consultas.py, compartido con asgi.py).
+    """
+    if filtros is None:
+        filtros = leer_filtros_productos(request.args)
+    return aplicar_filtros(Producto.query, filtros)
+
+# Tabla virtual FTS5 creada en models.py. 'rank' es la columna oculta que FTS5
+# calcula con bm25(); ordenar por ella permite a SQLite optimizar el ranking.
+productos_fts = table('productos_fts', column('rowid'), column('rank'))
+
+def _expresion_busqueda(texto):
+    """
+    Convierte el texto libre del usuario en una expresión MATCH de FTS5 segura:
+    cada palabra se cita (para que no se interprete como operador) y se busca
+    como prefijo. Las palabras se combinan con AND implícito.
+    """
+    palabras = re.findall(r'\w+', texto)
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+def _etag_producto(producto):
+    """
+    ETag fuerte de un producto. Usa su secuencia (ver DDL_CAMBIOS en models.py), que
+    es única en todo el catálogo y cambia con cada escritura: a diferencia de la
+    versión, no se repite si el ID se elimina y se vuelve a crear.
+    """
+    return f"{producto.id}-{producto.secuencia}"
+
+def _etag_representacion(etag, campos):
+    """ETag de una representación parcial (parámetro `fields`): distinto para cada combinación de campos."""
+    return etag if campos is None else f"{etag};{','.join(campos)}"
+
+def _entrada_cache(producto, datos_serializados):
+    """Entrada de la caché de productos: el cuerpo serializado y sus validadores HTTP."""
+    return {
+        "datos": datos_serializados,
+        "etag": _etag_producto(producto),
+        "ultima_modificacion": producto.actualizado_en,
+    }
+
+def _respuesta_no_modificada(etag, ultima_modificacion):
+    """
+    Devuelve una respuesta 304 si los encabezados condicionales de la petición
+    indican que el cliente ya tiene esta versión del recurso, o None en otro caso.
+    Se evalúa antes de serializar, para que un 304 no pague ese coste.
+    If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110).
+    """
+    if request.if_none_match:
+        no_modificado = request.if_none_match.contains(etag)
+    elif request.if_modified_since and ultima_modificacion is not None:
+        # HTTP solo tiene precisión de segundos.
+        no_modificado = _fecha_http(ultima_modificacion).replace(microsecond=0) <= request.if_modified_since
+    else:
+        no_modificado = False
+    if not no_modificado:
+        return None
+    return _con_validadores(Response(status=304), etag, ultima_modificacion)
+
+def _con_validadores(respuesta, etag, ultima_modificacion):
+    """Añade ETag y Last-Modified a una respuesta."""
+    respuesta.set_etag(etag)
+    if ultima_modificacion is not None:
+        respuesta.last_modified = _fecha_http(ultima_modificacion)
+    return respuesta
+
+def _fecha_http(fecha):
+    # Las fechas se guardan en UTC sin zona horaria (ver models.ahora_utc).
+    return fecha.replace(tzinfo=timezone.utc)
+
+def _validadores_lista():
+    """
+    Calcula el ETag y Last-Modified de GET /productos sin leer ninguna fila (ver
+    consultas.sentencia_validadores_lista y consultas.etag_lista).
+    """
+    secuencia, ultima_modificacion = db.session.execute(sentencia_validadores_lista()).one()
+    etag = etag_lista(secuencia, ultima_modificacion, request.query_string.decode(), _quiere_stream())
+    return etag, ultima_modificacion
+
+def _quiere_stream():
+    """Indica si el cliente pidió el listado en modo streaming (NDJSON)."""
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    mejor = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return mejor == 'application/x-ndjson'
+
+def _generar_ndjson(consulta, proyeccion, tamano_lote):
+    """
+    Recorre la consulta en lotes de `tamano_lote` filas y emite un producto
+    serializado por línea (con los campos de `proyeccion`). Cada lote se envía
+    como un único fragmento para no generar una escritura por producto.
+    """
+    lineas = []
+    for fila in consulta.with_entities(*proyeccion.columnas).yield_per(tamano_lote):
+        lineas.append(current_app.json.dumps(proyeccion.mapeador(fila)))
+        if len(lineas) >= tamano_lote:
+            yield '\n'.join(lineas) + '\n'
+            lineas = []
+    if lineas:
+        yield '\n'.join(lineas) + '\n'
+
+def _generar_csv(consulta, tamano_lote):
+    """
+    Recorre la consulta en lotes de `tamano_lote` filas y emite el CSV de la
+    exportación: el encabezado y luego un fragmento por lote. La consulta se
+    ejecuta en la conexión (sin la carga de filas del ORM) con un cursor
+    yield_per, y cada lote se escribe con csv.writer como tuplas, sin diccionarios.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(CAMPOS_PRODUCTO)
+    sentencia = consulta.with_entities(*COLUMNAS_PRODUCTO).statement
+    resultado = db.session.connection().execute(sentencia, execution_options={"yield_per": tamano_lote})
+    for lote in resultado.partitions():
+        escritor.writerows(map(tuple, lote))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Catálogo vacío: solo el encabezado.
+        yield buffer.getvalue()
+
+def _comprimir_gzip(fragmentos, nivel):
+    """Comprime un flujo de fragmentos de texto en formato gzip a medida que se generan."""
+    # wbits=31 (16 + 15) produce el encabezado y el pie de gzip en lugar de zlib.
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for fragmento in fragmentos:
+        comprimido = compresor.compress(fragmento.encode())
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+def _leer_ids_de_consulta():
+    """
+    Lee el parámetro `ids` (IDs separados por comas) de GET /productos, o aborta
+    con 400 si no es una lista de enteros positivos de como máximo BULK_MAXIMO_ELEMENTOS.
+    """
+    try:
+        ids = [int(valor) for valor in request.args['ids'].split(',')]
+    except ValueError:
+        ids = []
+    if not ids or not all(0 < producto_id <= ENTERO_MAXIMO for producto_id in ids):
+        abort(400, description="El parámetro 'ids' debe ser una lista de IDs enteros positivos separados por comas.")
+    if len(ids) > current_app.config['BULK_MAXIMO_ELEMENTOS']:
+        abort(400, description=f"Se aceptan como máximo {current_app.config['BULK_MAXIMO_ELEMENTOS']} IDs por petición.")
+    return ids
+
+def _respuesta_por_ids(ids, campos):
+    """
+    Respuesta de GET /productos?ids= y POST /productos/ids: los productos en el
+    orden pedido (sin repetidos) y, aparte, los IDs que no existen.
+
+    Los productos que están en la caché de GET /productos/<id> se toman de ella;
+    el resto se lee con una sola consulta IN por cada TAMANO_LOTE_IN IDs, y se
+    guarda en la caché para las peticiones siguientes.
+    """
+    ids = list(dict.fromkeys(ids))
+    entradas = {}
+    faltantes = []
+    for producto_id in ids:
+        entrada = cache_productos.obtener(producto_id)
+        if entrada is None:
+            faltantes.append(producto_id)
+        else:
+            entradas[producto_id] = entrada
+
+    # Solo columnas (sin objetos del ORM): las públicas más las que forman la entrada de caché.
+    columnas = (*COLUMNAS_PRODUCTO, Producto.secuencia, Producto.actualizado_en)
+    for lote in _en_lotes(faltantes, TAMANO_LOTE_IN):
+        for fila in db.session.execute(select(*columnas).where(Producto.id.in_(lote))):
+            entrada = _entrada_cache(fila, fila_a_producto(fila))
+            cache_productos.guardar(fila.id, entrada)
+            entradas[fila.id] = entrada
+
+    productos = []
+    for producto_id in ids:
+        entrada = entradas.get(producto_id)
+        if entrada is not None:
+            datos = entrada["datos"]
+            productos.append(datos if campos is None else {campo: datos[campo] for campo in campos})
+    no_encontrados = [producto_id for producto_id in ids if producto_id not in entradas]
+    return jsonify({"productos": productos, "no_encontrados": no_encontrados}), 200
+
+@bp.url_value_preprocessor
+def _rechazar_ids_fuera_de_rango(endpoint, valores):
+    # Un <int:id> que no cabe en un INTEGER de SQLite no puede existir, y consultarlo
+    # fallaría con OverflowError: se responde 404 antes de llegar a la vista.
+    if valores and valores.get('id', 0) > ENTERO_MAXIMO:
+        abort(404)
 
 # --- Endpoints de la API (Rutas) ---
 
-@app.route('/productos', methods=['POST'])
+@bp.route('/productos', methods=['POST'])
 def crear_producto():
     """
     Crea un nuevo producto en la base de datos.
@@ -154,47 +501,623 @@ def crear_producto():
         description: Error de validación en los datos de entrada.
         schema:
           $ref: '#/definitions/ErrorValidacion'
+      409:
+        description: Ya existe un producto con el ID indicado.
+        schema:
+          $ref: '#/definitions/ErrorValidacion'
     """
     try:
-        nuevo_producto_obj = producto_schema.load(request.json, session=db.session)
+        datos = producto_nuevo_schema.load(request.json)
     except ValidationError as err:
         return jsonify({"error": "Datos de entrada inválidos", "mensajes": err.messages}), 400
 
-    if nuevo_producto_obj.precio < 0:
-        return jsonify({"error": "El precio no puede ser negativo"}), 400 # Podría ser un esquema ErrorRespuesta
-    if nuevo_producto_obj.stock < 0:
-        return jsonify({"error": "El stock no puede ser negativo"}), 400 # Podría ser un esquema ErrorRespuesta
-    
+    if datos.get('id') is not None and _ids_existentes([datos['id']]):
+        return _respuesta_ids_existentes({"id": [MENSAJE_ID_EXISTENTE]})
+
+    nuevo_producto_obj = Producto(**datos)
     db.session.add(nuevo_producto_obj)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otra petición creó el mismo ID entre la comprobación y el INSERT.
+        db.session.rollback()
+        return _respuesta_ids_existentes({"id": [MENSAJE_ID_EXISTENTE]})
 
     datos_serializados = producto_schema.dump(nuevo_producto_obj)
+    # Un producto recién creado suele consultarse enseguida: se guarda ya serializado.
+    cache_productos.guardar(nuevo_producto_obj.id, _entrada_cache(nuevo_producto_obj, datos_serializados))
     return jsonify(datos_serializados), 201
 
-@app.route('/productos', methods=['GET'])
+@bp.route('/productos/bulk', methods=['POST'])
+def crear_productos_bulk():
+    """
+    Crea varios productos en una única transacción.
+    ---
+    tags:
+      - Productos
+    summary: Crea productos de forma masiva.
+    description: >
+      Recibe una lista de productos, los valida todos y los inserta con una sola
+      sentencia INSERT y un único commit. La operación es atómica: si algún
+      elemento es inválido no se crea ninguno y se devuelven los errores
+      indexados por la posición del elemento en la lista.
+    consumes:
+      - application/json
+    produces:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: Lista de productos a crear.
+        schema:
+          type: array
+          items:
+            $ref: '#/definitions/Producto'
+    responses:
+      201:
+        description: Productos creados. Devuelve la cantidad y los IDs asignados, en el orden recibido.
+        schema:
+          type: object
+          properties:
+            creados:
+              type: integer
+              example: 2
+            ids:
+              type: array
+              items:
+                type: integer
+      400:
+        description: Error de validación; `mensajes` contiene los errores por índice de elemento.
+        schema:
+          $ref: '#/definitions/ErrorValidacion'
+      409:
+        description: >
+          Algún elemento trae un ID que ya existe o que se repite en la lista; `mensajes`
+          contiene los errores por índice de elemento y no se crea ninguno.
+        schema:
+          $ref: '#/definitions/ErrorValidacion'
+    """
+    datos_json = request.json
+    if not isinstance(datos_json, list) or not datos_json:
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": {"_schema": ["Se esperaba una lista no vacía de productos."]}}), 400
+    if len(datos_json) > current_app.config['BULK_MAXIMO_ELEMENTOS']:
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": {"_schema": [f"Se aceptan como máximo {current_app.config['BULK_MAXIMO_ELEMENTOS']} productos por petición."]}}), 400
+
+    # El esquema aplica las mismas reglas que en crear_producto y acumula los errores por elemento.
+    try:
+        filas = productos_bulk_schema.load(datos_json)
+    except ValidationError as err:
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": err.messages}), 400
+
+    # INSERT de varias filas con RETURNING: una sola ida a la base de datos por lote
+    # y un único commit (un solo fsync) para toda la carga. Con SQLite, pedir el
+    # RETURNING en el orden de los parámetros (sort_by_parameter_order) hace que
+    # SQLAlchemy inserte fila por fila; pero SQLite asigna los IDs autoincrementales
+    # en el orden de las filas, así que ordenarlos da el mismo resultado. Solo si
+    # el cuerpo trae IDs explícitos hace falta el orden de SQLAlchemy.
+    con_ids_explicitos = any(fila.get('id') is not None for fila in filas)
+    if con_ids_explicitos:
+        conflictos = _conflictos_de_ids(filas)
+        if conflictos:
+            return _respuesta_ids_existentes(conflictos)
+    try:
+        ids = db.session.execute(
+            insert(Producto).returning(Producto.id, sort_by_parameter_order=con_ids_explicitos),
+            filas
+        ).scalars().all()
+        db.session.commit()
+    except IntegrityError:
+        # Otra petición creó alguno de los IDs después de la comprobación, o un ID
+        # explícito coincide con el asignado a un elemento anterior sin ID.
+        db.session.rollback()
+        return _respuesta_ids_existentes(_conflictos_de_ids(filas) or {
+            "_schema": ["Algún ID explícito coincide con el asignado a otro elemento de la lista."]})
+    if not con_ids_explicitos:
+        ids.sort()
+
+    # No se precarga la caché con cargas masivas (desalojaría los productos más
+    # consultados), pero se descarta cualquier entrada previa de esos IDs.
+    for producto_id in ids:
+        cache_productos.invalidar(producto_id)
+
+    return jsonify({"creados": len(ids), "ids": ids}), 201
+
+@bp.route('/productos', methods=['GET'])
 def obtener_productos():
     """
-    Obtiene una lista de todos los productos.
+    Obtiene una lista de productos, opcionalmente paginada por cursor.
     ---
     tags:
       - Productos
-    summary: Obtiene todos los productos.
-    description: Devuelve una lista de todos los productos almacenados.
+    summary: Obtiene productos (lista completa o paginada).
+    description: >
+      Sin parámetros devuelve la lista completa de productos. Con `ids=1,2,3`
+      devuelve esos productos (en el mismo orden) y la lista de IDs inexistentes
+      en `no_encontrados`; para listas largas existe POST /productos/ids. Si se indica `limit`
+      o `after_id`, devuelve una página junto con `next_cursor`, que debe enviarse
+      como `after_id` para obtener la página siguiente. Con el orden por ID el
+      cursor es el ID del último producto; con otro `sort` es un texto opaco con
+      el valor de orden y el ID del último producto, válido solo para ese `sort`.
+      La paginación es por cursor (keyset), por lo que el coste de cada página no
+      depende del tamaño de la tabla. Con `stream=1` o `Accept: application/x-ndjson`
+      la lista completa se transmite en NDJSON (un producto por línea) a medida
+      que se lee de la base de datos. Los filtros (`precio_min`, `precio_max`,
+      `stock_lt`, `nombre_prefix`) y el orden (`sort`) se aplican en la base de
+      datos usando índices, y se combinan con cualquiera de los modos anteriores.
     produces:
       - application/json
+      - application/x-ndjson
+    parameters:
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        description: Cantidad máxima de productos por página.
+      - name: after_id
+        in: query
+        required: false
+        type: string
+        description: >
+          Cursor: el `next_cursor` de la página anterior (0 para la primera). Con el
+          orden por ID, devuelve solo productos con ID mayor a este valor.
+      - name: stream
+        in: query
+        required: false
+        type: integer
+        enum: [0, 1]
+        description: Si vale 1, transmite la lista completa en formato NDJSON.
+      - name: precio_min
+        in: query
+        required: false
+        type: number
+        description: Devuelve solo productos con precio mayor o igual a este valor.
+      - name: precio_max
+        in: query
+        required: false
+        type: number
+        description: Devuelve solo productos con precio menor o igual a este valor.
+      - name: stock_lt
+        in: query
+        required: false
+        type: integer
+        description: Devuelve solo productos con stock estrictamente menor a este valor.
+      - name: nombre_prefix
+        in: query
+        required: false
+        type: string
+        description: Devuelve solo productos cuyo nombre empieza por este texto (distingue mayúsculas).
+      - name: sort
+        in: query
+        required: false
+        type: string
+        enum: [id, -id, nombre, -nombre, precio, -precio, stock, -stock]
+        description: Campo de ordenamiento; el prefijo '-' indica orden descendente. Por defecto 'id'.
+      - name: fields
+        in: query
+        required: false
+        type: string
+        description: >
+          Campos a devolver, separados por comas (por ejemplo 'id,nombre,precio').
+          Solo esas columnas se leen de la base de datos. Por defecto, todos.
+      - name: ids
+        in: query
+        required: false
+        type: string
+        description: >
+          IDs separados por comas (por ejemplo '1,2,3'). Devuelve un objeto con
+          `productos` y `no_encontrados`, y se ignoran la paginación y los filtros.
     responses:
       200:
-        description: Una lista de productos.
+        description: Una lista de productos, o una página de productos con su cursor.
         schema:
           type: array
           items:
             $ref: '#/definitions/Producto' 
+      304:
+        description: La lista no cambió respecto de la versión indicada en If-None-Match o If-Modified-Since.
+      400:
+        description: Parámetros de paginación, filtrado u ordenamiento inválidos.
+        schema:
+          $ref: '#/definitions/ErrorRespuesta'
     """
-    todos_los_productos = Producto.query.all() # Considerar paginación para APIs grandes
-    resultado = productos_schema.dump(todos_los_productos)
-    return jsonify(resultado), 200
+    if 'ids' in request.args:
+        return _respuesta_por_ids(_leer_ids_de_consulta(), leer_campos(request.args))
+
+    filtros = leer_filtros_productos(request.args)
+    consulta = _consulta_productos_filtrada(filtros)
+    # Con `fields` solo se seleccionan y serializan esas columnas. El ETag de la
+    # lista ya distingue la representación, porque incluye la query string.
+    proyeccion = proyeccion_productos(leer_campos(request.args) or CAMPOS_PRODUCTO, filtros.columna.key)
+
+    etag, ultima_modificacion = _validadores_lista()
+    no_modificada = _respuesta_no_modificada(etag, ultima_modificacion)
+    if no_modificada is not None:
+        return no_modificada
+
+    if _quiere_stream():
+        generador = _generar_ndjson(consulta, proyeccion, current_app.config['STREAM_TAMANO_LOTE'])
+        respuesta = Response(stream_with_context(generador), status=200, mimetype='application/x-ndjson')
+        return _con_validadores(respuesta, etag, ultima_modificacion)
+
+    # Ruta rápida de lectura: se seleccionan solo las columnas pedidas como tuplas
+    # (sin construir objetos del ORM) y se convierten con el mapeador precompilado,
+    # que produce los mismos diccionarios que ProductoSchema(only=...).dump().
+    consulta = consulta.with_entities(*proyeccion.columnas)
+    mapeador = proyeccion.mapeador
 
-@app.route('/productos/<int:id>', methods=['GET'])
+    if 'limit' not in request.args and 'after_id' not in request.args:
+        resultado = [mapeador(fila) for fila in consulta]
+        return _con_validadores(jsonify(resultado), etag, ultima_modificacion), 200
+
+    limite = leer_entero(request.args, 'limit', current_app.config['PAGINACION_LIMITE_POR_DEFECTO'], minimo=1)
+    limite = min(limite, current_app.config['PAGINACION_LIMITE_MAXIMO'])
+
+    # Se pide un elemento de más para saber si existe una página siguiente
+    # sin necesidad de un COUNT(*) sobre toda la tabla.
+    filas = consulta.limit(limite + 1).all()
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    productos = [mapeador(fila) for fila in filas]
+    # El id y el valor de orden del cursor salen de la fila, porque pueden no estar
+    # entre los campos pedidos.
+    next_cursor = None
+    if hay_mas:
+        next_cursor = cursor_siguiente(filtros, filas[-1][proyeccion.posicion_orden], filas[-1][proyeccion.posicion_id])
+
+    respuesta = jsonify({
+        "productos": productos,
+        "next_cursor": next_cursor
+    })
+    return _con_validadores(respuesta, etag, ultima_modificacion), 200
+
+@bp.route('/productos/ids', methods=['POST'])
+def obtener_productos_por_ids():
+    """
+    Obtiene varios productos por sus IDs en una sola petición.
+    ---
+    tags:
+      - Productos
+    summary: Obtiene productos por una lista de IDs.
+    description: >
+      Variante de GET /productos?ids= para listas largas. Devuelve los productos en
+      el orden pedido (sin repetidos) y, aparte, los IDs que no existen. Los
+      productos en la caché de GET /productos/<id> no se vuelven a leer; el resto se
+      lee con una consulta IN por lote. Admite `fields` en la query string.
+    consumes:
+      - application/json
+    produces:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - ids
+          properties:
+            ids:
+              type: array
+              items:
+                type: integer
+              example: [1, 2, 3]
+      - name: fields
+        in: query
+        required: false
+        type: string
+        description: Campos a devolver, separados por comas. Por defecto, todos.
+    responses:
+      200:
+        description: Productos encontrados e IDs inexistentes.
+        schema:
+          type: object
+          properties:
+            productos:
+              type: array
+              items:
+                $ref: '#/definitions/Producto'
+            no_encontrados:
+              type: array
+              items:
+                type: integer
+      400:
+        description: Cuerpo de la solicitud inválido.
+        schema:
+          $ref: '#/definitions/ErrorValidacion'
+    """
+    datos_json = request.json
+    ids = datos_json.get('ids') if isinstance(datos_json, dict) else None
+    if not isinstance(ids, list) or not ids or not all(_es_id_valido(valor) for valor in ids):
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": {"ids": ["Se esperaba una lista no vacía de IDs enteros positivos."]}}), 400
+    if len(ids) > current_app.config['BULK_MAXIMO_ELEMENTOS']:
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": {"ids": [f"Se aceptan como máximo {current_app.config['BULK_MAXIMO_ELEMENTOS']} IDs por petición."]}}), 400
+    return _respuesta_por_ids(ids, leer_campos(request.args))
+
+@bp.route('/productos/export', methods=['GET'])
+@codificacion_propia
+def exportar_productos():
+    """
+    Exporta el catálogo completo en CSV.
+    ---
+    tags:
+      - Productos
+    summary: Exporta los productos en CSV (streaming).
+    description: >
+      Transmite los productos en CSV a medida que se leen de la base de datos,
+      en lotes de `STREAM_TAMANO_LOTE` filas, sin armar el resultado completo en
+      memoria. La primera línea es el encabezado (id, nombre, descripcion, precio,
+      stock). Si el cliente envía `Accept-Encoding: gzip`, el CSV se comprime con
+      gzip mientras se transmite. Acepta los mismos filtros y orden que GET /productos.
+    produces:
+      - text/csv
+    parameters:
+      - name: format
+        in: query
+        required: false
+        type: string
+        enum: [csv]
+        description: Formato de la exportación. Por defecto 'csv'.
+      - name: precio_min
+        in: query
+        required: false
+        type: number
+      - name: precio_max
+        in: query
+        required: false
+        type: number
+      - name: stock_lt
+        in: query
+        required: false
+        type: integer
+      - name: nombre_prefix
+        in: query
+        required: false
+        type: string
+      - name: sort
+        in: query
+        required: false
+        type: string
+        enum: [id, -id, nombre, -nombre, precio, -precio, stock, -stock]
+    responses:
+      200:
+        description: Archivo CSV con los productos.
+      304:
+        description: El catálogo no cambió respecto de la versión indicada en If-None-Match o If-Modified-Since.
+      400:
+        description: Formato, filtros u orden inválidos.
+        schema:
+          $ref: '#/definitions/ErrorRespuesta'
+    """
+    formato = request.args.get('format', 'csv')
+    if formato != 'csv':
+        abort(400, description="El parámetro 'format' debe ser 'csv'.")
+    consulta = _consulta_productos_filtrada()
+
+    usar_gzip = request.accept_encodings['gzip'] > 0
+    etag, ultima_modificacion = _validadores_lista()
+    # Cada codificación es una representación distinta, con su propio ETag.
+    etag += f"-{SUFIJOS_ETAG['gzip']}" if usar_gzip else ''
+    respuesta = _respuesta_no_modificada(etag, ultima_modificacion)
+    if respuesta is None:
+        generador = _generar_csv(consulta, current_app.config['STREAM_TAMANO_LOTE'])
+        if usar_gzip:
+            generador = _comprimir_gzip(generador, current_app.config['EXPORTACION_NIVEL_GZIP'])
+        respuesta = Response(stream_with_context(generador), status=200, mimetype='text/csv')
+        respuesta.headers['Content-Disposition'] = 'attachment; filename=productos.csv'
+        if usar_gzip:
+            respuesta.content_encoding = 'gzip'
+        _con_validadores(respuesta, etag, ultima_modificacion)
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
+
+@bp.route('/productos/search', methods=['GET'])
+def buscar_productos():
+    """
+    Busca productos por texto en su nombre y descripción.
+    ---
+    tags:
+      - Productos
+    summary: Búsqueda de texto completo.
+    description: >
+      Busca las palabras de `q` (como prefijos, sin distinguir mayúsculas ni acentos)
+      en el nombre y la descripción de los productos, usando un índice FTS5.
+      Los resultados se ordenan por relevancia (bm25) y se paginan con `limit` y
+      `offset`; `next_offset` indica el desplazamiento de la página siguiente.
+    produces:
+      - application/json
+    parameters:
+      - name: q
+        in: query
+        required: true
+        type: string
+        description: Texto a buscar.
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        description: Cantidad máxima de resultados por página.
+      - name: offset
+        in: query
+        required: false
+        type: integer
+        description: Cantidad de resultados a saltar.
+    responses:
+      200:
+        description: Página de productos ordenados por relevancia.
+        schema:
+          type: object
+          properties:
+            productos:
+              type: array
+              items:
+                $ref: '#/definitions/Producto'
+            next_offset:
+              type: integer
+      400:
+        description: Falta el texto de búsqueda o los parámetros son inválidos.
+        schema:
+          $ref: '#/definitions/ErrorRespuesta'
+    """
+    expresion = _expresion_busqueda(request.args.get('q', ''))
+    if not expresion:
+        abort(400, description="El parámetro 'q' debe contener al menos una palabra.")
+    limite = leer_entero(request.args, 'limit', current_app.config['BUSQUEDA_LIMITE_POR_DEFECTO'], minimo=1)
+    limite = min(limite, current_app.config['PAGINACION_LIMITE_MAXIMO'])
+    desplazamiento = leer_entero(request.args, 'offset', 0, minimo=0)
+
+    consulta = (
+        select(Producto)
+        .join(productos_fts, productos_fts.c.rowid == Producto.id)
+        .where(literal_column('productos_fts').op('MATCH')(expresion))
+        .order_by(productos_fts.c.rank)
+        .limit(limite + 1)
+        .offset(desplazamiento)
+    )
+    productos = db.session.execute(consulta).scalars().all()
+    hay_mas = len(productos) > limite
+    productos = productos[:limite]
+
+    return jsonify({
+        "productos": productos_schema.dump(productos),
+        "next_offset": desplazamiento + limite if hay_mas else None
+    }), 200
+
+@bp.route('/productos/cambios', methods=['GET'])
+def obtener_cambios():
+    """
+    Devuelve los cambios del catálogo posteriores a una secuencia.
+    ---
+    tags:
+      - Productos
+    summary: Cambios (altas, modificaciones y bajas) desde una secuencia, para sincronización incremental.
+    description: >
+      Cada escritura de un producto le asigna la siguiente secuencia del catálogo y
+      cada baja deja una lápida con la suya. Esta ruta devuelve, ordenados por
+      secuencia, los productos escritos (`upsert`, con su estado actual) y los IDs
+      eliminados (`delete`) después de `since`. Un producto modificado varias veces
+      aparece una sola vez, con su última secuencia. El cliente guarda
+      `ultima_secuencia` y la envía como `since` en la siguiente llamada; mientras
+      `hay_mas` sea true, hay más cambios que pedir. Con `since=0` se obtiene el
+      catálogo completo. El costo depende de la cantidad de cambios, no del tamaño
+      del catálogo.
+    produces:
+      - application/json
+    parameters:
+      - name: since
+        in: query
+        required: false
+        type: integer
+        description: Última secuencia que el cliente ya tiene. Por defecto 0.
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        description: Cantidad máxima de cambios por respuesta.
+    responses:
+      200:
+        description: Cambios posteriores a `since`, ordenados por secuencia.
+        schema:
+          type: object
+          properties:
+            cambios:
+              type: array
+              items:
+                type: object
+                properties:
+                  secuencia:
+                    type: integer
+                  tipo:
+                    type: string
+                    enum: [upsert, delete]
+                  producto:
+                    $ref: '#/definitions/Producto'
+                  id:
+                    type: integer
+                    description: ID del producto eliminado (solo en los cambios 'delete').
+            ultima_secuencia:
+              type: integer
+            hay_mas:
+              type: boolean
+      400:
+        description: Parámetros inválidos.
+        schema:
+          $ref: '#/definitions/ErrorRespuesta'
+    """
+    desde = leer_entero(request.args, 'since', 0, minimo=0)
+    limite = leer_entero(request.args, 'limit', current_app.config['PAGINACION_LIMITE_POR_DEFECTO'], minimo=1)
+    limite = min(limite, current_app.config['PAGINACION_LIMITE_MAXIMO'])
+
+    # Las dos consultas usan el índice de secuencia y leen a lo sumo limite + 1 filas
+    # cada una; el elemento de más indica si hay otra página.
+    escritos = db.session.execute(
+        select(Producto.secuencia, *COLUMNAS_PRODUCTO)
+        .where(Producto.secuencia > desde).order_by(Producto.secuencia).limit(limite + 1)
+    ).all()
+    eliminados = db.session.execute(
+        select(productos_eliminados.c.secuencia, productos_eliminados.c.id)
+        .where(productos_eliminados.c.secuencia > desde).order_by(productos_eliminados.c.secuencia).limit(limite + 1)
+    ).all()
+
+    cambios = [
+        {"secuencia": fila[0], "tipo": "upsert", "producto": fila_a_producto(fila[1:])} for fila in escritos
+    ] + [
+        {"secuencia": secuencia, "tipo": "delete", "id": id_eliminado} for secuencia, id_eliminado in eliminados
+    ]
+    cambios.sort(key=itemgetter("secuencia"))
+    hay_mas = len(cambios) > limite
+    cambios = cambios[:limite]
+
+    return jsonify({
+        "cambios": cambios,
+        "ultima_secuencia": cambios[-1]["secuencia"] if cambios else desde,
+        "hay_mas": hay_mas,
+    }), 200
+
+@bp.route('/productos/estadisticas', methods=['GET'])
+def obtener_estadisticas_inventario():
+    """
+    Devuelve estadísticas del inventario.
+    ---
+    tags:
+      - Productos
+    summary: Valor del inventario, cantidad de productos y distribución de precios.
+    description: >
+      Se leen de tablas de agregados que los triggers de la base de datos actualizan
+      en cada alta, modificación o baja, por lo que no se recorre la tabla de productos.
+      Cada rango de `distribucion_precios` incluye su límite inferior y excluye el
+      superior (null en el último rango).
+    produces:
+      - application/json
+    responses:
+      200:
+        description: Estadísticas del inventario.
+        schema:
+          type: object
+          properties:
+            cantidad_productos:
+              type: integer
+            valor_inventario:
+              type: number
+              description: Suma de precio * stock de todos los productos.
+            sin_stock:
+              type: integer
+              description: Productos con stock 0.
+            distribucion_precios:
+              type: array
+              items:
+                type: object
+                properties:
+                  limite_inferior:
+                    type: number
+                  limite_superior:
+                    type: number
+                  cantidad:
+                    type: integer
+    """
+    return jsonify(leer_estadisticas(db.session)), 200
+
+@bp.route('/productos/<int:id>', methods=['GET'])
 def obtener_producto(id):
     """
     Obtiene un producto específico por su ID.
@@ -212,26 +1135,57 @@ def obtener_producto(id):
         required: true
         type: integer
         format: int64 
+      - name: fields
+        in: query
+        required: false
+        type: string
+        description: Campos a devolver, separados por comas (por ejemplo 'id,nombre,precio'). Por defecto, todos.
     responses:
       200:
-        description: Detalles del producto encontrado.
+        description: Detalles del producto encontrado. Incluye los encabezados ETag y Last-Modified.
         schema:
           $ref: '#/definitions/Producto'
+      304:
+        description: El producto no cambió respecto de la versión indicada en If-None-Match o If-Modified-Since.
+      400:
+        description: El parámetro 'fields' incluye campos desconocidos.
+        schema:
+          $ref: '#/definitions/ErrorRespuesta'
       404:
         description: Producto no encontrado.
         schema:
           # Usando el esquema de error genérico que definimos
           $ref: '#/definitions/ErrorRespuesta' 
     """
-    producto = db.session.get(Producto, id)
-    if not producto:
-        # Para que coincida con el esquema ErrorRespuesta del manejador global
-        return jsonify({"error": "RecursoNoEncontrado", "mensaje": "Producto no encontrado."}), 404
-    
-    datos_serializados = producto_schema.dump(producto)
-    return jsonify(datos_serializados), 200
+    campos = leer_campos(request.args)
+    entrada = cache_productos.obtener(id)
+    if entrada is None:
+        producto = db.session.get(Producto, id)
+        if not producto:
+            # Para que coincida con el esquema ErrorRespuesta del manejador global
+            return jsonify({"error": "RecursoNoEncontrado", "mensaje": "Producto no encontrado."}), 404
+
+        no_modificado = _respuesta_no_modificada(_etag_representacion(_etag_producto(producto), campos),
+                                                 producto.actualizado_en)
+        if no_modificado is not None:
+            return no_modificado
+
+        # La caché guarda siempre la representación completa; los campos pedidos se toman de ella.
+        entrada = _entrada_cache(producto, producto_schema.dump(producto))
+        cache_productos.guardar(id, entrada)
+    else:
+        no_modificado = _respuesta_no_modificada(_etag_representacion(entrada["etag"], campos),
+                                                 entrada["ultima_modificacion"])
+        if no_modificado is not None:
+            return no_modificado
+
+    datos = entrada["datos"]
+    if campos is not None:
+        datos = {campo: datos[campo] for campo in campos}
+    respuesta = jsonify(datos)
+    return _con_validadores(respuesta, _etag_representacion(entrada["etag"], campos), entrada["ultima_modificacion"]), 200
 
-@app.route('/productos/<int:id>', methods=['PUT'])
+@bp.route('/productos/<int:id>', methods=['PUT'])
 def actualizar_producto(id):
     """
     Actualiza un producto existente por su ID.
@@ -241,7 +1195,10 @@ def actualizar_producto(id):
     tags:
       - Productos
     summary: Actualiza un producto existente.
-    description: Actualiza los detalles de un producto existente identificado por su ID. Solo los campos incluidos en el cuerpo de la solicitud serán modificados.
+    description: >
+      Actualiza los detalles de un producto existente identificado por su ID. Solo los
+      campos incluidos en el cuerpo de la solicitud serán modificados. Se valida igual
+      que POST /productos.
     consumes:
       - application/json
     produces:
@@ -287,7 +1244,7 @@ def actualizar_producto(id):
       400:
         description: Error de validación en los datos de entrada o datos inválidos.
         schema:
-          $ref: '#/definitions/ErrorValidacion' # O ErrorRespuesta si es un error de lógica de negocio
+          $ref: '#/definitions/ErrorValidacion'
       404:
         description: Producto no encontrado.
         schema:
@@ -298,41 +1255,19 @@ def actualizar_producto(id):
         return jsonify({"error": "RecursoNoEncontrado", "mensaje": "Producto no encontrado para actualizar."}), 404
 
     try:
-        datos_json = request.json
-        schema_validador_parcial = ProductoSchema(
-            partial=True, 
-            session=db.session, 
-            unknown='EXCLUDE' 
-        )
-        try:
-            schema_validador_parcial.load(datos_json) 
-        except ValidationError as err:
-            return jsonify({"error": "Datos de entrada inválidos", "mensajes": err.messages}), 400
-
-        if 'nombre' in datos_json:
-            producto_existente.nombre = datos_json['nombre']
-        if 'descripcion' in datos_json: 
-            producto_existente.descripcion = datos_json.get('descripcion') 
-        if 'precio' in datos_json:
-            precio_actualizado = datos_json['precio']
-            if not isinstance(precio_actualizado, (int, float)) or precio_actualizado < 0:
-                return jsonify({"error": "ValorInválido", "mensaje": "El precio debe ser un número no negativo"}), 400
-            producto_existente.precio = precio_actualizado
-        if 'stock' in datos_json:
-            stock_actualizado = datos_json['stock']
-            if not isinstance(stock_actualizado, int) or stock_actualizado < 0:
-                return jsonify({"error": "ValorInválido", "mensaje": "El stock debe ser un entero no negativo"}), 400
-            producto_existente.stock = stock_actualizado
-            
-    except Exception as e: 
-        app.logger.error(f"Error inesperado al actualizar producto ID {id}: {str(e)}")
-        return jsonify({"error": "ErrorInternoDelServidor", "mensaje": "Ocurrió un error inesperado al actualizar el producto."}), 500
-    
+        cambios = producto_parcial_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": err.messages}), 400
+
+    for campo, valor in cambios.items():
+        setattr(producto_existente, campo, valor)
+
     db.session.commit()
+    cache_productos.invalidar(id)
     datos_serializados = producto_schema.dump(producto_existente)
     return jsonify(datos_serializados), 200
 
-@app.route('/productos/<int:id>', methods=['DELETE'])
+@bp.route('/productos/<int:id>', methods=['DELETE'])
 def eliminar_producto(id):
     """
     Elimina un producto específico por su ID.
@@ -370,30 +1305,454 @@ def eliminar_producto(id):
 
     db.session.delete(producto_a_eliminar)
     db.session.commit()
+    cache_productos.invalidar(id)
     return jsonify({"mensaje": "Producto eliminado correctamente"}), 200
 
+@bp.route('/productos/bulk', methods=['PATCH'])
+def actualizar_productos_bulk():
+    """
+    Actualiza parcialmente varios productos en una única transacción.
+    ---
+    tags:
+      - Productos
+    summary: Actualiza productos de forma masiva.
+    description: >
+      Recibe una lista de actualizaciones parciales, cada una con el `id` del
+      producto y los campos a modificar. Se aplican las mismas reglas de validación
+      que en PUT /productos/{id}. Si algún elemento es inválido no se modifica
+      ningún producto. Las actualizaciones se ejecutan como sentencias UPDATE por
+      clave primaria en una sola transacción, y se devuelve el resultado por ID.
+    consumes:
+      - application/json
+    produces:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: Lista de actualizaciones parciales.
+        schema:
+          type: array
+          items:
+            type: object
+            required:
+              - id
+            properties:
+              id:
+                type: integer
+                example: 1
+              nombre:
+                type: string
+              descripcion:
+                type: string
+              precio:
+                type: number
+                format: float
+                example: 1300.00
+              stock:
+                type: integer
+                example: 35
+    responses:
+      200:
+        description: Resultado por ID (`actualizado`, `sin_cambios` o `no_encontrado`).
+        schema:
+          type: object
+          properties:
+            resultados:
+              type: object
+              example: {"1": "actualizado", "99": "no_encontrado"}
+      400:
+        description: Error de validación; `mensajes` contiene los errores por índice de elemento.
+        schema:
+          $ref: '#/definitions/ErrorValidacion'
+      409:
+        description: >
+          Algún elemento trae un ID que ya existe o que se repite en la lista; `mensajes`
+          contiene los errores por índice de elemento y no se crea ninguno.
+        schema:
+          $ref: '#/definitions/ErrorValidacion'
+    """
+    datos_json = request.json
+    if not isinstance(datos_json, list) or not datos_json:
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": {"_schema": ["Se esperaba una lista no vacía de actualizaciones."]}}), 400
+    if len(datos_json) > current_app.config['BULK_MAXIMO_ELEMENTOS']:
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": {"_schema": [f"Se aceptan como máximo {current_app.config['BULK_MAXIMO_ELEMENTOS']} productos por petición."]}}), 400
+
+    try:
+        filas = productos_parciales_bulk_schema.load(datos_json)
+        errores = {}
+    except ValidationError as err:
+        filas = err.valid_data
+        errores = err.messages
+
+    ids_vistos = set()
+    for indice, item in enumerate(datos_json):
+        if not isinstance(item, dict):
+            continue
+        errores_item = {}
+        if not _es_id_valido(item.get('id')):
+            errores_item['id'] = ["Se requiere un ID entero positivo."]
+        elif item['id'] in ids_vistos:
+            errores_item['id'] = ["El ID está repetido en la petición."]
+        else:
+            ids_vistos.add(item['id'])
+        for campo, mensajes in errores_item.items():
+            errores.setdefault(indice, {}).setdefault(campo, []).extend(mensajes)
+
+    if errores:
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": errores}), 400
+
+    existentes = _ids_existentes([fila['id'] for fila in filas])
+    resultados = {}
+    cambios = []
+    for fila in filas:
+        if fila['id'] not in existentes:
+            resultados[fila['id']] = "no_encontrado"
+        elif len(fila) == 1:
+            resultados[fila['id']] = "sin_cambios"
+        else:
+            resultados[fila['id']] = "actualizado"
+            cambios.append(fila)
+
+    if cambios:
+        # UPDATE masivo por clave primaria: SQLAlchemy agrupa las filas con los
+        # mismos campos y las envía con executemany dentro de la misma transacción.
+        db.session.execute(update(Producto), cambios)
+    db.session.commit()
+    for fila in cambios:
+        cache_productos.invalidar(fila['id'])
+
+    return jsonify({"resultados": resultados}), 200
+
+@bp.route('/productos/bulk', methods=['DELETE'])
+def eliminar_productos_bulk():
+    """
+    Elimina varios productos en una única transacción.
+    ---
+    tags:
+      - Productos
+    summary: Elimina productos de forma masiva.
+    description: >
+      Recibe una lista de IDs y los elimina con sentencias DELETE ... WHERE id IN (...)
+      en una sola transacción. Devuelve el resultado por ID.
+    consumes:
+      - application/json
+    produces:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - ids
+          properties:
+            ids:
+              type: array
+              items:
+                type: integer
+              example: [1, 2, 3]
+    responses:
+      200:
+        description: Resultado por ID (`eliminado` o `no_encontrado`).
+        schema:
+          type: object
+          properties:
+            resultados:
+              type: object
+              example: {"1": "eliminado", "99": "no_encontrado"}
+      400:
+        description: Cuerpo de la solicitud inválido.
+        schema:
+          $ref: '#/definitions/ErrorValidacion'
+    """
+    datos_json = request.json
+    ids = datos_json.get('ids') if isinstance(datos_json, dict) else None
+    if not isinstance(ids, list) or not ids or not all(_es_id_valido(valor) for valor in ids):
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": {"ids": ["Se esperaba una lista no vacía de IDs enteros positivos."]}}), 400
+    if len(ids) > current_app.config['BULK_MAXIMO_ELEMENTOS']:
+        return jsonify({"error": "Datos de entrada inválidos", "mensajes": {"ids": [f"Se aceptan como máximo {current_app.config['BULK_MAXIMO_ELEMENTOS']} IDs por petición."]}}), 400
+
+    ids = list(dict.fromkeys(ids))
+    existentes = _ids_existentes(ids)
+    for lote in _en_lotes([producto_id for producto_id in ids if producto_id in existentes], TAMANO_LOTE_IN):
+        db.session.execute(
+            delete(Producto).where(Producto.id.in_(lote)),
+            execution_options={"synchronize_session": False}
+        )
+    db.session.commit()
+    for producto_id in existentes:
+        cache_productos.invalidar(producto_id)
+
+    resultados = {producto_id: ("eliminado" if producto_id in existentes else "no_encontrado") for producto_id in ids}
+    return jsonify({"resultados": resultados}), 200
+
+def _leer_cantidad():
+    """Lee la cantidad (entero positivo) del cuerpo de /reservar y /liberar."""
+    datos_json = request.json
+    cantidad = datos_json.get('cantidad') if isinstance(datos_json, dict) else None
+    if not _es_entero_positivo(cantidad):
+        return None, (jsonify({"error": "Datos de entrada inválidos", "mensajes": {"cantidad": ["Se requiere un entero positivo."]}}), 400)
+    return cantidad, None
+
+def _ajustar_stock(id, delta, condicion):
+    """
+    Modifica el stock en `delta` unidades con una única sentencia
+    UPDATE ... SET stock = stock + :delta WHERE id = :id [AND condicion] RETURNING stock.
+    La comprobación y la escritura son atómicas en la base de datos, por lo que
+    peticiones concurrentes no pierden actualizaciones. Devuelve el nuevo stock,
+    o None si ninguna fila cumplió la condición.
+    """
+    sentencia = (
+        update(Producto)
+        .where(Producto.id == id, *condicion)
+        .values(stock=Producto.stock + delta)
+        .returning(Producto.stock)
+        .execution_options(synchronize_session=False)
+    )
+    nuevo_stock = db.session.execute(sentencia).scalar_one_or_none()
+    db.session.commit()
+    if nuevo_stock is not None:
+        cache_productos.invalidar(id)
+    return nuevo_stock
+
+@bp.route('/productos/<int:id>/reservar', methods=['POST'])
+def reservar_stock(id):
+    """
+    Reserva (descuenta) unidades del stock de un producto de forma atómica.
+    ---
+    tags:
+      - Productos
+    summary: Reserva stock de un producto.
+    description: >
+      Descuenta `cantidad` unidades solo si hay stock suficiente, con una única
+      sentencia UPDATE condicional. Es seguro ante pedidos concurrentes: nunca
+      deja el stock en negativo ni pierde actualizaciones.
+    consumes:
+      - application/json
+    produces:
+      - application/json
+    parameters:
+      - name: id
+        in: path
+        description: ID del producto.
+        required: true
+        type: integer
+        format: int64
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - cantidad
+          properties:
+            cantidad:
+              type: integer
+              description: Unidades (entero positivo).
+              example: 2
+    responses:
+      200:
+        description: Stock reservado. Devuelve el stock resultante.
+        schema:
+          type: object
+          properties:
+            id:
+              type: integer
+            stock:
+              type: integer
+      400:
+        description: Cantidad inválida.
+        schema:
+          $ref: '#/definitions/ErrorValidacion'
+      404:
+        description: Producto no encontrado.
+        schema:
+          $ref: '#/definitions/ErrorRespuesta'
+      409:
+        description: Stock insuficiente.
+        schema:
+          $ref: '#/definitions/ErrorRespuesta'
+    """
+    cantidad, error = _leer_cantidad()
+    if error:
+        return error
+
+    nuevo_stock = _ajustar_stock(id, -cantidad, [Producto.stock >= cantidad])
+    if nuevo_stock is None:
+        # Solo en el caso de fallo se consulta si el producto existe, para elegir el error.
+        if db.session.get(Producto, id) is None:
+            return jsonify({"error": "RecursoNoEncontrado", "mensaje": "Producto no encontrado."}), 404
+        return jsonify({"error": "StockInsuficiente", "mensaje": "No hay stock suficiente para reservar la cantidad pedida."}), 409
+    return jsonify({"id": id, "stock": nuevo_stock}), 200
+
+@bp.route('/productos/<int:id>/liberar', methods=['POST'])
+def liberar_stock(id):
+    """
+    Libera (devuelve) unidades al stock de un producto de forma atómica.
+    ---
+    tags:
+      - Productos
+    summary: Libera stock de un producto.
+    description: Suma `cantidad` unidades al stock con una única sentencia UPDATE, por ejemplo al cancelar un pedido.
+    consumes:
+      - application/json
+    produces:
+      - application/json
+    parameters:
+      - name: id
+        in: path
+        description: ID del producto.
+        required: true
+        type: integer
+        format: int64
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - cantidad
+          properties:
+            cantidad:
+              type: integer
+              description: Unidades (entero positivo).
+              example: 2
+    responses:
+      200:
+        description: Stock liberado. Devuelve el stock resultante.
+        schema:
+          type: object
+          properties:
+            id:
+              type: integer
+            stock:
+              type: integer
+      400:
+        description: Cantidad inválida.
+        schema:
+          $ref: '#/definitions/ErrorValidacion'
+      404:
+        description: Producto no encontrado.
+        schema:
+          $ref: '#/definitions/ErrorRespuesta'
+    """
+    cantidad, error = _leer_cantidad()
+    if error:
+        return error
+
+    nuevo_stock = _ajustar_stock(id, cantidad, [])
+    if nuevo_stock is None:
+        return jsonify({"error": "RecursoNoEncontrado", "mensaje": "Producto no encontrado."}), 404
+    return jsonify({"id": id, "stock": nuevo_stock}), 200
+
+@bp.route('/productos/cache/estadisticas', methods=['GET'])
+def obtener_estadisticas_cache():
+    """
+    Devuelve los contadores de la caché de productos.
+    ---
+    tags:
+      - Operación
+    summary: Estadísticas de la caché de GET /productos/{id}.
+    description: Contadores de aciertos, fallos, desalojos y expiraciones de la caché en memoria de este proceso.
+    produces:
+      - application/json
+    responses:
+      200:
+        description: Contadores de la caché.
+        schema:
+          type: object
+          properties:
+            aciertos:
+              type: integer
+            fallos:
+              type: integer
+            desalojos:
+              type: integer
+            expiraciones:
+              type: integer
+            entradas:
+              type: integer
+            tamano_maximo:
+              type: integer
+            ttl_segundos:
+              type: number
+    """
+    return jsonify(cache_productos.estadisticas()), 200
+
+@bp.route('/metrics', methods=['GET'])
+def obtener_metricas():
+    """
+    Expone las métricas de la aplicación en el formato de Prometheus.
+    ---
+    tags:
+      - Operación
+    summary: Métricas de peticiones HTTP y de sentencias SQL.
+    description: Histogramas de duración por ruta, peticiones en curso, respuestas por código de estado y cantidad y duración de las sentencias SQL de este proceso. Devuelve 404 si METRICAS_HABILITADAS está desactivado.
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Métricas en el formato de texto de Prometheus.
+      404:
+        description: Métricas desactivadas.
+        schema:
+          $ref: '#/definitions/ErrorRespuesta'
+    """
+    if not current_app.config['METRICAS_HABILITADAS']:
+        abort(404)
+    return Response(metricas.exponer(), mimetype=None, content_type=TIPO_CONTENIDO)
+
+@codificacion_propia
+def servir_especificacion():
+    """
+    Devuelve la especificación OpenAPI precalculada (reemplaza la vista de Flasgger
+    para /apispec_1.json; ver _registrar_especificacion). Usa la versión comprimida
+    con gzip si el cliente la acepta y responde 304 si el cliente ya la tiene.
+    """
+    especificacion = current_app.extensions['openapi'].obtener()
+    if especificacion is None:
+        abort(404)
+    usar_gzip = request.accept_encodings['gzip'] > 0
+    # Cada codificación es una representación distinta, con su propio ETag.
+    etag = especificacion.etag + (f"-{SUFIJOS_ETAG['gzip']}" if usar_gzip else '')
+    respuesta = _respuesta_no_modificada(etag, None)
+    if respuesta is None:
+        respuesta = Response(especificacion.cuerpo_gzip if usar_gzip else especificacion.cuerpo, mimetype='application/json')
+        if usar_gzip:
+            respuesta.content_encoding = 'gzip'
+        _con_validadores(respuesta, etag, None)
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
+
 # --- Manejadores de Errores Globales ---
-@app.errorhandler(ValidationError)
+@bp.app_errorhandler(ValidationError)
 def handle_marshmallow_validation(err):
     # Para que coincida con el esquema ErrorValidacion
     return jsonify({"error": "Datos de entrada inválidos", "mensajes": err.messages}), 400
 
-@app.errorhandler(404)
+@bp.app_errorhandler(ParametroInvalido)
+def handle_parametro_invalido(err):
+    # Parámetros de la query string (consultas.py): mismo cuerpo que handle_bad_request.
+    return jsonify(error="SolicitudIncorrecta", mensaje=err.mensaje), 400
+
+@bp.app_errorhandler(404)
 def handle_not_found_error(err):
     # Para que coincida con el esquema ErrorRespuesta
     return jsonify(error="RecursoNoEncontrado", mensaje="El recurso solicitado no fue encontrado en la API."), 404
     
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def handle_internal_server_error(err):
     original_exception = err.original_exception if hasattr(err, 'original_exception') else err
-    app.logger.error(f"Error interno del servidor: {original_exception}")
+    current_app.logger.error(f"Error interno del servidor: {original_exception}")
     return jsonify(error="ErrorInternoDelServidor", mensaje="Ha ocurrido un error inesperado en el servidor."), 500
 
-@app.errorhandler(405)
+@bp.app_errorhandler(405)
 def handle_method_not_allowed(err):
     return jsonify(error="MetodoNoPermitido", mensaje="El método HTTP no está permitido para la URL solicitada."), 405
 
-@app.errorhandler(400) 
+@bp.app_errorhandler(400) 
 def handle_bad_request(err):
     if isinstance(err, ValidationError):
         return handle_marshmallow_validation(err)
@@ -401,10 +1760,10 @@ def handle_bad_request(err):
     # Para que coincida con el esquema ErrorRespuesta
     return jsonify(error="SolicitudIncorrecta", mensaje=mensaje), 400
 
-# --- Creación de la base de datos ---
-with app.app_context():
-    db.create_all()
-
 # --- Punto de entrada para ejecutar la aplicación ---
 if __name__ == '__main__':
+    app = create_app()
+    # En desarrollo se crean las tablas que falten al arrancar (lo mismo que `flask productos init-db`).
+    with app.app_context():
+        db.create_all()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,308 @@
+# asgi.py
+"""
+Punto de entrada ASGI con acceso asíncrono a la base de datos.
+
+Sirve las rutas CRUD principales de /productos (las mismas que app.py, con los
+mismos cuerpos JSON de respuesta y de error) sobre un motor asíncrono de
+SQLAlchemy (aiosqlite). Así un worker no queda bloqueado mientras espera a
+SQLite y puede atender muchas peticiones concurrentes con un solo hilo.
+GET /productos acepta los mismos filtros, orden, paginación y `fields` que en
+app.py (consultas.py) y el mismo ETag; `ids` y `stream` se rechazan con 400.
+Las rutas masivas, de búsqueda y de operación siguen disponibles en la
+aplicación WSGI (app.py).
+
+Requiere los paquetes opcionales aiosqlite y un servidor ASGI (uvicorn), por ejemplo:
+    pip install -r requirements-opcionales.txt
+    uvicorn asgi:aplicacion --workers 4
+
+Al arrancar no se crea el esquema: la base debe existir (flask --app app productos init-db).
+"""
+import json
+import logging
+import os
+import re
+from datetime import timezone
+from urllib.parse import parse_qs
+
+from marshmallow.exceptions import ValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+from config import configuraciones
+from consultas import (ParametroInvalido, aplicar_filtros, cursor_siguiente, etag_lista, leer_campos, leer_entero,
+                       leer_filtros_productos, sentencia_validadores_lista)
+from models import ENTERO_MAXIMO, Producto, configurar_pragmas_sqlite
+from schemas import MENSAJE_ID_EXISTENTE, producto_nuevo_schema, producto_parcial_schema
+from serializacion import CAMPOS_PRODUCTO, COLUMNAS_PRODUCTO, fila_a_producto, orjson, proyeccion_productos
+
+logger = logging.getLogger(__name__)
+
+configuracion = configuraciones[os.environ.get('APP_CONFIG', 'development')]
+
+
+def crear_motor_asincrono(uri, opciones, pragmas):
+    """Crea el motor asíncrono equivalente a la URI síncrona de la configuración."""
+    url = make_url(uri)
+    if url.drivername == 'sqlite':
+        url = url.set(drivername='sqlite+aiosqlite')
+    motor = create_async_engine(url, **opciones)
+    configurar_pragmas_sqlite(motor.sync_engine, pragmas)
+    return motor
+
+
+motor = crear_motor_asincrono(
+    configuracion.SQLALCHEMY_DATABASE_URI,
+    getattr(configuracion, 'SQLALCHEMY_ENGINE_OPTIONS', {}),
+    configuracion.SQLITE_PRAGMAS,
+)
+Sesion = async_sessionmaker(motor, expire_on_commit=False)
+
+
+class RespuestaJSON:
+    """Respuesta HTTP con cuerpo JSON codificado como lo hace Flask (compacto y con claves ordenadas)."""
+
+    def __init__(self, datos, estado=200, encabezados=()):
+        self.estado = estado
+        self.encabezados = list(encabezados)
+        if orjson is not None:
+            self.cuerpo = orjson.dumps(datos, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS) + b"\n"
+        else:
+            self.cuerpo = (json.dumps(datos, sort_keys=True, separators=(",", ":")) + "\n").encode()
+
+    async def enviar(self, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.estado,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(self.cuerpo)).encode()),
+                *self.encabezados,
+            ],
+        })
+        await send({"type": "http.response.body", "body": self.cuerpo})
+
+
+class RespuestaNoModificada:
+    """Respuesta 304, sin cuerpo, con los validadores del recurso."""
+
+    def __init__(self, encabezados):
+        self.estado = 304
+        self.encabezados = list(encabezados)
+
+    async def enviar(self, send):
+        await send({"type": "http.response.start", "status": self.estado, "headers": self.encabezados})
+        await send({"type": "http.response.body", "body": b""})
+
+
+class SolicitudIncorrecta(Exception):
+    """Error 400 con el mismo cuerpo que handle_bad_request de app.py."""
+
+    def __init__(self, mensaje):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+
+
+# Parámetros de GET /productos que solo atiende la aplicación WSGI.
+PARAMETROS_SOLO_WSGI = ('ids', 'stream')
+
+
+def _encabezados_validadores(etag, ultima_modificacion):
+    """Encabezados ETag y Last-Modified, con el mismo formato que Response.set_etag y last_modified."""
+    encabezados = [(b"etag", quote_etag(etag).encode())]
+    if ultima_modificacion is not None:
+        encabezados.append((b"last-modified", http_date(ultima_modificacion.replace(tzinfo=timezone.utc)).encode()))
+    return encabezados
+
+
+def _no_modificada(peticion, etag, ultima_modificacion):
+    """
+    Indica si los encabezados condicionales de la petición corresponden a esta
+    versión del recurso, con las mismas reglas que _respuesta_no_modificada de app.py.
+    """
+    if_none_match = peticion.encabezados.get('if-none-match')
+    if if_none_match:
+        return parse_etags(if_none_match).contains(etag)
+    if_modified_since = parse_date(peticion.encabezados.get('if-modified-since'))
+    if if_modified_since and ultima_modificacion is not None:
+        return ultima_modificacion.replace(tzinfo=timezone.utc, microsecond=0) <= if_modified_since
+    return False
+
+
+# --- Manejadores de las rutas ---
+
+async def crear_producto(peticion):
+    try:
+        datos = producto_nuevo_schema.load(peticion.json())
+    except ValidationError as err:
+        return RespuestaJSON({"error": "Datos de entrada inválidos", "mensajes": err.messages}, 400)
+
+    async with Sesion() as sesion:
+        try:
+            fila = (await sesion.execute(insert(Producto).values(**datos).returning(*COLUMNAS_PRODUCTO))).one()
+            await sesion.commit()
+        except IntegrityError:
+            # Como en app.py: un ID explícito que ya existe responde 409.
+            await sesion.rollback()
+            return RespuestaJSON({"error": "ProductoExistente", "mensajes": {"id": [MENSAJE_ID_EXISTENTE]}}, 409)
+    return RespuestaJSON(fila_a_producto(fila), 201)
+
+
+async def obtener_productos(peticion):
+    parametros = peticion.parametros
+    for nombre in PARAMETROS_SOLO_WSGI:
+        if nombre in parametros:
+            raise SolicitudIncorrecta(f"El parámetro '{nombre}' no está disponible en la aplicación ASGI; use la aplicación WSGI (app.py).")
+
+    # Mismo orden de validación que app.py: filtros y cursor, campos, validadores y límite.
+    filtros = leer_filtros_productos(parametros)
+    async with Sesion() as sesion:
+        proyeccion = proyeccion_productos(leer_campos(parametros) or CAMPOS_PRODUCTO, filtros.columna.key)
+        consulta = aplicar_filtros(select(*proyeccion.columnas), filtros)
+
+        secuencia, ultima_modificacion = (await sesion.execute(sentencia_validadores_lista())).one()
+        etag = etag_lista(secuencia, ultima_modificacion, peticion.query_string, False)
+        validadores = _encabezados_validadores(etag, ultima_modificacion)
+        if _no_modificada(peticion, etag, ultima_modificacion):
+            return RespuestaNoModificada(validadores)
+
+        mapeador = proyeccion.mapeador
+        if 'limit' not in parametros and 'after_id' not in parametros:
+            filas = await sesion.execute(consulta)
+            return RespuestaJSON([mapeador(fila) for fila in filas], encabezados=validadores)
+
+        limite = min(
+            leer_entero(parametros, 'limit', configuracion.PAGINACION_LIMITE_POR_DEFECTO, minimo=1),
+            configuracion.PAGINACION_LIMITE_MAXIMO,
+        )
+        filas = (await sesion.execute(consulta.limit(limite + 1))).all()
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    return RespuestaJSON({
+        "productos": [mapeador(fila) for fila in filas],
+        "next_cursor": cursor_siguiente(filtros, filas[-1][proyeccion.posicion_orden], filas[-1][proyeccion.posicion_id]) if hay_mas else None,
+    }, encabezados=validadores)
+
+
+async def obtener_producto(peticion, id):
+    async with Sesion() as sesion:
+        fila = (await sesion.execute(select(*COLUMNAS_PRODUCTO).where(Producto.id == id))).first()
+    if fila is None:
+        return RespuestaJSON({"error": "RecursoNoEncontrado", "mensaje": "Producto no encontrado."}, 404)
+    return RespuestaJSON(fila_a_producto(fila))
+
+
+async def actualizar_producto(peticion, id):
+    datos_json = peticion.json()
+    async with Sesion() as sesion:
+        existe = (await sesion.execute(select(Producto.id).where(Producto.id == id))).first()
+        if existe is None:
+            return RespuestaJSON({"error": "RecursoNoEncontrado", "mensaje": "Producto no encontrado para actualizar."}, 404)
+
+        try:
+            cambios = producto_parcial_schema.load(datos_json)
+        except ValidationError as err:
+            return RespuestaJSON({"error": "Datos de entrada inválidos", "mensajes": err.messages}, 400)
+
+        consulta = select(*COLUMNAS_PRODUCTO).where(Producto.id == id)
+        if cambios:
+            consulta = update(Producto).where(Producto.id == id).values(**cambios).returning(*COLUMNAS_PRODUCTO)
+        fila = (await sesion.execute(consulta)).one()
+        await sesion.commit()
+    return RespuestaJSON(fila_a_producto(fila))
+
+
+async def eliminar_producto(peticion, id):
+    async with Sesion() as sesion:
+        resultado = await sesion.execute(delete(Producto).where(Producto.id == id).returning(Producto.id))
+        eliminado = resultado.first() is not None
+        await sesion.commit()
+    if not eliminado:
+        return RespuestaJSON({"error": "RecursoNoEncontrado", "mensaje": "Producto no encontrado para eliminar."}, 404)
+    return RespuestaJSON({"mensaje": "Producto eliminado correctamente"})
+
+
+# Tabla de rutas: (patrón de la ruta, {método: manejador}).
+RUTAS = [
+    (re.compile(r'^/productos$'), {'GET': obtener_productos, 'POST': crear_producto}),
+    (re.compile(r'^/productos/(?P<id>\d+)$'), {'GET': obtener_producto, 'PUT': actualizar_producto, 'DELETE': eliminar_producto}),
+]
+
+
+class Peticion:
+    """Datos de una petición HTTP ASGI ya leída."""
+
+    def __init__(self, scope, cuerpo):
+        self.metodo = scope['method']
+        self.ruta = scope['path']
+        self.query_string = scope.get('query_string', b'').decode()
+        # Como request.args.get de Flask: el primer valor de cada parámetro, incluidos los vacíos.
+        self.parametros = {nombre: valores[0] for nombre, valores in parse_qs(self.query_string, keep_blank_values=True).items()}
+        self.encabezados = {nombre.decode('latin-1').lower(): valor.decode('latin-1') for nombre, valor in scope.get('headers', [])}
+        self.cuerpo = cuerpo
+
+    def json(self):
+        try:
+            return json.loads(self.cuerpo)
+        except ValueError:
+            raise SolicitudIncorrecta("Failed to decode JSON object.")
+
+
+async def _leer_cuerpo(receive):
+    partes = []
+    while True:
+        mensaje = await receive()
+        partes.append(mensaje.get('body', b''))
+        if not mensaje.get('more_body'):
+            return b''.join(partes)
+
+
+async def _despachar(peticion):
+    for patron, manejadores in RUTAS:
+        coincidencia = patron.match(peticion.ruta)
+        if coincidencia is None:
+            continue
+        manejador = manejadores.get(peticion.metodo)
+        if manejador is None:
+            return RespuestaJSON({"error": "MetodoNoPermitido", "mensaje": "El método HTTP no está permitido para la URL solicitada."}, 405)
+        argumentos = {nombre: int(valor) for nombre, valor in coincidencia.groupdict().items()}
+        if any(valor > ENTERO_MAXIMO for valor in argumentos.values()):
+            # Como <int:id> en app.py: un ID que no cabe en un INTEGER no puede existir.
+            break
+        return await manejador(peticion, **argumentos)
+    return RespuestaJSON({"error": "RecursoNoEncontrado", "mensaje": "El recurso solicitado no fue encontrado en la API."}, 404)
+
+
+async def _ciclo_de_vida(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            # El esquema no se crea aquí: cada worker ejecutaría el DDL al arrancar.
+            # Las tablas se crean una vez con `flask --app app productos init-db`.
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            await motor.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def aplicacion(scope, receive, send):
+    """Aplicación ASGI."""
+    if scope['type'] == 'lifespan':
+        await _ciclo_de_vida(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    peticion = Peticion(scope, await _leer_cuerpo(receive))
+    try:
+        respuesta = await _despachar(peticion)
+    except (SolicitudIncorrecta, ParametroInvalido) as err:
+        respuesta = RespuestaJSON({"error": "SolicitudIncorrecta", "mensaje": err.mensaje}, 400)
+    except Exception as err:
+        logger.error(f"Error interno del servidor: {err}")
+        respuesta = RespuestaJSON({"error": "ErrorInternoDelServidor", "mensaje": "Ha ocurrido un error inesperado en el servidor."}, 500)
+    await respuesta.enviar(send)
@@ -0,0 +1,99 @@
+# benchmarks/bench_arranque.py
+"""
+Mide el costo de arrancar un worker: importar app.py, crear la aplicación con
+create_app() y atender la primera petición, cada vez en un proceso nuevo.
+
+Perfiles:
+
+* minimo: sin Swagger ni métricas (SWAGGER_HABILITADO y METRICAS_HABILITADAS en False);
+* completo: la configuración por defecto;
+* completo_con_init_db: el perfil completo ejecutando además db.create_all() al
+  arrancar, que es lo que hacía cada worker antes de create_app().
+
+Uso:
+    python -m benchmarks.bench_arranque --repeticiones 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.comun import preparar_base_aislada, poblar_productos
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PERFILES = ("minimo", "completo", "completo_con_init_db")
+
+# Se ejecuta en un intérprete nuevo para que ningún módulo esté ya importado.
+CODIGO_HIJO = """
+import json, sys, time
+inicio = time.perf_counter()
+import app as modulo
+importado = time.perf_counter()
+from config import Config
+perfil = sys.argv[1]
+opciones = {"SWAGGER_HABILITADO": False, "METRICAS_HABILITADAS": False} if perfil == "minimo" else {}
+aplicacion = modulo.create_app(type("ConfigBenchmark", (Config,), opciones))
+if perfil == "completo_con_init_db":
+    with aplicacion.app_context():
+        modulo.db.create_all()
+creada = time.perf_counter()
+respuesta = aplicacion.test_client().get("/productos/1")
+assert respuesta.status_code == 200, respuesta.status_code
+primera = time.perf_counter()
+aplicacion.test_client().get("/productos?limit=10")
+segunda = time.perf_counter()
+print(json.dumps({
+    "importar_ms": (importado - inicio) * 1000,
+    "create_app_ms": (creada - importado) * 1000,
+    "primera_peticion_ms": (primera - creada) * 1000,
+    "segunda_peticion_ms": (segunda - primera) * 1000,
+}))
+"""
+
+
+def medir_arranque(perfil):
+    inicio = time.perf_counter()
+    salida = subprocess.run([sys.executable, "-c", CODIGO_HIJO, perfil], cwd=RAIZ,
+                            capture_output=True, text=True, check=True).stdout
+    tiempos = json.loads(salida)
+    # Incluye el arranque del intérprete, como lo vería un gestor de procesos.
+    tiempos["proceso_completo_ms"] = (time.perf_counter() - inicio) * 1000
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=1000)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    preparar_base_aislada()
+    # La aplicación se importa después de fijar DATABASE_URL.
+    from app import create_app
+    from models import db, Producto
+    aplicacion = create_app()
+    with aplicacion.app_context():
+        db.create_all()
+        poblar_productos(db, Producto, args.productos)
+
+    mediciones = {perfil: [] for perfil in PERFILES}
+    for _ in range(args.repeticiones):
+        # Se alternan los perfiles para repartir el ruido de la máquina entre todos.
+        for perfil in PERFILES:
+            mediciones[perfil].append(medir_arranque(perfil))
+
+    resultados = []
+    for perfil, muestras in mediciones.items():
+        resultado = {"perfil": perfil}
+        for clave in muestras[0]:
+            resultado[f"{clave}_mediana"] = round(statistics.median(m[clave] for m in muestras), 2)
+        resultados.append(resultado)
+    print(json.dumps({"repeticiones": args.repeticiones, "resultados": resultados}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
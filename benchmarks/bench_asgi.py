@@ -0,0 +1,123 @@
+# benchmarks/bench_asgi.py
+"""
+Compara peticiones por segundo de la aplicación WSGI (app.py, servidor con hilos
+de Werkzeug) y de la aplicación ASGI (asgi.py, uvicorn con aiosqlite) con muchos
+clientes concurrentes.
+
+Requiere los paquetes opcionales aiosqlite y uvicorn.
+
+Uso:
+    python -m benchmarks.bench_asgi --concurrencias 64 256 --peticiones 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.comun import preparar_base_aislada, poblar_productos
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVIDORES = {
+    "wsgi": [sys.executable, "-c",
+             "import sys; from werkzeug.serving import run_simple; from app import app; "
+             "run_simple('127.0.0.1', int(sys.argv[1]), app, threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:aplicacion", "--log-level", "warning", "--port"],
+}
+
+
+def puerto_libre():
+    with socket.socket() as conexion:
+        conexion.bind(("127.0.0.1", 0))
+        return conexion.getsockname()[1]
+
+
+def iniciar_servidor(tipo, puerto):
+    proceso = subprocess.Popen(SERVIDORES[tipo] + [str(puerto)], cwd=RAIZ,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + 20
+    while time.monotonic() < limite:
+        try:
+            socket.create_connection(("127.0.0.1", puerto), timeout=0.2).close()
+            return proceso
+        except OSError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError(f"El servidor {tipo} no arrancó en el puerto {puerto}")
+
+
+async def pedir(puerto, ruta):
+    lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+    escritor.write(f"GET {ruta} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    await escritor.drain()
+    respuesta = await lector.read()
+    escritor.close()
+    return int(respuesta.split(b" ", 2)[1])
+
+
+async def generar_carga(puerto, ids, peticiones, concurrencia):
+    semaforo = asyncio.Semaphore(concurrencia)
+    latencias = []
+    errores = 0
+
+    async def una_peticion():
+        nonlocal errores
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                estado = await pedir(puerto, f"/productos/{random.choice(ids)}")
+            except OSError:
+                estado = None
+            latencias.append(time.perf_counter() - inicio)
+            if estado != 200:
+                errores += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una_peticion() for _ in range(peticiones)))
+    duracion = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "peticiones_por_segundo": round(peticiones / duracion, 1),
+        "p50_ms": round(latencias[len(latencias) // 2] * 1000, 2),
+        "p99_ms": round(latencias[int(len(latencias) * 0.99)] * 1000, 2),
+        "errores": errores,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=1000)
+    parser.add_argument('--peticiones', type=int, default=5000)
+    parser.add_argument('--concurrencias', type=int, nargs='+', default=[64, 256])
+    args = parser.parse_args()
+
+    preparar_base_aislada()
+    from app import app
+    from models import db, Producto
+    with app.app_context():
+        db.create_all()
+        poblar_productos(db, Producto, args.productos)
+        ids = list(db.session.execute(db.select(Producto.id)).scalars())
+
+    resultados = []
+    for tipo in SERVIDORES:
+        puerto = puerto_libre()
+        proceso = iniciar_servidor(tipo, puerto)
+        try:
+            for concurrencia in args.concurrencias:
+                resultado = asyncio.run(generar_carga(puerto, ids, args.peticiones, concurrencia))
+                resultados.append({"servidor": tipo, "concurrencia": concurrencia, **resultado})
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
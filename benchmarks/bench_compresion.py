@@ -0,0 +1,99 @@
+# benchmarks/bench_compresion.py
+"""
+Mide el compromiso entre CPU y bytes de la compresión de respuestas (compresion.py).
+
+1. Para cuerpos reales de GET /productos (dos páginas y la lista completa), el tamaño
+   comprimido y el tiempo de compresión con cada nivel de gzip y, si el paquete
+   `brotli` está instalado, de brotli.
+2. El costo por petición de esas rutas sin compresión, comprimiendo
+   en cada petición (caché de cuerpos desactivada) y con la caché de cuerpos
+   comprimidos (el ETag no cambia entre peticiones).
+
+Uso:
+    python -m benchmarks.bench_compresion --productos 10000 --peticiones 200
+"""
+import argparse
+import json
+
+from benchmarks.comun import preparar_base_aislada, poblar_productos, medir
+
+RUTAS = ("/productos?limit=100", "/productos?limit=1000", "/productos")
+NIVELES_GZIP = range(1, 10)
+NIVELES_BROTLI = (1, 4, 6, 9, 11)
+
+
+def medir_niveles(cuerpo, repeticiones):
+    from compresion import brotli, comprimir
+
+    candidatos = [("gzip", nivel) for nivel in NIVELES_GZIP]
+    if brotli is not None:
+        candidatos += [("br", nivel) for nivel in NIVELES_BROTLI]
+    resultados = []
+    for codificacion, nivel in candidatos:
+        comprimido = comprimir(cuerpo, codificacion, nivel)
+        segundos = medir(lambda: comprimir(cuerpo, codificacion, nivel), repeticiones)
+        resultados.append({
+            "codificacion": codificacion,
+            "nivel": nivel,
+            "bytes": len(comprimido),
+            "ratio": round(len(cuerpo) / len(comprimido), 2),
+            "ms_compresion": round(segundos * 1000, 3),
+            "mb_por_segundo": round(len(cuerpo) / segundos / 1e6, 1),
+        })
+    return resultados
+
+
+def medir_peticiones(app, ruta, peticiones):
+    """Microsegundos por petición de `ruta` sin compresión, sin caché de cuerpos y con ella."""
+    compresion = app.extensions['compresion']
+    cliente = app.test_client()
+    modos = {
+        "sin_compresion": ({}, compresion.cache.tamano_maximo),
+        "gzip_sin_cache": ({"Accept-Encoding": "gzip"}, 0),
+        "gzip_con_cache": ({"Accept-Encoding": "gzip"}, compresion.cache.tamano_maximo),
+    }
+    resultados = {}
+    for modo, (encabezados, tamano_cache) in modos.items():
+        compresion.cache.tamano_maximo = tamano_cache
+        compresion.cache.limpiar()
+        assert cliente.get(ruta, headers=encabezados).status_code == 200
+
+        def ejecutar():
+            for _ in range(peticiones):
+                cliente.get(ruta, headers=encabezados)
+
+        resultados[f"us_{modo}"] = round(medir(ejecutar, 3) / peticiones * 1e6, 1)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=10000)
+    parser.add_argument('--peticiones', type=int, default=200)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    preparar_base_aislada()
+    # La aplicación se importa después de fijar DATABASE_URL.
+    from app import create_app
+    from models import db, Producto
+    aplicacion = create_app()
+    with aplicacion.app_context():
+        db.create_all()
+        poblar_productos(db, Producto, args.productos)
+
+    cliente = aplicacion.test_client()
+    niveles, peticiones = [], []
+    for ruta in RUTAS:
+        cuerpo = cliente.get(ruta).data
+        niveles.append({"ruta": ruta, "bytes_sin_comprimir": len(cuerpo),
+                        "niveles": medir_niveles(cuerpo, args.repeticiones)})
+        # Menos peticiones cuanto más grande es el cuerpo, para que cada ruta tarde parecido.
+        cantidad = max(10, args.peticiones * 20000 // len(cuerpo))
+        peticiones.append({"ruta": ruta, **medir_peticiones(aplicacion, ruta, cantidad)})
+
+    print(json.dumps({"productos": args.productos, "niveles": niveles, "peticiones": peticiones}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_exportacion.py
+"""
+Mide la exportación del catálogo completo: tiempo, bytes transmitidos y memoria.
+
+Modos:
+
+* json_completo: GET /productos sin paginar, que arma toda la lista en memoria
+  (lo que se usaba para exportar antes de /productos/export);
+* csv: GET /productos/export en streaming;
+* csv_gzip: lo mismo con Accept-Encoding: gzip.
+
+Cada modo se mide en un proceso hijo para que el pico de memoria (RSS) de uno no
+afecte a los demás. Se informa cuánto crece el pico de RSS durante la petición,
+respecto del proceso ya arrancado.
+
+Uso:
+    python -m benchmarks.bench_exportacion --productos 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.comun import preparar_base_aislada, poblar_productos
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODOS = {
+    "json_completo": ("/productos", {}),
+    "csv": ("/productos/export?format=csv", {}),
+    "csv_gzip": ("/productos/export?format=csv", {"Accept-Encoding": "gzip"}),
+}
+
+
+def rss_pico_mb():
+    # En Linux ru_maxrss está en KiB; en macOS, en bytes.
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def medir_modo(modo):
+    """Descarga la ruta del modo con el cliente de pruebas, sin guardar el cuerpo."""
+    from app import app
+    ruta, encabezados = MODOS[modo]
+    cliente = app.test_client()
+    # Calienta la conexión y las consultas antes de tomar la línea base de memoria.
+    cliente.get('/productos?limit=10')
+    pico_base = rss_pico_mb()
+
+    inicio = time.perf_counter()
+    respuesta = cliente.get(ruta, headers=encabezados)
+    assert respuesta.status_code == 200, respuesta.status_code
+    primer_fragmento = None
+    total = 0
+    for fragmento in respuesta.response:
+        if primer_fragmento is None:
+            primer_fragmento = time.perf_counter() - inicio
+        total += len(fragmento)
+    segundos = time.perf_counter() - inicio
+    return {
+        "segundos": round(segundos, 2),
+        "primer_fragmento_ms": round(primer_fragmento * 1000, 1),
+        "mb_transmitidos": round(total / (1024 * 1024), 1),
+        "aumento_rss_pico_mb": round(rss_pico_mb() - pico_base, 1),
+    }
+
+
+def medir_en_proceso_hijo(modo):
+    salida = subprocess.run([sys.executable, "-m", "benchmarks.bench_exportacion", "--hijo", modo],
+                            cwd=RAIZ, capture_output=True, text=True, check=True).stdout
+    return json.loads(salida)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=1000000)
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+    parser.add_argument('--hijo', choices=MODOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(json.dumps(medir_modo(args.hijo)))
+        return
+
+    preparar_base_aislada()
+    # La aplicación se importa después de fijar DATABASE_URL.
+    from app import create_app
+    from models import db, Producto
+    aplicacion = create_app()
+    with aplicacion.app_context():
+        db.create_all()
+        poblar_productos(db, Producto, args.productos)
+
+    resultados = []
+    for modo in args.modos:
+        resultado = {"modo": modo, **medir_en_proceso_hijo(modo)}
+        resultado["filas_por_segundo"] = round(args.productos / resultado["segundos"])
+        resultados.append(resultado)
+    print(json.dumps({"productos": args.productos, "resultados": resultados}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
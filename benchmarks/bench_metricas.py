@@ -0,0 +1,137 @@
+# benchmarks/bench_metricas.py
+"""
+Mide el costo de la instrumentación de metricas.py (hooks de Flask y eventos de
+SQLAlchemy) comparando las mismas peticiones con METRICAS_HABILITADAS=1 y =0.
+
+Como la instrumentación se registra al importar app.py, cada modo se mide en un
+proceso hijo con la variable de entorno correspondiente. Las rondas alternan
+entre modos y se informa el mejor tiempo de cada uno.
+
+Uso:
+    python -m benchmarks.bench_metricas --peticiones 2000 --rondas 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.comun import preparar_base_aislada, poblar_productos, medir
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rutas medidas: una sin SQL (producto en caché) y otras que consultan la base.
+RUTAS = {
+    "obtener_en_cache": "/productos/1",
+    "listar_pagina": "/productos?limit=20",
+    "listar_filtrado": "/productos?limit=20&precio_min=100&sort=precio",
+}
+
+
+def medir_en_este_proceso(peticiones):
+    """Mide las rutas con el cliente de pruebas y devuelve microsegundos por petición."""
+    from app import app
+    cliente = app.test_client()
+    resultados = {}
+    for nombre, ruta in RUTAS.items():
+        assert cliente.get(ruta).status_code == 200
+
+        def ejecutar():
+            for _ in range(peticiones):
+                cliente.get(ruta)
+
+        resultados[nombre] = round(medir(ejecutar, 3) / peticiones * 1e6, 2)
+    return resultados
+
+
+def medir_costo_directo(app, metricas, repeticiones=20000):
+    """
+    Mide el costo de los hooks de metricas.py aislados del resto de la petición
+    (microsegundos por petición HTTP y por sentencia SQL). Es mucho más estable
+    que la diferencia entre procesos, que incluye el ruido de la máquina.
+    """
+    from flask import Response
+
+    respuesta = Response()
+    with app.test_request_context('/productos/1'):
+        app.url_map.bind('localhost').match('/productos/1')
+
+        def peticion():
+            for _ in range(repeticiones):
+                metricas._antes_de_peticion()
+                metricas._despues_de_peticion(respuesta)
+                metricas._al_terminar_peticion()
+
+        costo_peticion = medir(peticion, 3) / repeticiones * 1e6
+
+    class Contexto:
+        pass
+
+    contexto = Contexto()
+
+    def sentencia():
+        for _ in range(repeticiones):
+            metricas._antes_de_sentencia(None, None, "SELECT 1", (), contexto, False)
+            metricas._despues_de_sentencia(None, None, "SELECT 1", (), contexto, False)
+
+    costo_sentencia = medir(sentencia, 3) / repeticiones * 1e6
+    return {"us_por_peticion": round(costo_peticion, 2), "us_por_sentencia_sql": round(costo_sentencia, 2)}
+
+
+def medir_en_proceso_hijo(habilitadas, peticiones):
+    entorno = dict(os.environ, METRICAS_HABILITADAS='1' if habilitadas else '0')
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_metricas", "--hijo", "--peticiones", str(peticiones)],
+        cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(salida)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=10000)
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--rondas', type=int, default=3)
+    parser.add_argument('--hijo', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(json.dumps(medir_en_este_proceso(args.peticiones)))
+        return
+
+    preparar_base_aislada()
+    # La aplicación se importa después de fijar DATABASE_URL.
+    from app import app
+    from metricas import MetricasAPI
+    from models import db, Producto
+    with app.app_context():
+        db.create_all()
+        poblar_productos(db, Producto, args.productos)
+    costo_directo = medir_costo_directo(app, MetricasAPI())
+
+    mejores = {True: {}, False: {}}
+    for _ in range(args.rondas):
+        for habilitadas in (False, True):
+            for nombre, microsegundos in medir_en_proceso_hijo(habilitadas, args.peticiones).items():
+                mejores[habilitadas][nombre] = min(microsegundos, mejores[habilitadas].get(nombre, float('inf')))
+
+    resultados = []
+    for nombre in RUTAS:
+        sin, con = mejores[False][nombre], mejores[True][nombre]
+        resultados.append({
+            "ruta": nombre,
+            "us_por_peticion_sin_metricas": sin,
+            "us_por_peticion_con_metricas": con,
+            "sobrecosto_us": round(con - sin, 2),
+            "sobrecosto_pct": round((con - sin) / sin * 100, 1),
+        })
+    print(json.dumps({
+        "productos": args.productos,
+        "peticiones": args.peticiones,
+        "costo_directo": costo_directo,
+        "resultados": resultados,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
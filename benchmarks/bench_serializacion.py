@@ -0,0 +1,65 @@
+# benchmarks/bench_serializacion.py
+"""
+Compara la serialización del listado completo de productos:
+
+* ruta original: objetos del ORM + productos_schema.dump() + json de la biblioteca estándar;
+* ruta rápida: tuplas de columnas + mapeador precompilado + ProveedorJSONRapido.
+
+Uso:
+    python -m benchmarks.bench_serializacion --tamanos 10000 100000 --repeticiones 3
+"""
+import argparse
+import json
+
+from benchmarks.comun import preparar_base_aislada, poblar_productos, medir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    preparar_base_aislada()
+    # La aplicación se importa después de fijar DATABASE_URL.
+    from flask.json.provider import DefaultJSONProvider
+    from app import app
+    from models import db, Producto
+    from schemas import productos_schema
+    from serializacion import COLUMNAS_PRODUCTO, fila_a_producto, orjson
+
+    json_original = DefaultJSONProvider(app)
+    resultados = []
+    with app.app_context():
+        db.create_all()
+        for tamano in args.tamanos:
+            poblar_productos(db, Producto, tamano)
+
+            def ruta_original():
+                productos = Producto.query.order_by(Producto.id).all()
+                cuerpo = json_original.dumps(productos_schema.dump(productos), separators=(",", ":"))
+                db.session.expunge_all()
+                return cuerpo
+
+            def ruta_rapida():
+                filas = db.session.execute(db.select(*COLUMNAS_PRODUCTO).order_by(Producto.id))
+                return app.json.dumps([fila_a_producto(fila) for fila in filas], separators=(",", ":"))
+
+            # Ambas rutas deben producir el mismo documento JSON.
+            assert json.loads(ruta_original()) == json.loads(ruta_rapida())
+
+            segundos_original = medir(ruta_original, args.repeticiones)
+            segundos_rapida = medir(ruta_rapida, args.repeticiones)
+            resultados.append({
+                "filas": tamano,
+                "original_s": round(segundos_original, 4),
+                "rapida_s": round(segundos_rapida, 4),
+                "aceleracion": round(segundos_original / segundos_rapida, 2),
+                "orjson": orjson is not None,
+            })
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_validacion.py
+"""
+Mide el costo de validación por petición del camino de escritura:
+
+* crear (POST /productos), original: producto_schema.load(..., session=...) construye
+  un Producto y después se comprueba que precio y stock no sean negativos;
+  actual: producto_nuevo_schema (validadores incluidos) devuelve un diccionario de
+  columnas y se construye el Producto con él.
+* actualizar (PUT /productos/<id>), original: un ProductoSchema(partial=True, ...)
+  nuevo en cada petición, un load() que solo valida y las comprobaciones manuales
+  sobre el JSON; actual: producto_parcial_schema, construido una vez, en una sola pasada.
+
+No se toca la base de datos: solo se mide la validación y la construcción de los datos.
+
+Uso:
+    python -m benchmarks.bench_validacion --iteraciones 5000
+"""
+import argparse
+import json
+
+from benchmarks.comun import preparar_base_aislada, medir
+
+CUERPO_CREAR = {"nombre": "Laptop Gamer Pro", "descripcion": "RTX 4090 y 32GB RAM", "precio": 1999.99, "stock": 50}
+CUERPO_ACTUALIZAR = {"precio": 2199.0, "stock": 45}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iteraciones', type=int, default=5000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    preparar_base_aislada()
+    # La aplicación se importa después de fijar DATABASE_URL.
+    from app import app
+    from models import db, Producto
+    from schemas import ProductoSchema, producto_schema, producto_nuevo_schema, producto_parcial_schema
+
+    def crear_original(datos):
+        producto = producto_schema.load(datos, session=db.session)
+        if producto.precio < 0 or producto.stock < 0:
+            raise ValueError(datos)
+        return producto
+
+    def crear_actual(datos):
+        return Producto(**producto_nuevo_schema.load(datos))
+
+    def actualizar_original(datos):
+        ProductoSchema(partial=True, session=db.session, unknown='EXCLUDE').load(datos)
+        if 'precio' in datos and (not isinstance(datos['precio'], (int, float)) or datos['precio'] < 0):
+            raise ValueError(datos)
+        if 'stock' in datos and (not isinstance(datos['stock'], int) or datos['stock'] < 0):
+            raise ValueError(datos)
+        return {campo: datos[campo] for campo in ('nombre', 'descripcion', 'precio', 'stock') if campo in datos}
+
+    def actualizar_actual(datos):
+        return producto_parcial_schema.load(datos)
+
+    casos = {
+        "crear": (CUERPO_CREAR, crear_original, crear_actual),
+        "actualizar": (CUERPO_ACTUALIZAR, actualizar_original, actualizar_actual),
+    }
+    resultados = []
+    with app.app_context():
+        db.create_all()
+        for operacion, (cuerpo, original, actual) in casos.items():
+            def ejecutar(funcion):
+                def bucle():
+                    for _ in range(args.iteraciones):
+                        funcion(cuerpo)
+                    # Los Producto transitorios no se agregan a la sesión, pero se descartan por si acaso.
+                    db.session.expunge_all()
+                return bucle
+
+            us_original = medir(ejecutar(original), args.repeticiones) / args.iteraciones * 1e6
+            us_actual = medir(ejecutar(actual), args.repeticiones) / args.iteraciones * 1e6
+            resultados.append({
+                "operacion": operacion,
+                "us_original": round(us_original, 1),
+                "us_actual": round(us_actual, 1),
+                "aceleracion": round(us_original / us_actual, 2),
+            })
+
+    print(json.dumps({"iteraciones": args.iteraciones, "resultados": resultados}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/comun.py
+"""
+Utilidades compartidas por los benchmarks.
+
+Los benchmarks nunca usan la base de datos de instance/: cada ejecución crea una
+base SQLite aislada en un directorio temporal y la indica con DATABASE_URL antes
+de importar la aplicación.
+"""
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+
+def preparar_base_aislada(nombre='benchmark.db'):
+    """Apunta DATABASE_URL a una base SQLite nueva en un directorio temporal y devuelve su ruta."""
+    directorio = tempfile.mkdtemp(prefix='bench_productos_')
+    ruta = os.path.join(directorio, nombre)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + ruta
+    return ruta
+
+
+def generar_productos(cantidad, semilla=42):
+    """Genera `cantidad` diccionarios de productos con datos reproducibles."""
+    aleatorio = random.Random(semilla)
+    for numero in range(cantidad):
+        yield {
+            "nombre": f"Producto {numero:07d}",
+            "descripcion": f"Descripción del producto {numero} " + "x" * aleatorio.randint(0, 120),
+            "precio": round(aleatorio.uniform(0.5, 5000), 2),
+            "stock": aleatorio.randint(0, 500),
+        }
+
+
+def poblar_productos(db, producto_modelo, cantidad, tamano_lote=10000):
+    """Vacía la tabla de productos e inserta `cantidad` productos en lotes."""
+    db.session.execute(producto_modelo.__table__.delete())
+    lote = []
+    for fila in generar_productos(cantidad):
+        lote.append(fila)
+        if len(lote) >= tamano_lote:
+            db.session.execute(insert(producto_modelo), lote)
+            lote = []
+    if lote:
+        db.session.execute(insert(producto_modelo), lote)
+    db.session.commit()
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta `funcion` varias veces y devuelve el menor tiempo en segundos."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
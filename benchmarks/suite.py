@@ -0,0 +1,295 @@
+# benchmarks/suite.py
+"""
+Suite de benchmarks de los endpoints CRUD de /productos.
+
+Para cada tamaño de catálogo, llena una base SQLite aislada y mide las rutas de
+app.py (crear, listar, obtener, actualizar, reservar y eliminar) de dos formas:
+con el cliente de pruebas de Flask (sin red) y contra un servidor WSGI real con
+hilos. Para cada ruta informa las latencias p50/p95/p99, el rendimiento y cuánto
+crece el pico de memoria (RSS) del proceso mientras se mide esa ruta, en JSON.
+
+Las reservas (POST /productos/<id>/reservar) se reparten entre pocos productos,
+así que con el servidor los clientes concurrentes compiten por las mismas filas.
+Antes se libera en cada producto tanto stock como se va a reservar: todas las
+reservas responden 200 y el stock del catálogo queda igual.
+
+El pico de RSS (ru_maxrss, VmHWM) solo aumenta durante la vida del proceso, así
+que antes de cada operación se reinicia escribiendo '5' en /proc/self/clear_refs
+(Linux 4.0 o posterior). Donde no se puede, aumento_rss_pico_mb es null.
+
+Uso:
+    python -m benchmarks.suite --tamanos 1000 100000 1000000 --salida resultados.json
+    python -m benchmarks.suite --tamanos 1000 --comparar resultados.json --tolerancia 0.25
+
+Con --comparar se indican las rutas cuyo p95 o rendimiento empeoró más que la
+tolerancia respecto de una ejecución anterior, y el proceso termina con código 1.
+"""
+import argparse
+import http.client
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert
+
+from benchmarks.comun import preparar_base_aislada, generar_productos
+
+OPERACIONES = ("crear", "listar", "obtener", "actualizar", "reservar", "eliminar")
+
+# Productos entre los que se reparten las reservas.
+PRODUCTOS_CON_RESERVAS = 10
+
+
+def percentil(valores_ordenados, porcentaje):
+    posicion = min(len(valores_ordenados) - 1, int(round(porcentaje / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[posicion]
+
+
+def _leer_memoria_kib(campo):
+    with open('/proc/self/status', encoding='ascii') as estado:
+        for linea in estado:
+            if linea.startswith(campo + ':'):
+                return int(linea.split()[1])
+    raise OSError(f"{campo} no está en /proc/self/status")
+
+
+def reiniciar_pico_rss():
+    """
+    Lleva el pico de RSS del proceso (VmHWM) al RSS actual y devuelve ese valor en
+    KiB, o None si el sistema no permite reiniciarlo.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as clear_refs:
+            clear_refs.write('5')
+        return _leer_memoria_kib('VmRSS')
+    except OSError:
+        return None
+
+
+def aumento_rss_pico_mb(rss_inicial):
+    """Cuánto superó el pico de RSS al valor de reiniciar_pico_rss(), en MiB."""
+    if rss_inicial is None:
+        return None
+    return round((_leer_memoria_kib('VmHWM') - rss_inicial) / 1024, 1)
+
+
+def completar_catalogo(db, producto_modelo, objetivo, tamano_lote=10000):
+    """Inserta productos hasta que la tabla tenga al menos `objetivo` filas."""
+    actual = db.session.execute(db.select(func.count(producto_modelo.id))).scalar_one()
+    lote = []
+    for fila in generar_productos(max(0, objetivo - actual), semilla=actual):
+        lote.append(fila)
+        if len(lote) >= tamano_lote:
+            db.session.execute(insert(producto_modelo), lote)
+            lote = []
+    if lote:
+        db.session.execute(insert(producto_modelo), lote)
+    db.session.commit()
+
+
+class ClienteFlask:
+    """Ejecuta peticiones con el cliente de pruebas de Flask."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        respuesta = self.app.test_client().open(ruta, method=metodo, json=cuerpo)
+        return respuesta.status_code, respuesta.get_data()
+
+
+class ClienteHTTP:
+    """Ejecuta peticiones contra el servidor WSGI real con http.client."""
+
+    def __init__(self, puerto):
+        self.puerto = puerto
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        conexion = http.client.HTTPConnection("127.0.0.1", self.puerto, timeout=60)
+        datos = None if cuerpo is None else json.dumps(cuerpo)
+        conexion.request(metodo, ruta, body=datos, headers={"Content-Type": "application/json"})
+        respuesta = conexion.getresponse()
+        contenido = respuesta.read()
+        conexion.close()
+        return respuesta.status, contenido
+
+
+def iniciar_servidor(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class ManejadorSilencioso(WSGIRequestHandler):
+        # El registro de cada petición en stderr distorsionaría las mediciones.
+        def log_request(self, *args, **kwargs):
+            pass
+
+    servidor = make_server("127.0.0.1", 0, app, threaded=True, request_handler=ManejadorSilencioso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def medir_operacion(cliente, peticiones, hilos):
+    """Ejecuta las peticiones (método, ruta, cuerpo, estado esperado) y devuelve las métricas."""
+    latencias = []
+    errores = 0
+
+    def ejecutar(peticion):
+        metodo, ruta, cuerpo, esperado = peticion
+        inicio = time.perf_counter()
+        estado, _ = cliente.pedir(metodo, ruta, cuerpo)
+        return time.perf_counter() - inicio, estado == esperado
+
+    rss_inicial = reiniciar_pico_rss()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        for latencia, correcta in ejecutor.map(ejecutar, peticiones):
+            latencias.append(latencia)
+            errores += not correcta
+    duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "iteraciones": len(latencias),
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+        "ops_por_segundo": round(len(latencias) / duracion, 1),
+        "errores": errores,
+        "aumento_rss_pico_mb": aumento_rss_pico_mb(rss_inicial),
+    }
+
+
+def ejecutar_escenario(cliente, ids, iteraciones, hilos, aleatorio):
+    """Mide las operaciones de OPERACIONES; los productos eliminados son los creados en la misma ejecución."""
+    resultados = {}
+    producto = {"nombre": "Producto benchmark", "descripcion": "Creado por la suite", "precio": 10.0, "stock": 5}
+
+    creados = []
+
+    class ClienteQueRegistra:
+        def pedir(self, metodo, ruta, cuerpo=None):
+            estado, contenido = cliente.pedir(metodo, ruta, cuerpo)
+            if estado == 201:
+                creados.append(json.loads(contenido)["id"])
+            return estado, contenido
+
+    resultados["crear"] = medir_operacion(
+        ClienteQueRegistra(), [("POST", "/productos", producto, 201)] * iteraciones, hilos)
+    resultados["listar"] = medir_operacion(cliente, [
+        ("GET", f"/productos?limit=100&after_id={aleatorio.choice(ids)}", None, 200) for _ in range(iteraciones)
+    ], hilos)
+    resultados["obtener"] = medir_operacion(cliente, [
+        ("GET", f"/productos/{aleatorio.choice(ids)}", None, 200) for _ in range(iteraciones)
+    ], hilos)
+    resultados["actualizar"] = medir_operacion(cliente, [
+        ("PUT", f"/productos/{aleatorio.choice(ids)}", {"precio": round(aleatorio.uniform(1, 100), 2)}, 200)
+        for _ in range(iteraciones)
+    ], hilos)
+    reservados = aleatorio.sample(ids, min(PRODUCTOS_CON_RESERVAS, len(ids)))
+    reservas = [reservados[numero % len(reservados)] for numero in range(iteraciones)]
+    for producto_id in reservados:
+        cliente.pedir("POST", f"/productos/{producto_id}/liberar", {"cantidad": reservas.count(producto_id)})
+    resultados["reservar"] = medir_operacion(cliente, [
+        ("POST", f"/productos/{producto_id}/reservar", {"cantidad": 1}, 200) for producto_id in reservas
+    ], hilos)
+    resultados["eliminar"] = medir_operacion(cliente, [
+        ("DELETE", f"/productos/{producto_id}", None, 200) for producto_id in creados
+    ], hilos)
+    return resultados
+
+
+def version_del_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(resultados, archivo_base, tolerancia):
+    """Devuelve las regresiones respecto de una ejecución anterior guardada en `archivo_base`."""
+    with open(archivo_base, encoding='utf-8') as archivo:
+        base = {(r["tamano"], r["modo"], r["operacion"]): r for r in json.load(archivo)["resultados"]}
+    regresiones = []
+    for resultado in resultados:
+        anterior = base.get((resultado["tamano"], resultado["modo"], resultado["operacion"]))
+        if anterior is None:
+            continue
+        if resultado["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia):
+            regresiones.append(f"{resultado['modo']} {resultado['operacion']} ({resultado['tamano']} filas): "
+                               f"p95 {anterior['p95_ms']} ms -> {resultado['p95_ms']} ms")
+        if resultado["ops_por_segundo"] < anterior["ops_por_segundo"] * (1 - tolerancia):
+            regresiones.append(f"{resultado['modo']} {resultado['operacion']} ({resultado['tamano']} filas): "
+                               f"{anterior['ops_por_segundo']} op/s -> {resultado['ops_por_segundo']} op/s")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--iteraciones', type=int, default=300, help='Peticiones por operación y escenario.')
+    parser.add_argument('--hilos', type=int, default=8, help='Clientes concurrentes contra el servidor WSGI.')
+    parser.add_argument('--modos', nargs='+', choices=['cliente', 'servidor'], default=['cliente', 'servidor'])
+    parser.add_argument('--salida', help='Archivo donde guardar el JSON (además de mostrarlo).')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior con el que comparar.')
+    parser.add_argument('--tolerancia', type=float, default=0.2)
+    args = parser.parse_args()
+
+    preparar_base_aislada()
+    # La aplicación se importa después de fijar DATABASE_URL.
+    from app import app
+    from models import db, Producto
+
+    aleatorio = random.Random(1234)
+    resultados = []
+    with app.app_context():
+        db.create_all()
+
+    servidor = iniciar_servidor(app) if 'servidor' in args.modos else None
+    try:
+        for tamano in sorted(args.tamanos):
+            with app.app_context():
+                completar_catalogo(db, Producto, tamano)
+                ids = list(db.session.execute(db.select(Producto.id).order_by(Producto.id).limit(tamano)).scalars())
+
+            clientes = {}
+            if 'cliente' in args.modos:
+                clientes['cliente'] = (ClienteFlask(app), 1)
+            if servidor is not None:
+                clientes['servidor'] = (ClienteHTTP(servidor.server_port), args.hilos)
+
+            for modo, (cliente, hilos) in clientes.items():
+                metricas = ejecutar_escenario(cliente, ids, args.iteraciones, hilos, aleatorio)
+                for operacion in OPERACIONES:
+                    resultados.append({"tamano": tamano, "modo": modo, "operacion": operacion, **metricas[operacion]})
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+
+    informe = {
+        "version": version_del_codigo(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "parametros": {"iteraciones": args.iteraciones, "hilos": args.hilos},
+        "resultados": resultados,
+    }
+    salida = json.dumps(informe, indent=2)
+    print(salida)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(salida)
+
+    if args.comparar:
+        regresiones = comparar(resultados, args.comparar, args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN: {regresion}", file=sys.stderr)
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Caché en memoria de proceso, acotada por cantidad de entradas (LRU) y por
+    tiempo de vida (TTL).
+
+    Se usa para guardar los productos ya serializados que devuelve
+    GET /productos/<id>. Cada worker tiene su propia caché, por lo que el TTL
+    acota cuánto puede tardar en verse un cambio hecho desde otro worker.
+    Es segura para usar desde varios hilos.
+    """
+
+    def __init__(self, tamano_maximo, ttl_segundos, reloj=time.monotonic):
+        self.tamano_maximo = tamano_maximo
+        self.ttl_segundos = ttl_segundos
+        self._reloj = reloj
+        self._entradas = OrderedDict()  # clave -> (instante de expiración, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.expiraciones = 0
+
+    @property
+    def habilitada(self):
+        return self.tamano_maximo > 0 and self.ttl_segundos > 0
+
+    def obtener(self, clave):
+        """Devuelve el valor guardado para `clave`, o None si no está o expiró."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            expira_en, valor = entrada
+            if expira_en <= self._reloj():
+                del self._entradas[clave]
+                self.expiraciones += 1
+                self.fallos += 1
+                return None
+            # Marca la entrada como la usada más recientemente.
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        """Guarda `valor` bajo `clave`, desalojando la entrada menos usada si no hay espacio."""
+        if not self.habilitada:
+            return
+        with self._lock:
+            self._entradas[clave] = (self._reloj() + self.ttl_segundos, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.tamano_maximo:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self, clave):
+        """Elimina la entrada de `clave`, si existe."""
+        with self._lock:
+            self._entradas.pop(clave, None)
+
+    def limpiar(self):
+        """Elimina todas las entradas (los contadores se conservan)."""
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        """Devuelve los contadores de uso de la caché."""
+        with self._lock:
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+                "expiraciones": self.expiraciones,
+                "entradas": len(self._entradas),
+                "tamano_maximo": self.tamano_maximo,
+                "ttl_segundos": self.ttl_segundos,
+            }
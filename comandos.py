@@ -0,0 +1,105 @@
+# comandos.py
+"""
+Comandos de línea de órdenes de la API, agrupados bajo `flask productos`:
+
+    flask --app app productos init-db
+    flask --app app productos openapi --salida instance/apispec_1.json
+    flask --app app productos reconstruir-estadisticas
+    flask --app app productos verificar-estadisticas
+    flask --app app productos import catalogo.csv --tamano-lote 5000 [--upsert]
+"""
+import json
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from especificacion import EspecificacionPrecalculada
+from estadisticas import calcular_estadisticas, diferencias_estadisticas, leer_estadisticas, reconstruir_estadisticas
+from importacion import FORMATOS, detectar_formato, importar_productos, leer_filas
+from models import db
+
+productos_cli = AppGroup('productos', help='Administración de la base de datos de productos.')
+
+
+@productos_cli.command('init-db')
+def init_db():
+    """Crea las tablas, índices e índice de búsqueda que falten (no borra datos)."""
+    db.create_all()
+    click.echo('Base de datos inicializada.')
+
+
+@productos_cli.command('openapi')
+@click.option('--salida', type=click.Path(dir_okay=False), help='Archivo de destino (por defecto, OPENAPI_ARCHIVO).')
+def generar_openapi(salida):
+    """Genera la especificación OpenAPI con Flasgger y la guarda en un archivo JSON."""
+    salida = salida or current_app.config['OPENAPI_ARCHIVO']
+    if not salida:
+        raise click.UsageError('Indica --salida o configura OPENAPI_ARCHIVO.')
+    fuente = current_app.extensions['openapi']
+    if fuente.generar is None:
+        raise click.ClickException('Flasgger no está habilitado: no se puede generar la especificación.')
+    especificacion = EspecificacionPrecalculada.desde_diccionario(fuente.generar())
+    especificacion.guardar(salida)
+    click.echo(f"Especificación guardada en {salida} ({len(especificacion.cuerpo)} bytes; "
+               f"{len(especificacion.cuerpo_gzip)} con gzip).")
+
+
+@productos_cli.command('reconstruir-estadisticas')
+def reconstruir_estadisticas_cmd():
+    """Recalcula las tablas de agregados de GET /productos/estadisticas desde los productos."""
+    reconstruir_estadisticas(db.session)
+    db.session.commit()
+    click.echo(f"Estadísticas reconstruidas: {leer_estadisticas(db.session)['cantidad_productos']} productos.")
+
+
+@productos_cli.command('verificar-estadisticas')
+def verificar_estadisticas_cmd():
+    """Compara los agregados guardados con un recálculo completo; termina con código 1 si difieren."""
+    diferencias = diferencias_estadisticas(leer_estadisticas(db.session), calcular_estadisticas(db.session))
+    if diferencias:
+        for diferencia in diferencias:
+            click.echo(diferencia, err=True)
+        raise click.ClickException('Las estadísticas no coinciden; ejecute `flask productos reconstruir-estadisticas`.')
+    click.echo('Las estadísticas coinciden con los productos.')
+
+
+# Cantidad de filas rechazadas que se muestran cuando no se indica --rechazados.
+MAXIMO_RECHAZOS_MOSTRADOS = 20
+
+
+@productos_cli.command('import')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(FORMATOS), help='Formato del archivo (por defecto, según la extensión).')
+@click.option('--tamano-lote', type=click.IntRange(min=1), help='Filas por lote y por commit (por defecto, IMPORTACION_TAMANO_LOTE).')
+@click.option('--upsert', is_flag=True, help='Las filas con un id existente actualizan ese producto.')
+@click.option('--rechazados', type=click.File('w', encoding='utf-8'), help='Archivo NDJSON donde guardar las filas rechazadas y sus errores.')
+def importar_cmd(archivo, formato, tamano_lote, upsert, rechazados):
+    """Importa productos desde un archivo CSV o NDJSON, validando cada fila con ProductoSchema."""
+    formato = formato or detectar_formato(archivo)
+    if formato is None:
+        raise click.UsageError('No se reconoce la extensión del archivo; indique --formato.')
+    tamano_lote = tamano_lote or current_app.config['IMPORTACION_TAMANO_LOTE']
+
+    mostrados = 0
+
+    def al_rechazar(numero, errores):
+        nonlocal mostrados
+        if rechazados is not None:
+            rechazados.write(json.dumps({"linea": numero, "errores": errores}, ensure_ascii=False) + "\n")
+        elif mostrados < MAXIMO_RECHAZOS_MOSTRADOS:
+            click.echo(f"Línea {numero} rechazada: {json.dumps(errores, ensure_ascii=False)}", err=True)
+            mostrados += 1
+
+    def al_terminar_lote(resumen):
+        click.echo(f"{resumen.importadas + resumen.rechazadas} filas procesadas "
+                   f"({resumen.filas_por_segundo:.0f} filas/s)", err=True)
+
+    with open(archivo, encoding='utf-8', newline='') as entrada:
+        resumen = importar_productos(leer_filas(entrada, formato), tamano_lote, upsert, al_rechazar, al_terminar_lote,
+                                     cache_kib=current_app.config['IMPORTACION_CACHE_SQLITE_KIB'])
+
+    if rechazados is None and resumen.rechazadas > mostrados:
+        click.echo(f"... y {resumen.rechazadas - mostrados} filas rechazadas más (use --rechazados para guardarlas).", err=True)
+    click.echo(f"Importadas: {resumen.importadas}. Rechazadas: {resumen.rechazadas}. "
+               f"Tiempo: {resumen.segundos:.1f} s ({resumen.filas_por_segundo:.0f} filas/s).")
@@ -0,0 +1,156 @@
+# compresion.py
+"""
+Compresión de las respuestas según Accept-Encoding (gzip y, si el paquete
+opcional `brotli` está instalado, br).
+
+Se aplica en un after_request a las respuestas de texto o JSON que superan
+COMPRESION_TAMANO_MINIMO. Las respuestas en streaming y las que ya traen
+Content-Encoding (la exportación CSV y /apispec_1.json se comprimen solas) no se
+tocan. Si la respuesta tiene ETag, el cuerpo comprimido se guarda en una caché
+por ruta, ETag, codificación y resumen (SHA-256) del cuerpo sin comprimir: la
+misma respuesta no se vuelve a comprimir, y un ETag repetido con otro cuerpo
+nunca devuelve bytes de una versión anterior.
+"""
+import gzip
+import hashlib
+
+from flask import current_app, g, request
+
+from cache import CacheLRU
+
+# brotli es opcional: sin él solo se ofrece gzip.
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+# Sufijo que se agrega al ETag de cada codificación: cada una es una representación
+# distinta y necesita su propio ETag (RFC 9110, sección 8.8.3). Las vistas que
+# comprimen su propia respuesta (ver codificacion_propia) usan los mismos sufijos.
+SUFIJOS_ETAG = {"br": "br", "gzip": "gz"}
+
+TIPOS_COMPRIMIBLES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+})
+
+
+def codificacion_propia(vista):
+    """
+    Marca una vista que comprime su respuesta y agrega el sufijo de codificación a
+    su ETag por su cuenta: If-None-Match le llega sin modificar.
+    """
+    vista.codificacion_propia = True
+    return vista
+
+
+def comprimir(cuerpo, codificacion, nivel):
+    """Comprime `cuerpo` (bytes) con la codificación indicada ('gzip' o 'br')."""
+    if codificacion == "br":
+        return brotli.compress(cuerpo, quality=nivel)
+    # mtime=0: el mismo cuerpo produce siempre los mismos bytes.
+    return gzip.compress(cuerpo, compresslevel=nivel, mtime=0)
+
+
+class CompresionRespuestas:
+    """Negociación de Content-Encoding y caché de cuerpos comprimidos de una aplicación."""
+
+    def __init__(self, tamano_minimo, nivel_gzip, nivel_brotli, cache_tamano, cache_ttl):
+        self.tamano_minimo = tamano_minimo
+        self.niveles = {"gzip": nivel_gzip, "br": nivel_brotli}
+        self.codificaciones = ("br", "gzip") if brotli is not None else ("gzip",)
+        self.cache = CacheLRU(cache_tamano, cache_ttl)
+
+    @classmethod
+    def desde_configuracion(cls, config):
+        return cls(config['COMPRESION_TAMANO_MINIMO'], config['COMPRESION_NIVEL_GZIP'],
+                   config['COMPRESION_NIVEL_BROTLI'], config['COMPRESION_CACHE_TAMANO'],
+                   config['COMPRESION_CACHE_TTL'])
+
+    def instrumentar_aplicacion(self, app):
+        """Registra los hooks de Flask que negocian y aplican la compresión."""
+        app.before_request(self._normalizar_if_none_match)
+        app.after_request(self._comprimir_respuesta)
+
+    def elegir_codificacion(self):
+        """Devuelve la codificación preferida por el cliente entre las disponibles, o None."""
+        mejor, mejor_calidad = None, 0
+        for codificacion in self.codificaciones:
+            calidad = request.accept_encodings[codificacion]
+            if calidad > mejor_calidad:
+                mejor, mejor_calidad = codificacion, calidad
+        return mejor
+
+    # --- Hooks de Flask ---
+
+    def _normalizar_if_none_match(self):
+        # Las vistas comparan If-None-Match con su propio ETag, sin sufijo de
+        # codificación. Se quita el sufijo antes de que la vista lea el encabezado,
+        # así siguen respondiendo 304 sin generar el cuerpo. Solo el de la codificación
+        # que se negocia para esta respuesta: un ETag "-gz" no corresponde a la
+        # representación sin comprimir que recibe un cliente que ya no acepta gzip.
+        valor = request.environ.get('HTTP_IF_NONE_MATCH')
+        if not valor:
+            return
+        if getattr(current_app.view_functions.get(request.endpoint), 'codificacion_propia', False):
+            return
+        codificacion = self.elegir_codificacion()
+        if codificacion is None:
+            return
+        sufijo = f'-{SUFIJOS_ETAG[codificacion]}"'
+        if sufijo in valor:
+            g._sufijo_etag = sufijo[:-1]
+            request.environ['HTTP_IF_NONE_MATCH'] = valor.replace(sufijo, '"')
+
+    def _comprimir_respuesta(self, respuesta):
+        if respuesta.status_code == 304:
+            return self._restaurar_sufijo_etag(respuesta)
+        if not self._es_comprimible(respuesta):
+            return respuesta
+        cuerpo = respuesta.get_data()
+        if len(cuerpo) < self.tamano_minimo:
+            return respuesta
+        # La respuesta depende de Accept-Encoding aunque este cliente no acepte compresión.
+        respuesta.vary.add('Accept-Encoding')
+        codificacion = self.elegir_codificacion()
+        if codificacion is None:
+            return respuesta
+
+        etag, debil = respuesta.get_etag()
+        # El resumen del cuerpo cuesta mucho menos que comprimirlo, y hace que la caché
+        # no dependa de que las vistas generen ETag únicos.
+        clave = (request.path, etag, codificacion, hashlib.sha256(cuerpo).digest()) if etag else None
+        comprimido = self.cache.obtener(clave) if clave else None
+        if comprimido is None:
+            comprimido = comprimir(cuerpo, codificacion, self.niveles[codificacion])
+            if clave:
+                self.cache.guardar(clave, comprimido)
+
+        respuesta.set_data(comprimido)
+        respuesta.content_encoding = codificacion
+        if etag:
+            respuesta.set_etag(f"{etag}-{SUFIJOS_ETAG[codificacion]}", weak=debil)
+        return respuesta
+
+    @staticmethod
+    def _es_comprimible(respuesta):
+        if not (200 <= respuesta.status_code < 300) or respuesta.status_code in (204, 206):
+            return False
+        if respuesta.direct_passthrough or respuesta.is_streamed or 'Content-Encoding' in respuesta.headers:
+            return False
+        if respuesta.cache_control.no_transform:
+            return False
+        tipo = respuesta.mimetype or ''
+        return tipo.startswith('text/') or tipo in TIPOS_COMPRIMIBLES
+
+    @staticmethod
+    def _restaurar_sufijo_etag(respuesta):
+        # Un 304 lleva el mismo ETag que tendría el 200: si el cliente preguntó por
+        # la versión comprimida, se le devuelve con el sufijo que se le quitó.
+        sufijo = g.pop('_sufijo_etag', None)
+        etag, debil = respuesta.get_etag()
+        if sufijo and etag:
+            respuesta.set_etag(f"{etag}{sufijo}", weak=debil)
+        return respuesta
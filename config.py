@@ -7,11 +7,149 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 class Config:
     # Define la URI para la base de datos SQLite.
     # Se guardará en una carpeta 'instance' dentro del directorio base del proyecto.
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'instance', 'productos.db')
+    # La variable de entorno DATABASE_URL permite usar otra base de datos (por ejemplo,
+    # una base aislada para los benchmarks).
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'instance', 'productos.db')
     
+    # PRAGMA de SQLite que se ejecutan en cada conexión nueva (ver models.configurar_pragmas_sqlite).
+    # El perfil por defecto no cambia el comportamiento de SQLite; ProductionConfig sí.
+    SQLITE_PRAGMAS = {}
+
     # Desactiva el seguimiento de modificaciones de SQLAlchemy, ya que consume recursos y no lo necesitamos.
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # Evita que Flask ordene las claves de los objetos JSON alfabéticamente en las respuestas.
     # Esto mantiene el orden definido en los esquemas o diccionarios.
-    JSON_SORT_KEYS = False
\ No newline at end of file
+    JSON_SORT_KEYS = False
+
+    # Tamaño de página por defecto y máximo para la paginación por cursor de GET /productos.
+    # Limitar el máximo evita que un cliente vuelva a pedir toda la tabla en una sola página.
+    PAGINACION_LIMITE_POR_DEFECTO = 100
+    PAGINACION_LIMITE_MAXIMO = 1000
+
+    # Cantidad de filas que se leen de la base de datos por lote al transmitir
+    # el listado completo en formato NDJSON (modo streaming de GET /productos).
+    STREAM_TAMANO_LOTE = 1000
+
+    # Nivel de compresión gzip (1 a 9) de GET /productos/export cuando el cliente la acepta.
+    # Se comprime mientras se transmite, así que un nivel alto limita el rendimiento.
+    EXPORTACION_NIVEL_GZIP = 6
+
+    # Cantidad máxima de productos aceptados en una sola petición a los endpoints masivos (/productos/bulk).
+    BULK_MAXIMO_ELEMENTOS = 5000
+
+    # Filas por lote (y por commit) de la importación masiva `flask productos import`.
+    IMPORTACION_TAMANO_LOTE = 5000
+    # Caché de páginas de SQLite (en KiB) de la conexión que importa. Con tablas grandes
+    # evita releer los índices del disco en cada lote; 0 deja la caché de la conexión.
+    IMPORTACION_CACHE_SQLITE_KIB = 262144
+
+    # Tamaño de página por defecto de la búsqueda de texto (GET /productos/search).
+    # El máximo es el mismo que el de la paginación por cursor.
+    BUSQUEDA_LIMITE_POR_DEFECTO = 20
+
+    # Caché en memoria de GET /productos/<id>: cantidad máxima de productos guardados
+    # y segundos que una entrada sigue siendo válida. Un valor 0 en cualquiera la desactiva.
+    CACHE_PRODUCTOS_TAMANO = 1024
+    CACHE_PRODUCTOS_TTL = 30
+
+    # Métricas de peticiones y de SQL expuestas en GET /metrics (ver metricas.py).
+    # La variable de entorno METRICAS_HABILITADAS=0 las desactiva.
+    METRICAS_HABILITADAS = os.environ.get('METRICAS_HABILITADAS', '1') != '0'
+
+    # Compresión de las respuestas con gzip (y brotli si está instalado) según
+    # Accept-Encoding (ver compresion.py). Las respuestas de menos de
+    # COMPRESION_TAMANO_MINIMO bytes se envían sin comprimir: el ahorro no compensa el
+    # costo. Los cuerpos comprimidos de las respuestas con ETag se guardan en una caché
+    # de COMPRESION_CACHE_TAMANO entradas (0 la desactiva) durante COMPRESION_CACHE_TTL segundos.
+    COMPRESION_HABILITADA = True
+    COMPRESION_TAMANO_MINIMO = 1024
+    COMPRESION_NIVEL_GZIP = 6
+    COMPRESION_NIVEL_BROTLI = 4
+    COMPRESION_CACHE_TAMANO = 64
+    COMPRESION_CACHE_TTL = 300
+
+    # Perfilado por petición (ver perfilado.py). Con PERFILADO_HABILITADO=1, las
+    # peticiones con el encabezado `X-Perfilado: <PERFILADO_TOKEN>` se ejecutan bajo
+    # cProfile y devuelven, en lugar de la respuesta, un informe JSON con las funciones
+    # más costosas y cada sentencia SQL con su duración y su EXPLAIN QUERY PLAN. Sin
+    # token el encabezado se ignora. Con PERFILADO_DIRECTORIO los informes se guardan
+    # ahí y la respuesta no cambia.
+    PERFILADO_HABILITADO = os.environ.get('PERFILADO_HABILITADO', '0') == '1'
+    PERFILADO_TOKEN = os.environ.get('PERFILADO_TOKEN')
+    PERFILADO_DIRECTORIO = os.environ.get('PERFILADO_DIRECTORIO')
+    PERFILADO_MAX_FUNCIONES = 30
+
+    # Cantidad máxima de sentencias SQL por petición de cada ruta (por endpoint).
+    # Se informa en el perfilado y las pruebas la comprueban con perfilado.presupuesto_sql.
+    # Son para peticiones de tamaño normal: las rutas masivas y `ids` ejecutan una
+    # sentencia por lote (1000 filas por INSERT, TAMANO_LOTE_IN IDs por consulta IN).
+    PERFILADO_PRESUPUESTOS_SQL = {
+        "productos.crear_producto": 3,            # con ID explícito, si ya existe; INSERT y recarga de los valores por defecto
+        "productos.crear_productos_bulk": 1,
+        "productos.obtener_productos": 2,         # validadores de la lista (ETag) y filas
+        "productos.obtener_productos_por_ids": 1,
+        "productos.exportar_productos": 2,
+        "productos.buscar_productos": 1,
+        "productos.obtener_cambios": 2,           # escrituras y lápidas
+        "productos.obtener_estadisticas_inventario": 2,
+        "productos.obtener_producto": 1,
+        "productos.actualizar_producto": 3,       # lectura, UPDATE y recarga tras el commit
+        "productos.eliminar_producto": 2,
+        "productos.actualizar_productos_bulk": 2,
+        "productos.eliminar_productos_bulk": 2,
+        "productos.reservar_stock": 2,            # UPDATE condicional; si falla, consulta si el producto existe (404 o 409)
+        "productos.liberar_stock": 1,
+    }
+
+    # Documentación interactiva con Flasgger en /apidocs/. Desactivarla evita importar
+    # Flasgger y construir su plantilla al crear la aplicación.
+    SWAGGER_HABILITADO = True
+
+    # Especificación OpenAPI pregenerada con `flask productos openapi`. Si el archivo
+    # existe, /apispec_1.json se sirve desde él sin recorrer las rutas (y también
+    # sin Flasgger). Con None, la especificación se genera una vez por proceso.
+    OPENAPI_ARCHIVO = None
+
+
+class ProductionConfig(Config):
+    """
+    Perfil para producción con varios workers (por ejemplo, gunicorn).
+    Se activa con la variable de entorno APP_CONFIG=production.
+    """
+
+    # Pool de conexiones: cada worker reutiliza conexiones abiertas en lugar de abrir
+    # el archivo de la base de datos en cada petición. 'timeout' es el tiempo que el
+    # driver sqlite3 espera un bloqueo antes de fallar con "database is locked".
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": 10,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": 3600,
+        "pool_pre_ping": True,
+        "connect_args": {"timeout": 30, "check_same_thread": False},
+    }
+
+    # WAL permite que los lectores no bloqueen a los escritores ni viceversa (solo los
+    # escritores se serializan entre sí). Con WAL, synchronous=NORMAL es seguro ante
+    # caídas de la aplicación y evita un fsync por commit. busy_timeout hace que un
+    # escritor espere al anterior en lugar de fallar; mmap_size y cache_size (en KiB
+    # si es negativo) reducen lecturas del disco.
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 30000,
+        "mmap_size": 268435456,
+        "cache_size": -65536,
+        "temp_store": "MEMORY",
+    }
+
+    # Generada en el despliegue con `APP_CONFIG=production flask --app app productos openapi`.
+    OPENAPI_ARCHIVO = os.path.join(basedir, 'instance', 'apispec_1.json')
+
+
+# Perfiles disponibles, seleccionables con la variable de entorno APP_CONFIG.
+configuraciones = {
+    "development": Config,
+    "production": ProductionConfig,
+}
\ No newline at end of file
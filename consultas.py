@@ -0,0 +1,215 @@
+# consultas.py
+"""
+Parámetros de la query string de GET /productos (filtros, orden, cursor y
+`fields`) y las consultas que se construyen con ellos.
+
+Los comparten la aplicación WSGI (app.py) y la ASGI (asgi.py), para que las dos
+acepten los mismos parámetros, devuelvan los mismos errores y calculen el mismo
+ETag. Las funciones reciben los parámetros como un mapeo de nombre a valor
+(request.args en Flask) y lanzan ParametroInvalido con el mensaje del error 400.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import math
+from collections import namedtuple
+
+from sqlalchemy import column, func, select, table, tuple_
+
+from models import ENTERO_MAXIMO, Producto
+from serializacion import CAMPOS_PRODUCTO
+
+# Contador de escrituras y lápidas de productos eliminados (DDL_CAMBIOS en models.py).
+productos_secuencia = table('productos_secuencia', column('valor'))
+productos_eliminados = table('productos_eliminados', column('id'), column('secuencia'))
+
+# Columnas por las que se permite ordenar GET /productos; todas tienen índice.
+COLUMNAS_ORDENABLES = {
+    'id': Producto.id,
+    'nombre': Producto.nombre,
+    'precio': Producto.precio,
+    'stock': Producto.stock,
+}
+
+
+class ParametroInvalido(ValueError):
+    """Parámetro de la query string inválido; se responde con 400 y `mensaje`."""
+
+    def __init__(self, mensaje):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+
+
+def leer_entero(parametros, nombre, por_defecto, minimo=None):
+    """Lee un parámetro entero de la query string."""
+    valor = parametros.get(nombre)
+    if valor is None or valor == '':
+        return por_defecto
+    try:
+        entero = int(valor)
+    except ValueError:
+        raise ParametroInvalido(f"El parámetro '{nombre}' debe ser un número entero.")
+    # Fuera del rango de un INTEGER de SQLite el valor no se podría enviar a la consulta.
+    minimo = -ENTERO_MAXIMO if minimo is None else minimo
+    if entero < minimo:
+        raise ParametroInvalido(f"El parámetro '{nombre}' debe ser mayor o igual a {minimo}.")
+    if entero > ENTERO_MAXIMO:
+        raise ParametroInvalido(f"El parámetro '{nombre}' debe ser menor o igual a {ENTERO_MAXIMO}.")
+    return entero
+
+
+def leer_decimal(parametros, nombre):
+    """Lee un parámetro numérico opcional de la query string."""
+    valor = parametros.get(nombre)
+    if valor is None or valor == '':
+        return None
+    try:
+        numero = float(valor)
+    except ValueError:
+        raise ParametroInvalido(f"El parámetro '{nombre}' debe ser un número.")
+    if math.isnan(numero) or math.isinf(numero):
+        raise ParametroInvalido(f"El parámetro '{nombre}' debe ser un número finito.")
+    return numero
+
+
+def leer_campos(parametros):
+    """
+    Lee el parámetro `fields` (campos separados por comas) y devuelve la tupla de
+    campos pedidos en el orden del esquema, o None si no se indicó o se pidieron
+    todos.
+    """
+    valor = parametros.get('fields')
+    if valor is None:
+        return None
+    pedidos = {campo.strip() for campo in valor.split(',') if campo.strip()}
+    if not pedidos or not pedidos <= set(CAMPOS_PRODUCTO):
+        raise ParametroInvalido(f"El parámetro 'fields' debe ser una lista separada por comas de: {', '.join(CAMPOS_PRODUCTO)}.")
+    campos = tuple(campo for campo in CAMPOS_PRODUCTO if campo in pedidos)
+    return None if campos == CAMPOS_PRODUCTO else campos
+
+
+# Filtros, orden y cursor de GET /productos ya validados. Con orden por una columna
+# distinta de id, `valor_cursor` es el valor de esa columna en la última fila de la
+# página anterior (con orden por id es None).
+FiltrosProductos = namedtuple('FiltrosProductos', ('condiciones', 'columna', 'descendente', 'after_id', 'valor_cursor'))
+
+# Tipos JSON válidos del valor de cada columna de orden dentro de un cursor.
+_TIPOS_VALOR_CURSOR = {'nombre': (str,), 'precio': (int, float), 'stock': (int,)}
+
+
+def codificar_cursor(columna, valor, producto_id):
+    """
+    Cursor opaco de una página ordenada por `columna` (distinta de id): el par
+    (valor de la columna, id) de su última fila, en JSON y base64 URL-safe. La
+    página siguiente se compara con ese par, sin volver a leer la fila: así no
+    depende de que el producto siga existiendo ni de que su valor no cambie.
+    """
+    texto = json.dumps([columna.key, valor, producto_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(columna, cursor):
+    """Devuelve el par (valor, id) de un cursor de codificar_cursor() para `columna`."""
+    error = ParametroInvalido("El parámetro 'after_id' debe ser el next_cursor de una página anterior con el mismo 'sort'.")
+    try:
+        nombre, valor, producto_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError, binascii.Error):
+        raise error from None
+    tipos = _TIPOS_VALOR_CURSOR.get(nombre)
+    if (nombre != columna.key or not isinstance(valor, tipos) or isinstance(valor, bool)
+            or not isinstance(producto_id, int) or isinstance(producto_id, bool) or not 0 < producto_id <= ENTERO_MAXIMO
+            or (isinstance(valor, int) and abs(valor) > ENTERO_MAXIMO)
+            or (isinstance(valor, float) and not math.isfinite(valor))):
+        raise error
+    return valor, producto_id
+
+
+def cursor_siguiente(filtros, valor, producto_id):
+    """`next_cursor` de una página cuya última fila tiene ese valor de la columna de orden y ese id."""
+    if filtros.columna is Producto.id:
+        return producto_id
+    return codificar_cursor(filtros.columna, valor, producto_id)
+
+
+def leer_filtros_productos(parametros):
+    """Lee los filtros, el orden (`sort`) y el cursor (`after_id`) de GET /productos."""
+    condiciones = []
+    precio_min = leer_decimal(parametros, 'precio_min')
+    if precio_min is not None:
+        condiciones.append(Producto.precio >= precio_min)
+    precio_max = leer_decimal(parametros, 'precio_max')
+    if precio_max is not None:
+        condiciones.append(Producto.precio <= precio_max)
+    stock_lt = leer_entero(parametros, 'stock_lt', None)
+    if stock_lt is not None:
+        condiciones.append(Producto.stock < stock_lt)
+    nombre_prefix = parametros.get('nombre_prefix')
+    if nombre_prefix:
+        # Rango [prefijo, prefijo + U+10FFFF) en lugar de LIKE 'prefijo%': SQLite solo
+        # usa el índice para LIKE con collation NOCASE, pero sí para comparaciones de rango.
+        condiciones += [Producto.nombre >= nombre_prefix, Producto.nombre < nombre_prefix + '\U0010ffff']
+
+    orden = parametros.get('sort', 'id')
+    descendente = orden.startswith('-')
+    columna = COLUMNAS_ORDENABLES.get(orden.lstrip('-'))
+    if columna is None:
+        raise ParametroInvalido(f"El parámetro 'sort' debe ser uno de: {', '.join(COLUMNAS_ORDENABLES)} (con '-' para orden descendente).")
+
+    # Con orden por id el cursor es el id; con otra columna, el next_cursor opaco de
+    # codificar_cursor(). En los dos casos 0 (o vacío) es la primera página.
+    valor_cursor = None
+    if columna is Producto.id:
+        after_id = leer_entero(parametros, 'after_id', 0, minimo=0)
+    elif parametros.get('after_id') in (None, '', '0'):
+        after_id = 0
+    else:
+        valor_cursor, after_id = decodificar_cursor(columna, parametros['after_id'])
+    return FiltrosProductos(condiciones, columna, descendente, after_id, valor_cursor)
+
+
+def aplicar_filtros(consulta, filtros):
+    """
+    Aplica los filtros, el cursor y el orden a `consulta` (una Query del ORM o un
+    select()).
+
+    El orden siempre termina en `id` para que sea total, y el cursor se traduce
+    en una comparación de tuplas (columna, id) que SQLite resuelve con el índice
+    de la columna de orden, sin OFFSET.
+    """
+    columna, descendente, after_id = filtros.columna, filtros.descendente, filtros.after_id
+    condiciones = list(filtros.condiciones)
+    if after_id:
+        if columna is Producto.id:
+            clave_orden, clave_cursor = Producto.id, after_id
+        else:
+            clave_orden, clave_cursor = tuple_(columna, Producto.id), tuple_(filtros.valor_cursor, after_id)
+        condiciones.append(clave_orden < clave_cursor if descendente else clave_orden > clave_cursor)
+
+    if columna is Producto.id:
+        # Con filtros, "id + 0" impide que SQLite recorra la tabla entera en orden de
+        # clave primaria para evitarse el ordenamiento: así elige el índice del filtro
+        # (búsqueda por rango) y ordena solo las filas que lo cumplen.
+        clave_id = Producto.id + 0 if filtros.condiciones else Producto.id
+        criterios = [clave_id.desc() if descendente else clave_id]
+    else:
+        criterios = [columna.desc(), Producto.id.desc()] if descendente else [columna, Producto.id]
+    return consulta.where(*condiciones).order_by(*criterios)
+
+
+def sentencia_validadores_lista():
+    """
+    Sentencia que lee, sin recorrer ninguna fila, el contador de escrituras
+    (productos_secuencia), que cambia con cada alta, modificación o baja, y
+    MAX(actualizado_en), resuelto con su índice.
+    """
+    return select(select(productos_secuencia.c.valor).scalar_subquery(), func.max(Producto.actualizado_en))
+
+
+def etag_lista(secuencia, ultima_modificacion, query_string, stream):
+    """
+    ETag de GET /productos. Incluye la query string y el formato pedido, porque
+    filtros, páginas y modos distintos producen cuerpos distintos.
+    """
+    clave = f"{secuencia}|{ultima_modificacion}|{query_string}|{stream}"
+    return hashlib.sha1(clave.encode()).hexdigest()
@@ -0,0 +1,75 @@
+# especificacion.py
+"""
+Especificación OpenAPI (/apispec_1.json) precalculada.
+
+Flasgger arma la especificación recorriendo todas las rutas y leyendo el YAML de
+sus docstrings, y la vuelve a codificar en cada petición. Aquí se genera una sola
+vez por proceso (o se lee de un archivo pregenerado con `flask productos openapi`)
+y se guardan los bytes ya codificados, su versión gzip y su ETag.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+
+class EspecificacionPrecalculada:
+    """Cuerpo JSON de la especificación, ya codificado y comprimido, con su ETag."""
+
+    def __init__(self, cuerpo):
+        self.cuerpo = cuerpo
+        # mtime=0 hace que el resultado sea el mismo en cada worker y en cada arranque.
+        self.cuerpo_gzip = gzip.compress(cuerpo, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha256(cuerpo).hexdigest()[:32]
+
+    @classmethod
+    def desde_diccionario(cls, especificacion):
+        return cls(json.dumps(especificacion, sort_keys=True, separators=(",", ":")).encode())
+
+    @classmethod
+    def desde_archivo(cls, ruta):
+        with open(ruta, 'rb') as archivo:
+            return cls(archivo.read())
+
+    def guardar(self, ruta):
+        """Escribe el JSON en `ruta` de forma atómica (los workers pueden estar leyéndolo)."""
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'wb') as archivo:
+            archivo.write(self.cuerpo)
+        os.replace(temporal, ruta)
+
+
+class FuenteEspecificacion:
+    """
+    Obtiene la especificación la primera vez que se pide y la conserva en memoria.
+
+    Si `archivo` existe se usa ese JSON pregenerado, sin recorrer las rutas; si no,
+    se genera con `generar` (una función que devuelve el diccionario de Flasgger).
+    Es segura para usar desde varios hilos.
+    """
+
+    def __init__(self, generar=None, archivo=None):
+        self.generar = generar
+        self.archivo = archivo
+        self._especificacion = None
+        self._lock = threading.Lock()
+
+    @property
+    def disponible(self):
+        return self.generar is not None or (self.archivo is not None and os.path.exists(self.archivo))
+
+    def obtener(self):
+        """Devuelve la EspecificacionPrecalculada, o None si no hay de dónde obtenerla."""
+        if self._especificacion is None:
+            with self._lock:
+                if self._especificacion is None:
+                    self._especificacion = self._cargar()
+        return self._especificacion
+
+    def _cargar(self):
+        if self.archivo is not None and os.path.exists(self.archivo):
+            return EspecificacionPrecalculada.desde_archivo(self.archivo)
+        if self.generar is not None:
+            return EspecificacionPrecalculada.desde_diccionario(self.generar())
+        return None
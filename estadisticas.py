@@ -0,0 +1,79 @@
+# estadisticas.py
+"""
+Estadísticas del inventario para GET /productos/estadisticas.
+
+Se leen de las tablas de agregados que mantienen los triggers de SQLite (ver
+DDL_ESTADISTICAS en models.py), así que la consulta cuesta lo mismo con diez
+productos que con un millón. calcular_estadisticas() hace el recuento completo
+y se usa para verificar esos agregados.
+"""
+import math
+
+from sqlalchemy import text
+
+from models import LIMITES_PRECIO, SQL_RECONSTRUIR_ESTADISTICAS, expresion_limite_precio
+
+
+def _armar(cantidad, valor_inventario, sin_stock, cantidades_por_limite):
+    distribucion = []
+    for posicion, limite in enumerate(LIMITES_PRECIO):
+        distribucion.append({
+            "limite_inferior": limite,
+            "limite_superior": LIMITES_PRECIO[posicion + 1] if posicion + 1 < len(LIMITES_PRECIO) else None,
+            "cantidad": cantidades_por_limite.get(float(limite), 0),
+        })
+    return {
+        "cantidad_productos": cantidad,
+        "valor_inventario": round(valor_inventario, 2),
+        "sin_stock": sin_stock,
+        "distribucion_precios": distribucion,
+    }
+
+
+def leer_estadisticas(conexion):
+    """Lee las estadísticas de las tablas de agregados (sin recorrer los productos)."""
+    cantidad, valor_inventario, sin_stock = conexion.execute(text(
+        "SELECT cantidad, valor_inventario, sin_stock FROM productos_estadisticas WHERE id = 1"
+    )).one()
+    por_limite = conexion.execute(text("SELECT limite_inferior, cantidad FROM productos_estadisticas_precios"))
+    return _armar(cantidad, valor_inventario, sin_stock, {float(limite): n for limite, n in por_limite})
+
+
+def calcular_estadisticas(conexion):
+    """Calcula las estadísticas recorriendo toda la tabla de productos."""
+    cantidad, valor_inventario, sin_stock = conexion.execute(text(
+        "SELECT COUNT(*), COALESCE(SUM(precio * stock), 0), COALESCE(SUM(stock <= 0), 0) FROM productos"
+    )).one()
+    por_limite = conexion.execute(text(
+        f"SELECT {expresion_limite_precio('precio')} AS limite, COUNT(*) FROM productos GROUP BY limite"
+    ))
+    return _armar(cantidad, valor_inventario, sin_stock, {float(limite): n for limite, n in por_limite})
+
+
+def reconstruir_estadisticas(conexion):
+    """Vuelve a calcular las tablas de agregados desde la tabla de productos."""
+    for sentencia in SQL_RECONSTRUIR_ESTADISTICAS:
+        conexion.execute(text(sentencia))
+
+
+def diferencias_estadisticas(guardadas, calculadas):
+    """
+    Compara las estadísticas guardadas con un recálculo completo y devuelve la
+    lista de diferencias (vacía si coinciden). El valor del inventario es una suma
+    de números de punto flotante que los triggers acumulan en otro orden, así que
+    se admite una diferencia de hasta un centavo o, en inventarios grandes, del
+    error relativo de esa suma.
+    """
+    diferencias = []
+    for campo in ("cantidad_productos", "valor_inventario", "sin_stock"):
+        if campo == "valor_inventario":
+            coinciden = math.isclose(guardadas[campo], calculadas[campo], rel_tol=1e-9, abs_tol=0.01)
+        else:
+            coinciden = guardadas[campo] == calculadas[campo]
+        if not coinciden:
+            diferencias.append(f"{campo}: guardado {guardadas[campo]}, calculado {calculadas[campo]}")
+    for guardado, calculado in zip(guardadas["distribucion_precios"], calculadas["distribucion_precios"]):
+        if guardado["cantidad"] != calculado["cantidad"]:
+            diferencias.append(f"precios desde {guardado['limite_inferior']}: "
+                               f"guardado {guardado['cantidad']}, calculado {calculado['cantidad']}")
+    return diferencias
@@ -0,0 +1,211 @@
+# importacion.py
+"""
+Importación masiva de productos desde archivos CSV o NDJSON
+(comando `flask productos import`, ver comandos.py).
+
+El archivo se lee fila por fila y se procesa en lotes de tamaño fijo, así que la
+memoria usada no depende del tamaño del archivo. Cada lote se valida con
+ProductoSchema y se inserta con una sola sentencia y un commit. Las filas
+inválidas se informan y no detienen la importación.
+"""
+import csv
+import json
+import time
+
+from flask import current_app
+from marshmallow.exceptions import ValidationError
+from sqlalchemy import insert, select, func, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Producto, SQL_INDEXAR_LOTE_IMPORTADO, ahora_utc
+from schemas import productos_importacion_schema
+
+FORMATOS = ("csv", "ndjson")
+
+SQL_INSERTAR_PRODUCTO = (
+    "INSERT INTO productos (nombre, descripcion, precio, stock, version, actualizado_en, secuencia) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def detectar_formato(ruta):
+    """Deduce el formato por la extensión del archivo."""
+    if ruta.lower().endswith(".csv"):
+        return "csv"
+    if ruta.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+
+def leer_filas(archivo, formato):
+    """
+    Genera (número de línea, fila) para cada registro del archivo. Si una línea de
+    NDJSON no se puede interpretar, la fila es el mensaje de error (una cadena).
+    """
+    if formato == "csv":
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            # Las celdas vacías se tratan como campos ausentes (por ejemplo, sin id o sin descripción).
+            yield lector.line_num, {campo: valor for campo, valor in fila.items() if campo is not None and valor != ''}
+        return
+    for numero, linea in enumerate(archivo, start=1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError as err:
+            yield numero, f"JSON inválido: {err}"
+            continue
+        yield numero, fila if isinstance(fila, dict) else "Se esperaba un objeto JSON."
+
+
+class ResumenImportacion:
+    """Totales de una importación."""
+
+    def __init__(self):
+        self.importadas = 0
+        self.rechazadas = 0
+        self.lotes = 0
+        self.segundos = 0.0
+
+    @property
+    def filas_por_segundo(self):
+        return (self.importadas + self.rechazadas) / self.segundos if self.segundos else 0.0
+
+
+def _validar_lote(lote):
+    """
+    Valida un lote de (número de línea, fila) con ProductoSchema. Devuelve los
+    diccionarios válidos y la lista de (número de línea, errores) de los rechazados.
+    """
+    rechazos = [(numero, {"_schema": [fila]}) for numero, fila in lote if isinstance(fila, str)]
+    lote = [(numero, fila) for numero, fila in lote if not isinstance(fila, str)]
+    try:
+        validos = productos_importacion_schema.load([fila for _, fila in lote])
+        errores = {}
+    except ValidationError as err:
+        errores = err.messages
+        # Las filas sin errores se vuelven a cargar (valid_data puede tener campos a medias).
+        validos = productos_importacion_schema.load([fila for posicion, (_, fila) in enumerate(lote) if posicion not in errores])
+
+    rechazos.extend((numero, errores[posicion]) for posicion, (numero, _) in enumerate(lote) if posicion in errores)
+    return validos, rechazos
+
+
+def _insertar_lote(filas, upsert):
+    tabla = Producto.__table__
+    if upsert:
+        # Las filas con id actualizan el producto existente; los triggers mantienen la
+        # búsqueda de texto y las estadísticas fila por fila.
+        sentencia = sqlite_insert(tabla)
+        sentencia = sentencia.on_conflict_do_update(index_elements=[tabla.c.id], set_={
+            "nombre": sentencia.excluded.nombre,
+            "descripcion": sentencia.excluded.descripcion,
+            "precio": sentencia.excluded.precio,
+            "stock": sentencia.excluded.stock,
+            "version": tabla.c.version + 1,
+            "actualizado_en": sentencia.excluded.actualizado_en,
+        })
+        # Con y sin id en el mismo executemany, SQLAlchemy exigiría las mismas claves en todas las filas.
+        con_id = [fila for fila in filas if 'id' in fila]
+        sin_id = [fila for fila in filas if 'id' not in fila]
+        if con_id:
+            db.session.execute(sentencia, con_id)
+            # Como en PATCH /productos/bulk, se invalida la caché de GET /productos/<id>
+            # de este proceso (los demás workers la renuevan al vencer el TTL).
+            cache = current_app.extensions['cache_productos']
+            for fila in con_id:
+                cache.invalidar(fila['id'])
+        if sin_id:
+            db.session.execute(insert(tabla), sin_id)
+        return
+
+    # Sin upsert el id del archivo se ignora y la base asigna uno nuevo, siempre mayor que
+    # los existentes, así que las filas del lote son las de id > id_previo. Los triggers
+    # de inserción se suspenden dentro de esta transacción y el lote se indexa de una vez.
+    # Las filas se pasan al driver como tuplas, sin el procesamiento por fila de
+    # SQLAlchemy (valores por defecto y conversión de tipos), y todas las del lote
+    # comparten la fecha de actualización. Cada fila lleva ya su secuencia de cambios
+    # (las siguientes del contador), que el trigger asignaría con un UPDATE por fila.
+    conexion = db.session.connection()
+    # La fila de la bandera toma el bloqueo de escritura: desde aquí ninguna otra
+    # conexión puede insertar, así que id_previo y el contador no cambian.
+    conexion.exec_driver_sql("INSERT INTO productos_importacion (id) VALUES (1)")
+    id_previo = conexion.execute(select(func.coalesce(func.max(tabla.c.id), 0))).scalar_one()
+    secuencia_previa = conexion.exec_driver_sql("SELECT valor FROM productos_secuencia").scalar_one()
+    actualizado_en = ahora_utc().isoformat(sep=' ', timespec='microseconds')
+    valores = [
+        (fila['nombre'], fila.get('descripcion'), fila['precio'], fila['stock'], 1, actualizado_en, secuencia)
+        for secuencia, fila in enumerate(filas, start=secuencia_previa + 1)
+    ]
+    conexion.exec_driver_sql(SQL_INSERTAR_PRODUCTO, valores)
+    conexion.exec_driver_sql("DELETE FROM productos_importacion")
+    for sentencia in SQL_INDEXAR_LOTE_IMPORTADO:
+        conexion.execute(text(sentencia), {"id_previo": id_previo})
+
+
+def _fijar_cache_sqlite(cache_kib):
+    """
+    Agranda la caché de páginas de la conexión mientras dura la importación y
+    devuelve el valor anterior (None si no aplica). Con tablas grandes, la mayor
+    parte del costo de insertar es mantener los índices secundarios, y con la caché
+    por defecto (2 MiB) sus páginas se vuelven a leer del disco en cada lote.
+    """
+    if not cache_kib or db.engine.dialect.name != "sqlite":
+        return None
+    conexion = db.session.connection()
+    previo = conexion.exec_driver_sql("PRAGMA cache_size").scalar()
+    conexion.exec_driver_sql(f"PRAGMA cache_size = -{int(cache_kib)}")
+    return previo
+
+
+def importar_productos(filas, tamano_lote, upsert=False, al_rechazar=None, al_terminar_lote=None, cache_kib=None):
+    """
+    Importa las filas (pares de número de línea y diccionario, ver leer_filas) en
+    lotes de `tamano_lote`, con un commit por lote. Llama a `al_rechazar(numero,
+    errores)` por cada fila inválida y a `al_terminar_lote(resumen)` tras cada
+    commit. Con `cache_kib`, la caché de SQLite de la conexión se agranda a ese
+    tamaño durante la importación. Devuelve un ResumenImportacion.
+    """
+    resumen = ResumenImportacion()
+    inicio = time.perf_counter()
+    cache_previa = _fijar_cache_sqlite(cache_kib)
+
+    def procesar(lote):
+        aceptados, rechazos = _validar_lote(lote)
+        if aceptados:
+            try:
+                if cache_previa is not None:
+                    # El commit devuelve la conexión al pool; en un proceso de un solo hilo
+                    # se vuelve a obtener la misma, y repetir el PRAGMA no vacía la caché.
+                    db.session.connection().exec_driver_sql(f"PRAGMA cache_size = -{int(cache_kib)}")
+                _insertar_lote(aceptados, upsert)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        resumen.importadas += len(aceptados)
+        resumen.rechazadas += len(rechazos)
+        resumen.lotes += 1
+        resumen.segundos = time.perf_counter() - inicio
+        if al_rechazar is not None:
+            for numero, errores in rechazos:
+                al_rechazar(numero, errores)
+        if al_terminar_lote is not None:
+            al_terminar_lote(resumen)
+
+    try:
+        lote = []
+        for numero_y_fila in filas:
+            lote.append(numero_y_fila)
+            if len(lote) >= tamano_lote:
+                procesar(lote)
+                lote = []
+        if lote:
+            procesar(lote)
+    finally:
+        if cache_previa is not None:
+            db.session.connection().exec_driver_sql(f"PRAGMA cache_size = {int(cache_previa)}")
+            db.session.commit()
+    resumen.segundos = time.perf_counter() - inicio
+    return resumen
@@ -0,0 +1,210 @@
+# metricas.py
+"""
+Métricas de la aplicación en el formato de texto de Prometheus.
+
+Implementación mínima (contadores, medidores e histogramas con etiquetas) para
+no depender de prometheus_client. Las métricas son de proceso: con varios
+workers, Prometheus debe consultar cada uno o agregarlas por instancia.
+"""
+import bisect
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+
+# Límites superiores (en segundos) de los buckets de los histogramas.
+BUCKETS_PETICIONES = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SQL = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _formatear_valor(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor)
+
+
+def _formatear_etiquetas(nombres, valores, extra=()):
+    pares = [*zip(nombres, valores), *extra]
+    if not pares:
+        return ''
+    texto = ','.join(
+        '{}="{}"'.format(nombre, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for nombre, valor in pares
+    )
+    return '{' + texto + '}'
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, descripcion, etiquetas=()):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}  # tupla de valores de etiquetas -> valor
+        self._lock = threading.Lock()
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.descripcion}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self._lock:
+            valores = sorted(self._valores.items())
+        for etiquetas, valor in valores:
+            lineas.extend(self._lineas(etiquetas, valor))
+        return lineas
+
+    def _lineas(self, etiquetas, valor):
+        return [f"{self.nombre}{_formatear_etiquetas(self.etiquetas, etiquetas)} {_formatear_valor(valor)}"]
+
+
+class Contador(_Metrica):
+    """Valor que solo aumenta (por ejemplo, peticiones atendidas)."""
+    tipo = 'counter'
+
+    def incrementar(self, *etiquetas, cantidad=1):
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + cantidad
+
+    def valor(self, *etiquetas):
+        with self._lock:
+            return self._valores.get(etiquetas, 0)
+
+
+class Medidor(Contador):
+    """Valor que sube y baja (por ejemplo, peticiones en curso)."""
+    tipo = 'gauge'
+
+    def decrementar(self, *etiquetas, cantidad=1):
+        self.incrementar(*etiquetas, cantidad=-cantidad)
+
+
+class Histograma(_Metrica):
+    """Distribución de observaciones (por ejemplo, duraciones) en buckets acumulativos."""
+    tipo = 'histogram'
+
+    def __init__(self, nombre, descripcion, etiquetas=(), buckets=BUCKETS_PETICIONES):
+        super().__init__(nombre, descripcion, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, *etiquetas):
+        # Se guarda la cuenta de cada bucket sin acumular; se acumula al exponer.
+        posicion = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._valores.get(etiquetas)
+            if serie is None:
+                serie = self._valores[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][posicion] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def cantidad(self, *etiquetas):
+        with self._lock:
+            serie = self._valores.get(etiquetas)
+            return serie[2] if serie else 0
+
+    def _lineas(self, etiquetas, serie):
+        cuentas, suma, cantidad = serie
+        lineas = []
+        acumulado = 0
+        for limite, cuenta in zip((*self.buckets, float('inf')), cuentas):
+            acumulado += cuenta
+            etiquetas_bucket = _formatear_etiquetas(self.etiquetas, etiquetas, [('le', _formatear_valor(limite))])
+            lineas.append(f"{self.nombre}_bucket{etiquetas_bucket} {acumulado}")
+        texto_etiquetas = _formatear_etiquetas(self.etiquetas, etiquetas)
+        lineas.append(f"{self.nombre}_sum{texto_etiquetas} {_formatear_valor(suma)}")
+        lineas.append(f"{self.nombre}_count{texto_etiquetas} {cantidad}")
+        return lineas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas que se exponen juntas en /metrics."""
+
+    def __init__(self):
+        self._metricas = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def exponer(self):
+        """Devuelve todas las métricas en el formato de texto de Prometheus."""
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+class MetricasAPI(RegistroMetricas):
+    """Métricas de las peticiones HTTP y de las sentencias SQL de la API."""
+
+    def __init__(self):
+        super().__init__()
+        self.duracion_peticiones = self.registrar(Histograma(
+            'productos_http_duracion_segundos', 'Duración de las peticiones HTTP por ruta.',
+            ('metodo', 'ruta'), BUCKETS_PETICIONES))
+        self.peticiones_en_curso = self.registrar(Medidor(
+            'productos_http_peticiones_en_curso', 'Peticiones HTTP que se están atendiendo.', ('metodo', 'ruta')))
+        self.respuestas = self.registrar(Contador(
+            'productos_http_respuestas_total', 'Respuestas HTTP por ruta y código de estado.',
+            ('metodo', 'ruta', 'estado')))
+        self.sentencias_sql = self.registrar(Contador(
+            'productos_sql_sentencias_total', 'Sentencias SQL ejecutadas por tipo.', ('operacion',)))
+        self.duracion_sql = self.registrar(Histograma(
+            'productos_sql_duracion_segundos', 'Duración de las sentencias SQL por tipo.', ('operacion',), BUCKETS_SQL))
+
+    def instrumentar_aplicacion(self, app):
+        """Registra los hooks de Flask que miden cada petición."""
+        app.before_request(self._antes_de_peticion)
+        app.after_request(self._despues_de_peticion)
+        app.teardown_request(self._al_terminar_peticion)
+
+    def instrumentar_motor(self, engine):
+        """Registra los eventos de SQLAlchemy que miden cada sentencia SQL."""
+        event.listen(engine, 'before_cursor_execute', self._antes_de_sentencia)
+        event.listen(engine, 'after_cursor_execute', self._despues_de_sentencia)
+
+    # --- Hooks de Flask ---
+
+    @staticmethod
+    def _ruta_actual():
+        # Se usa la regla (por ejemplo /productos/<int:id>) y no la URL, para que
+        # la cantidad de series no crezca con cada ID consultado.
+        return request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+
+    def _antes_de_peticion(self):
+        g._metricas = (time.perf_counter(), request.method, self._ruta_actual())
+        self.peticiones_en_curso.incrementar(request.method, g._metricas[2])
+
+    def _despues_de_peticion(self, respuesta):
+        datos = g.get('_metricas')
+        if datos is not None:
+            inicio, metodo, ruta = datos
+            self.duracion_peticiones.observar(time.perf_counter() - inicio, metodo, ruta)
+            self.respuestas.incrementar(metodo, ruta, str(respuesta.status_code))
+        return respuesta
+
+    def _al_terminar_peticion(self, error=None):
+        # teardown_request se ejecuta siempre, incluso si la petición falló, así
+        # que aquí se descuenta la petición en curso.
+        datos = g.pop('_metricas', None)
+        if datos is not None:
+            self.peticiones_en_curso.decrementar(datos[1], datos[2])
+
+    # --- Eventos de SQLAlchemy ---
+
+    @staticmethod
+    def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metricas_inicio = time.perf_counter()
+
+    def _despues_de_sentencia(self, conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, '_metricas_inicio', None)
+        if inicio is None:
+            return
+        operacion = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTRA'
+        self.sentencias_sql.incrementar(operacion)
+        self.duracion_sql.observar(time.perf_counter() - inicio, operacion)
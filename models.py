@@ -1,10 +1,22 @@
 # models.py
+from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, text
+from sqlalchemy.schema import CreateColumn
 
 # Inicializa la extensión SQLAlchemy.
 # La vinculación a la aplicación Flask se hará en app.py usando db.init_app(app).
 db = SQLAlchemy()
 
+# Mayor valor de una columna INTEGER de SQLite (entero con signo de 64 bits). Un
+# entero de Python más grande no se puede enviar como parámetro (OverflowError), así
+# que los IDs y enteros de la entrada se validan contra este límite.
+ENTERO_MAXIMO = 2**63 - 1
+
+def ahora_utc():
+    # SQLite no guarda zona horaria: las fechas se almacenan en UTC sin tzinfo.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class Producto(db.Model):
     # Define el nombre de la tabla en la base de datos.
     __tablename__ = 'productos'
@@ -14,17 +26,260 @@ class Producto(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     
     # nombre: Cadena de texto (máx 100 caracteres), campo obligatorio.
-    nombre = db.Column(db.String(100), nullable=False)
+    # Indexado para filtrar por prefijo y ordenar por nombre en GET /productos.
+    nombre = db.Column(db.String(100), nullable=False, index=True)
     
     # descripcion: Cadena de texto (máx 255 caracteres), campo opcional.
     descripcion = db.Column(db.String(255), nullable=True)
     
     # precio: Número flotante, campo obligatorio.
-    precio = db.Column(db.Float, nullable=False)
+    # Indexado para filtrar por rango de precio y ordenar por precio.
+    precio = db.Column(db.Float, nullable=False, index=True)
     
     # stock: Entero, campo obligatorio.
-    stock = db.Column(db.Integer, nullable=False)
+    # Indexado para filtrar productos con poco stock (stock_lt) y ordenar por stock.
+    stock = db.Column(db.Integer, nullable=False, index=True)
+
+    # version: Entero que se incrementa en la base de datos con cada UPDATE
+    # (incluidos los masivos). Vuelve a 1 si el ID se reutiliza, así que el ETag de
+    # GET /productos/<id> usa la secuencia, que no se repite.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                        onupdate=text('version + 1'))
+
+    # actualizado_en: Fecha (UTC) de la última escritura; se devuelve como Last-Modified.
+    # Indexado para que MAX(actualizado_en), usado en el ETag de la lista, no recorra la tabla.
+    actualizado_en = db.Column(db.DateTime, nullable=False, default=ahora_utc, onupdate=ahora_utc,
+                               server_default='1970-01-01 00:00:00.000000', index=True)
+
+    # secuencia: Número de la última escritura del producto, único y creciente en toda
+    # la tabla. Lo asignan los triggers de DDL_CAMBIOS (ver GET /productos/cambios).
+    # Indexado para leer los cambios posteriores a una secuencia sin recorrer la tabla.
+    # También forma el ETag de GET /productos/<id>.
+    secuencia = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
 
     def __repr__(self):
         # Representación en cadena del objeto Producto, útil para debugging.
-        return f'<Producto {self.id}: {self.nombre}>'
\ No newline at end of file
+        return f'<Producto {self.id}: {self.nombre}>'
+
+def configurar_pragmas_sqlite(engine, pragmas):
+    # Ejecuta los PRAGMA indicados en cada conexión nueva del pool. Se hace con el
+    # evento 'connect' porque la mayoría de los PRAGMA valen solo para la conexión actual.
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _aplicar_pragmas(conexion_dbapi, registro_conexion):
+        cursor = conexion_dbapi.cursor()
+        for nombre, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nombre} = {valor}")
+        cursor.close()
+
+# Mientras esta tabla tiene una fila, los triggers de inserción de la búsqueda de texto
+# y de las estadísticas no se ejecutan. La importación masiva (importacion.py) la usa
+# dentro de la transacción de cada lote, que después indexa con SQL_INDEXAR_LOTE_IMPORTADO:
+# como la fila se borra antes del commit, ninguna otra conexión llega a verla.
+DDL_IMPORTACION = "CREATE TABLE productos_importacion (id INTEGER PRIMARY KEY)"
+CONDICION_SIN_IMPORTACION = "WHEN NOT EXISTS (SELECT 1 FROM productos_importacion)"
+
+TRIGGER_FTS_INSERTAR = f"""CREATE TRIGGER productos_fts_insertar AFTER INSERT ON productos
+    {CONDICION_SIN_IMPORTACION} BEGIN
+        INSERT INTO productos_fts(rowid, nombre, descripcion) VALUES (new.id, new.nombre, new.descripcion);
+    END"""
+
+# Tabla virtual FTS5 de contenido externo: indexa nombre y descripcion de 'productos'
+# sin duplicar los datos. Los triggers la mantienen sincronizada ante cualquier
+# INSERT, UPDATE o DELETE, incluidas las sentencias masivas de /productos/bulk.
+# remove_diacritics permite que "optico" encuentre "Óptico".
+DDL_BUSQUEDA_TEXTO = (
+    """CREATE VIRTUAL TABLE productos_fts USING fts5(
+        nombre, descripcion,
+        content='productos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    TRIGGER_FTS_INSERTAR,
+    """CREATE TRIGGER productos_fts_eliminar AFTER DELETE ON productos BEGIN
+        INSERT INTO productos_fts(productos_fts, rowid, nombre, descripcion) VALUES ('delete', old.id, old.nombre, old.descripcion);
+    END""",
+    """CREATE TRIGGER productos_fts_actualizar AFTER UPDATE OF nombre, descripcion ON productos BEGIN
+        INSERT INTO productos_fts(productos_fts, rowid, nombre, descripcion) VALUES ('delete', old.id, old.nombre, old.descripcion);
+        INSERT INTO productos_fts(rowid, nombre, descripcion) VALUES (new.id, new.nombre, new.descripcion);
+    END""",
+    # Indexa las filas que ya existieran antes de crear la tabla de búsqueda.
+    "INSERT INTO productos_fts(productos_fts) VALUES ('rebuild')",
+)
+
+# Límites inferiores de los rangos de precio de GET /productos/estadisticas. Cada
+# producto cuenta en el rango del mayor límite que no supera su precio.
+LIMITES_PRECIO = (0, 10, 50, 100, 500, 1000, 5000)
+
+def expresion_limite_precio(precio):
+    """Expresión SQL con el límite inferior del rango de precio de `precio`."""
+    casos = " ".join(f"WHEN {precio} >= {limite} THEN {limite}" for limite in reversed(LIMITES_PRECIO[1:]))
+    return f"(CASE {casos} ELSE {LIMITES_PRECIO[0]} END)"
+
+# Recalcula las tablas de agregados desde 'productos' (recorre la tabla completa).
+SQL_RECONSTRUIR_ESTADISTICAS = (
+    "DELETE FROM productos_estadisticas",
+    """INSERT INTO productos_estadisticas (id, cantidad, valor_inventario, sin_stock)
+        SELECT 1, COUNT(*), COALESCE(SUM(precio * stock), 0), COALESCE(SUM(stock <= 0), 0) FROM productos""",
+    "DELETE FROM productos_estadisticas_precios",
+    "INSERT INTO productos_estadisticas_precios (limite_inferior, cantidad) VALUES "
+    + ", ".join(f"({limite}, 0)" for limite in LIMITES_PRECIO),
+    f"""INSERT INTO productos_estadisticas_precios (limite_inferior, cantidad)
+        SELECT {expresion_limite_precio('precio')} AS limite, COUNT(*) FROM productos WHERE true GROUP BY limite
+        ON CONFLICT (limite_inferior) DO UPDATE SET cantidad = excluded.cantidad""",
+)
+
+TRIGGER_ESTADISTICAS_INSERTAR = f"""CREATE TRIGGER productos_estadisticas_insertar AFTER INSERT ON productos
+    {CONDICION_SIN_IMPORTACION} BEGIN
+        UPDATE productos_estadisticas SET cantidad = cantidad + 1,
+            valor_inventario = valor_inventario + new.precio * new.stock,
+            sin_stock = sin_stock + (new.stock <= 0);
+        UPDATE productos_estadisticas_precios SET cantidad = cantidad + 1
+            WHERE limite_inferior = {expresion_limite_precio('new.precio')};
+    END"""
+
+# Agregados del inventario (cantidad de productos, valor total, productos sin stock
+# y cantidad por rango de precio) para que GET /productos/estadisticas no recorra la
+# tabla. Igual que con la búsqueda de texto, los triggers los mantienen al día ante
+# cualquier escritura: rutas individuales, masivas, reservas de stock o SQL directo.
+DDL_ESTADISTICAS = (
+    """CREATE TABLE productos_estadisticas (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        cantidad INTEGER NOT NULL,
+        valor_inventario REAL NOT NULL,
+        sin_stock INTEGER NOT NULL
+    )""",
+    """CREATE TABLE productos_estadisticas_precios (
+        limite_inferior REAL PRIMARY KEY,
+        cantidad INTEGER NOT NULL
+    )""",
+    TRIGGER_ESTADISTICAS_INSERTAR,
+    f"""CREATE TRIGGER productos_estadisticas_eliminar AFTER DELETE ON productos BEGIN
+        UPDATE productos_estadisticas SET cantidad = cantidad - 1,
+            valor_inventario = valor_inventario - old.precio * old.stock,
+            sin_stock = sin_stock - (old.stock <= 0);
+        UPDATE productos_estadisticas_precios SET cantidad = cantidad - 1
+            WHERE limite_inferior = {expresion_limite_precio('old.precio')};
+    END""",
+    f"""CREATE TRIGGER productos_estadisticas_actualizar AFTER UPDATE OF precio, stock ON productos BEGIN
+        UPDATE productos_estadisticas SET
+            valor_inventario = valor_inventario - old.precio * old.stock + new.precio * new.stock,
+            sin_stock = sin_stock - (old.stock <= 0) + (new.stock <= 0);
+        UPDATE productos_estadisticas_precios SET cantidad = cantidad - 1
+            WHERE limite_inferior = {expresion_limite_precio('old.precio')};
+        UPDATE productos_estadisticas_precios SET cantidad = cantidad + 1
+            WHERE limite_inferior = {expresion_limite_precio('new.precio')};
+    END""",
+    # Calcula los agregados de las filas que ya existieran.
+    *SQL_RECONSTRUIR_ESTADISTICAS,
+)
+
+TRIGGER_CAMBIOS_INSERTAR = f"""CREATE TRIGGER productos_cambios_insertar AFTER INSERT ON productos
+    {CONDICION_SIN_IMPORTACION} BEGIN
+        UPDATE productos_secuencia SET valor = valor + 1;
+        UPDATE productos SET secuencia = (SELECT valor FROM productos_secuencia) WHERE id = new.id;
+        DELETE FROM productos_eliminados WHERE id = new.id;
+    END"""
+
+# Registro de cambios para la sincronización incremental (GET /productos/cambios).
+# Cada alta o modificación asigna al producto el siguiente valor del contador
+# productos_secuencia, y cada baja deja una lápida en productos_eliminados con su
+# propio valor. SQLite admite un solo escritor a la vez, así que las secuencias se
+# confirman en orden: un lector nunca ve una secuencia mayor antes que una menor.
+# La lápida de un id se borra si el id se vuelve a usar.
+DDL_CAMBIOS = (
+    """CREATE TABLE productos_secuencia (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        valor INTEGER NOT NULL
+    )""",
+    """CREATE TABLE productos_eliminados (
+        id INTEGER PRIMARY KEY,
+        secuencia INTEGER NOT NULL
+    )""",
+    "CREATE INDEX ix_productos_eliminados_secuencia ON productos_eliminados (secuencia)",
+    # Las filas que ya existieran reciben secuencias en el orden de su id.
+    "UPDATE productos SET secuencia = id",
+    "INSERT INTO productos_secuencia (id, valor) SELECT 1, COALESCE(MAX(secuencia), 0) FROM productos",
+    TRIGGER_CAMBIOS_INSERTAR,
+    """CREATE TRIGGER productos_cambios_actualizar AFTER UPDATE OF nombre, descripcion, precio, stock ON productos BEGIN
+        UPDATE productos_secuencia SET valor = valor + 1;
+        UPDATE productos SET secuencia = (SELECT valor FROM productos_secuencia) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER productos_cambios_eliminar AFTER DELETE ON productos BEGIN
+        UPDATE productos_secuencia SET valor = valor + 1;
+        INSERT OR REPLACE INTO productos_eliminados (id, secuencia) VALUES (old.id, (SELECT valor FROM productos_secuencia));
+    END""",
+)
+
+# Lo que harían los triggers de inserción, aplicado de una vez a las filas importadas
+# en un lote (las de id mayor que :id_previo). Indexar el lote con un solo
+# INSERT ... SELECT es varias veces más rápido que hacerlo fila por fila.
+SQL_INDEXAR_LOTE_IMPORTADO = (
+    """INSERT INTO productos_fts(rowid, nombre, descripcion)
+        SELECT id, nombre, descripcion FROM productos WHERE id > :id_previo""",
+    """UPDATE productos_estadisticas SET
+        cantidad = cantidad + (SELECT COUNT(*) FROM productos WHERE id > :id_previo),
+        valor_inventario = valor_inventario + (SELECT COALESCE(SUM(precio * stock), 0) FROM productos WHERE id > :id_previo),
+        sin_stock = sin_stock + (SELECT COALESCE(SUM(stock <= 0), 0) FROM productos WHERE id > :id_previo)""",
+    f"""UPDATE productos_estadisticas_precios SET cantidad = cantidad + (
+        SELECT COUNT(*) FROM productos
+        WHERE id > :id_previo AND {expresion_limite_precio('precio')} = productos_estadisticas_precios.limite_inferior
+    )""",
+    # importacion.py ya insertó las filas con secuencias consecutivas a partir del
+    # valor del contador; aquí solo se avanza el contador.
+    "UPDATE productos_secuencia SET valor = valor + (SELECT COUNT(*) FROM productos WHERE id > :id_previo)",
+    "DELETE FROM productos_eliminados WHERE id > :id_previo",
+)
+
+@event.listens_for(db.metadata, 'after_create')
+def _completar_esquema(target, connection, **kw):
+    # db.create_all() no modifica tablas que ya existen, por lo que una base de datos
+    # creada con una versión anterior no tendría los índices ni la búsqueda de texto.
+    # Este evento se ejecuta tras cada create_all() y crea lo que falte.
+    if connection.dialect.name == 'sqlite':
+        columnas_existentes = {fila[1] for fila in connection.exec_driver_sql("PRAGMA table_info(productos)")}
+        for columna in Producto.__table__.columns:
+            if columna.name not in columnas_existentes:
+                definicion = CreateColumn(columna).compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE productos ADD COLUMN {definicion}")
+
+    for indice in Producto.__table__.indexes:
+        indice.create(connection, checkfirst=True)
+
+    if connection.dialect.name == 'sqlite':
+        existe_importacion = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_importacion'"
+        ).first()
+        if not existe_importacion:
+            connection.exec_driver_sql(DDL_IMPORTACION)
+            # Los triggers de inserción de versiones anteriores no tienen la condición de importación.
+            for nombre, definicion in (("productos_fts_insertar", TRIGGER_FTS_INSERTAR),
+                                       ("productos_estadisticas_insertar", TRIGGER_ESTADISTICAS_INSERTAR)):
+                existe_trigger = connection.exec_driver_sql(
+                    f"SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = '{nombre}'"
+                ).first()
+                if existe_trigger:
+                    connection.exec_driver_sql(f"DROP TRIGGER {nombre}")
+                    connection.exec_driver_sql(definicion)
+
+        existe_fts = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_fts'"
+        ).first()
+        if not existe_fts:
+            for sentencia in DDL_BUSQUEDA_TEXTO:
+                connection.exec_driver_sql(sentencia)
+
+        existen_estadisticas = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_estadisticas'"
+        ).first()
+        if not existen_estadisticas:
+            for sentencia in DDL_ESTADISTICAS:
+                connection.exec_driver_sql(sentencia)
+
+        existen_cambios = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_secuencia'"
+        ).first()
+        if not existen_cambios:
+            for sentencia in DDL_CAMBIOS:
+                connection.exec_driver_sql(sentencia)
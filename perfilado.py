@@ -0,0 +1,280 @@
+# perfilado.py
+"""
+Modo de perfilado por petición, para investigar rutas lentas.
+
+Con PERFILADO_HABILITADO, una petición que trae el encabezado de administración
+`X-Perfilado` con el valor de PERFILADO_TOKEN se ejecuta bajo cProfile y se
+registran todas sus sentencias SQL con su duración. Al terminar se obtiene el
+`EXPLAIN QUERY PLAN` de cada sentencia distinta (solo con SQLite) y se arma un
+informe JSON que reemplaza a la respuesta o, si PERFILADO_DIRECTORIO está
+definido, se guarda en ese directorio y la respuesta original sale intacta con
+el nombre del archivo en el encabezado `X-Perfilado-Informe`.
+
+El informe incluye el presupuesto de sentencias de la ruta (PERFILADO_PRESUPUESTOS_SQL),
+que también se puede comprobar en las pruebas con `presupuesto_sql`: así un patrón
+N+1 o un recorrido completo de la tabla se detectan antes de llegar a producción.
+
+En las respuestas en streaming solo se mide hasta que la vista devuelve la
+respuesta; el cuerpo se genera después.
+"""
+import cProfile
+import hmac
+import itertools
+import json
+import os
+import pstats
+import re
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db
+
+ENCABEZADO_PERFILADO = 'X-Perfilado'
+ENCABEZADO_INFORME = 'X-Perfilado-Informe'
+
+# Un paso del plan que recorre una tabla entera ("SCAN productos"), sin índice.
+# "SCAN productos USING INDEX ..." recorre un índice en orden y no se marca.
+_PATRON_RECORRIDO_COMPLETO = re.compile(r'^SCAN (?:TABLE )?\w+$')
+
+# Identificador de cada petición capturada por presupuesto_sql.
+_numeros_peticion = itertools.count(1)
+
+SentenciaSQL = namedtuple('SentenciaSQL', ['sql', 'parametros', 'segundos', 'endpoint', 'peticion'])
+
+
+def explicar_sentencia(cursor, sql, parametros):
+    """
+    Devuelve los pasos (columna `detail`) del EXPLAIN QUERY PLAN de una sentencia
+    SQLite, o None si no se puede explicar. `cursor` es un cursor DBAPI: así el
+    EXPLAIN no pasa por los eventos del motor y no se cuenta como sentencia.
+    """
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, parametros)
+        return [fila[-1] for fila in cursor.fetchall()]
+    except Exception:  # por ejemplo, sentencias que SQLite no explica (PRAGMA)
+        return None
+
+
+def recorridos_completos(plan):
+    """Pasos del plan que recorren una tabla completa."""
+    return [paso for paso in plan or () if _PATRON_RECORRIDO_COMPLETO.match(paso)]
+
+
+class PerfiladorPeticiones:
+    """Perfilado de peticiones marcadas con el encabezado de administración."""
+
+    def __init__(self, token, directorio=None, presupuestos=None, max_funciones=30):
+        self.token = token
+        self.directorio = directorio
+        self.presupuestos = dict(presupuestos or {})
+        self.max_funciones = max_funciones
+
+    @classmethod
+    def desde_configuracion(cls, config):
+        return cls(config['PERFILADO_TOKEN'], config['PERFILADO_DIRECTORIO'],
+                   config['PERFILADO_PRESUPUESTOS_SQL'], config['PERFILADO_MAX_FUNCIONES'])
+
+    def instrumentar_aplicacion(self, app):
+        """Registra los hooks de Flask que perfilan las peticiones marcadas."""
+        app.before_request(self._antes_de_peticion)
+        app.after_request(self._despues_de_peticion)
+        app.teardown_request(self._al_terminar_peticion)
+
+    def instrumentar_motor(self, engine):
+        """Registra los eventos de SQLAlchemy que capturan las sentencias de las peticiones perfiladas."""
+        event.listen(engine, 'before_cursor_execute', self._antes_de_sentencia)
+        event.listen(engine, 'after_cursor_execute', self._despues_de_sentencia)
+
+    def presupuesto(self, endpoint):
+        """Cantidad máxima de sentencias SQL por petición de `endpoint`, o None si no tiene."""
+        return self.presupuestos.get(endpoint)
+
+    def es_peticion_autorizada(self):
+        # Sin token configurado el encabezado se ignora: el perfilado expone el SQL
+        # y el código de la aplicación, así que nunca se activa sin autenticación.
+        valor = request.headers.get(ENCABEZADO_PERFILADO)
+        return bool(self.token and valor) and hmac.compare_digest(valor.encode(), self.token.encode())
+
+    # --- Hooks de Flask ---
+
+    def _antes_de_peticion(self):
+        if not self.es_peticion_autorizada():
+            return
+        perfil = cProfile.Profile()
+        g._perfilado = {"sentencias": [], "perfil": perfil, "inicio": time.perf_counter()}
+        perfil.enable()
+
+    def _despues_de_peticion(self, respuesta):
+        estado = g.pop('_perfilado', None)
+        if estado is None:
+            return respuesta
+        estado["perfil"].disable()
+        informe = self._armar_informe(estado, respuesta)
+
+        if self.directorio:
+            nombre = self._guardar_informe(informe)
+            respuesta.headers[ENCABEZADO_INFORME] = nombre
+            return respuesta
+        return jsonify(informe)
+
+    @staticmethod
+    def _al_terminar_peticion(error=None):
+        # Si la vista falló, after_request no se ejecuta: se detiene el perfilador igual.
+        estado = g.pop('_perfilado', None)
+        if estado is not None:
+            estado["perfil"].disable()
+
+    # --- Eventos de SQLAlchemy ---
+
+    @staticmethod
+    def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and has_request_context() and '_perfilado' in g:
+            context._perfilado_inicio = time.perf_counter()
+
+    @staticmethod
+    def _despues_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, '_perfilado_inicio', None)
+        if inicio is None or '_perfilado' not in g:
+            return
+        # En un executemany se guarda solo el primer juego de parámetros.
+        if executemany and parameters:
+            parameters = parameters[0]
+        g._perfilado["sentencias"].append(
+            SentenciaSQL(statement, parameters, time.perf_counter() - inicio, request.endpoint, None))
+
+    # --- Informe ---
+
+    def _armar_informe(self, estado, respuesta):
+        sentencias = estado["sentencias"]
+        planes = self._planes(sentencias)
+        presupuesto = self.presupuesto(request.endpoint)
+        return {
+            "metodo": request.method,
+            "ruta": request.full_path.rstrip('?'),
+            "endpoint": request.endpoint,
+            "estado": respuesta.status_code,
+            "duracion_ms": round((time.perf_counter() - estado["inicio"]) * 1000, 3),
+            "sql": {
+                "cantidad": len(sentencias),
+                "duracion_ms": round(sum(s.segundos for s in sentencias) * 1000, 3),
+                "presupuesto": presupuesto,
+                "excede_presupuesto": presupuesto is not None and len(sentencias) > presupuesto,
+                "sentencias": [{
+                    "sql": sentencia.sql,
+                    "parametros": list(sentencia.parametros) if isinstance(sentencia.parametros, (list, tuple)) else sentencia.parametros,
+                    "duracion_ms": round(sentencia.segundos * 1000, 3),
+                    "plan": planes.get(sentencia.sql),
+                    "recorridos_completos": recorridos_completos(planes.get(sentencia.sql)),
+                } for sentencia in sentencias],
+            },
+            "funciones": self._funciones(estado["perfil"]),
+        }
+
+    @staticmethod
+    def _planes(sentencias):
+        """EXPLAIN QUERY PLAN de cada sentencia distinta, con los parámetros de su primera ejecución."""
+        if not sentencias or db.engine.dialect.name != 'sqlite':
+            return {}
+        planes = {}
+        # El cursor de la conexión de la sesión ve el mismo esquema y la misma transacción que la vista.
+        try:
+            cursor = db.session.connection().connection.cursor()
+        except SQLAlchemyError:  # la sesión quedó inutilizable tras un error de la vista
+            return {}
+        try:
+            for sentencia in sentencias:
+                if sentencia.sql not in planes:
+                    planes[sentencia.sql] = explicar_sentencia(cursor, sentencia.sql, sentencia.parametros)
+        finally:
+            cursor.close()
+        return planes
+
+    def _funciones(self, perfil):
+        """Las funciones con más tiempo acumulado, como en `pstats.Stats.sort_stats('cumulative')`."""
+        estadisticas = pstats.Stats(perfil).stats
+        filas = sorted(estadisticas.items(), key=lambda item: item[1][3], reverse=True)
+        return [{
+            "funcion": f"{archivo}:{linea}({nombre})",
+            "llamadas": llamadas,
+            "tiempo_propio_ms": round(propio * 1000, 3),
+            "tiempo_acumulado_ms": round(acumulado * 1000, 3),
+        } for (archivo, linea, nombre), (_, llamadas, propio, acumulado, _) in filas[:self.max_funciones]]
+
+    def _guardar_informe(self, informe):
+        os.makedirs(self.directorio, exist_ok=True)
+        marca = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        nombre = f"{marca}-{informe['metodo']}-{informe['endpoint'] or 'sin_ruta'}.json"
+        with open(os.path.join(self.directorio, nombre), 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+        return nombre
+
+
+class CapturaSQL:
+    """Sentencias SQL ejecutadas dentro de un bloque `presupuesto_sql`."""
+
+    def __init__(self):
+        self.sentencias = []
+
+    def por_peticion(self):
+        """Agrupa las sentencias por petición: {número de petición: (endpoint, [sentencias])}."""
+        peticiones = {}
+        for sentencia in self.sentencias:
+            if sentencia.peticion is not None:
+                peticiones.setdefault(sentencia.peticion, (sentencia.endpoint, []))[1].append(sentencia)
+        return peticiones
+
+    def __len__(self):
+        return len(self.sentencias)
+
+
+@contextmanager
+def presupuesto_sql(app, maximo=None):
+    """
+    Para las pruebas: captura las sentencias SQL del bloque y, al salir, falla con
+    AssertionError si alguna petición ejecutó más sentencias que `maximo` o, si no
+    se indica, que el presupuesto de su ruta en PERFILADO_PRESUPUESTOS_SQL.
+
+        with presupuesto_sql(app) as captura:
+            client.get('/productos?limit=10')
+    """
+    captura = CapturaSQL()
+
+    def antes(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._presupuesto_inicio = time.perf_counter()
+
+    def despues(conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, '_presupuesto_inicio', None)
+        if inicio is None:
+            return
+        endpoint = peticion = None
+        if has_request_context():
+            # El número se guarda en el environ: cada petición tiene el suyo aunque
+            # compartan el contexto de aplicación (y `g`).
+            endpoint = request.endpoint
+            peticion = request.environ.setdefault('perfilado.peticion', next(_numeros_peticion))
+        captura.sentencias.append(SentenciaSQL(statement, parameters, time.perf_counter() - inicio, endpoint, peticion))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', antes)
+    event.listen(engine, 'after_cursor_execute', despues)
+    try:
+        yield captura
+    finally:
+        event.remove(engine, 'before_cursor_execute', antes)
+        event.remove(engine, 'after_cursor_execute', despues)
+
+    presupuestos = app.config['PERFILADO_PRESUPUESTOS_SQL']
+    for endpoint, sentencias in captura.por_peticion().values():
+        limite = maximo if maximo is not None else presupuestos.get(endpoint)
+        if limite is not None and len(sentencias) > limite:
+            detalle = '\n'.join(f"  {sentencia.sql}" for sentencia in sentencias)
+            raise AssertionError(
+                f"{endpoint} ejecutó {len(sentencias)} sentencias SQL (presupuesto: {limite}):\n{detalle}")
@@ -1,13 +1,38 @@
 # schemas.py
 from flask_marshmallow import Marshmallow
-from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
-from models import Producto # Importa el modelo Producto
+from marshmallow import Schema, ValidationError, fields, validates
+from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, fields_for_model
+from models import ENTERO_MAXIMO, Producto # Importa el modelo Producto
 
 # Inicializa la extensión Marshmallow.
 # La vinculación a la aplicación Flask se hará en app.py usando ma.init_app(app).
 ma = Marshmallow()
 
-class ProductoSchema(SQLAlchemyAutoSchema):
+class ValidacionesProducto:
+    # Reglas de negocio de los valores, comunes al esquema del modelo y a los de
+    # entrada: se comprueban en la misma pasada de validación que los tipos y los
+    # campos obligatorios, y sus errores se informan por campo.
+    @validates("precio")
+    def validar_precio(self, valor, **kwargs):
+        if valor < 0:
+            raise ValidationError("El precio no puede ser negativo")
+
+    @validates("stock")
+    def validar_stock(self, valor, **kwargs):
+        if valor < 0:
+            raise ValidationError("El stock no puede ser negativo")
+        if valor > ENTERO_MAXIMO:
+            raise ValidationError(f"El stock no puede ser mayor que {ENTERO_MAXIMO}")
+
+    # Un ID explícito (cargas masivas e importación) sigue la misma regla que los IDs
+    # de las rutas (_es_id_valido en app.py): un entero positivo que quepa en un
+    # INTEGER de SQLite. Con ID 0 o negativo el producto no se podría consultar después.
+    @validates("id")
+    def validar_id(self, valor, **kwargs):
+        if not 0 < valor <= ENTERO_MAXIMO:
+            raise ValidationError(f"El ID debe ser un entero positivo menor o igual a {ENTERO_MAXIMO}")
+
+class ProductoSchema(ValidacionesProducto, SQLAlchemyAutoSchema):
     class Meta:
         # Especifica el modelo SQLAlchemy a partir del cual generar el esquema.
         model = Producto
@@ -15,6 +40,10 @@ class ProductoSchema(SQLAlchemyAutoSchema):
         # Cuando se deserializan datos (ej. desde un JSON de entrada con .load()),
         # Marshmallow intentará crear o actualizar una instancia del modelo Producto.
         load_instance = True
+
+        # Columnas internas de control de concurrencia, caché HTTP (ETag / Last-Modified)
+        # y sincronización incremental: no forman parte de la representación pública del producto.
+        exclude = ("version", "actualizado_en", "secuencia")
         
         # Opcional: puedes especificar qué campos incluir o excluir explícitamente.
         # Si no se especifica, SQLAlchemyAutoSchema incluye todos los campos del modelo.
@@ -25,4 +54,65 @@ class ProductoSchema(SQLAlchemyAutoSchema):
 producto_schema = ProductoSchema()
 
 # Instancia del esquema para serializar/deserializar una lista de objetos Producto.
-productos_schema = ProductoSchema(many=True)
\ No newline at end of file
+productos_schema = ProductoSchema(many=True)
+
+# Campos de ProductoSchema generados a partir del modelo, en un marshmallow.Schema
+# simple. fields_for_model devuelve None para las columnas excluidas.
+_campos_producto = {
+    nombre: campo
+    for nombre, campo in fields_for_model(Producto, exclude=ProductoSchema.Meta.exclude).items()
+    if campo is not None
+}
+# El stock se escribe tal cual: un Integer no estricto truncaría 1.7 a 1 y aceptaría "3".
+MENSAJE_STOCK_INVALIDO = "El stock debe ser un entero no negativo"
+
+# Error de un alta con un ID explícito que ya existe (409 en app.py y asgi.py).
+MENSAJE_ID_EXISTENTE = "Ya existe un producto con este ID."
+_campos_producto["stock"] = fields.Integer(required=True, strict=True, error_messages={"invalid": MENSAJE_STOCK_INVALIDO})
+_CamposProducto = Schema.from_dict(_campos_producto, name="CamposProducto")
+
+class ProductoEntradaSchema(ValidacionesProducto, _CamposProducto):
+    """
+    Validación del camino de escritura: los campos y reglas de ProductoSchema, pero
+    load() devuelve un diccionario de columnas en lugar de un Producto. No hereda
+    de marshmallow-sqlalchemy porque su load() consulta la versión instalada de
+    marshmallow (leyendo los metadatos del paquete) en cada llamada, aun sin cargar
+    instancias: es la mayor parte del costo de validar un cuerpo pequeño.
+    """
+
+class EnteroEnTexto(fields.Integer):
+    """Integer estricto que también acepta el entero escrito como texto ("3", no "1.5")."""
+
+    def _validated(self, valor):
+        if isinstance(valor, str):
+            try:
+                valor = int(valor)
+            except ValueError:
+                raise self.make_error("invalid", input=valor) from None
+        return super()._validated(valor)
+
+class ProductoImportacionSchema(ProductoEntradaSchema):
+    # En un CSV todas las celdas son texto: el stock llega como "3".
+    stock = EnteroEnTexto(required=True, strict=True, error_messages={"invalid": MENSAJE_STOCK_INVALIDO})
+
+# Instancias de validación del camino de escritura, construidas una sola vez: crear
+# un esquema por petición repite la copia y el enlace de todos sus campos.
+# POST /productos: todos los campos obligatorios.
+producto_nuevo_schema = ProductoEntradaSchema()
+
+# PUT /productos/<id>: todos los campos opcionales y se ignoran los desconocidos.
+# El ID sale de la URL, así que uno en el cuerpo también se ignora.
+producto_parcial_schema = ProductoEntradaSchema(partial=True, unknown='EXCLUDE', exclude=("id",))
+
+# Instancia para validar cargas masivas (POST /productos/bulk). Devuelve diccionarios
+# de columnas en lugar de objetos Producto, que se insertan directamente con una
+# única sentencia INSERT de varias filas.
+productos_bulk_schema = ProductoEntradaSchema(many=True)
+
+# Instancia para validar actualizaciones parciales masivas (PATCH /productos/bulk).
+# Igual que en actualizar_producto, todos los campos son opcionales y se ignoran los desconocidos.
+productos_parciales_bulk_schema = ProductoEntradaSchema(many=True, partial=True, unknown='EXCLUDE')
+
+# Instancia para validar los lotes de la importación masiva (`flask productos import`).
+# Los archivos de proveedores suelen traer columnas extra, que se ignoran.
+productos_importacion_schema = ProductoImportacionSchema(many=True, unknown='EXCLUDE')
@@ -0,0 +1,91 @@
+# serializacion.py
+from collections import namedtuple
+from functools import lru_cache
+
+from flask.json.provider import DefaultJSONProvider
+
+from models import Producto
+from schemas import ProductoSchema
+
+# orjson es opcional: si está instalado se usa para codificar las respuestas JSON,
+# y si no, se mantiene el módulo json de la biblioteca estándar.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+# Campos de la representación pública de un producto, en el mismo orden en que los
+# serializa ProductoSchema (las columnas internas excluidas del esquema no aparecen).
+CAMPOS_PRODUCTO = tuple(ProductoSchema().dump_fields)
+
+# Columnas que se seleccionan para la ruta rápida de lectura, en el orden de CAMPOS_PRODUCTO.
+COLUMNAS_PRODUCTO = tuple(getattr(Producto, campo) for campo in CAMPOS_PRODUCTO)
+
+
+def compilar_mapeador(campos):
+    """
+    Devuelve una función que convierte una fila (tupla de columnas, en el orden de
+    `campos`) en un diccionario. Si la fila trae columnas de más al final (por
+    ejemplo, el id que agrega una Proyeccion), se ignoran.
+    """
+    campos = tuple(campos)
+
+    def mapear(fila):
+        return dict(zip(campos, fila))
+
+    return mapear
+
+
+# Mapeador de filas de COLUMNAS_PRODUCTO al mismo diccionario que devuelve ProductoSchema.dump().
+fila_a_producto = compilar_mapeador(CAMPOS_PRODUCTO)
+
+
+# Representación parcial de un producto (parámetro `fields`): los campos en el orden
+# del esquema, las columnas a seleccionar y el mapeador de esas filas a diccionarios.
+# Las columnas siempre incluyen el id y la columna de orden (al final si no se
+# pidieron), en `posicion_id` y `posicion_orden`, porque la paginación por cursor los
+# necesita; el mapeador ignora esas columnas extra.
+Proyeccion = namedtuple('Proyeccion', ('campos', 'columnas', 'mapeador', 'posicion_id', 'posicion_orden'))
+
+
+@lru_cache(maxsize=64)
+def proyeccion_productos(campos, orden='id'):
+    """
+    Devuelve la Proyeccion de la tupla de campos `campos` para una lista ordenada
+    por la columna `orden`. El esquema restringido (ProductoSchema(only=...)) y el
+    mapeador se construyen una sola vez por combinación de campos y orden.
+    """
+    campos = tuple(ProductoSchema(only=campos).dump_fields)
+    columnas = tuple(getattr(Producto, campo) for campo in campos)
+    for extra in dict.fromkeys(('id', orden)):
+        if extra not in campos:
+            columnas += (getattr(Producto, extra),)
+    return Proyeccion(campos, columnas, compilar_mapeador(campos),
+                      columnas.index(Producto.id), columnas.index(getattr(Producto, orden)))
+
+
+class ProveedorJSONRapido(DefaultJSONProvider):
+    """
+    Proveedor JSON de Flask que codifica con orjson cuando está disponible.
+
+    Mantiene el comportamiento del proveedor por defecto (claves ordenadas, salida
+    compacta, fechas en formato HTTP), pero los bytes no son idénticos en dos casos:
+    los caracteres no ASCII se emiten en UTF-8 en lugar de como secuencias \\uXXXX
+    (escaparlos costaría tanto como codificar con la biblioteca estándar), y los
+    números de coma flotante menores que 1e-4 o de 1e16 en adelante se escriben en
+    otra notación equivalente (1e-7 en lugar de 1e-07). Si orjson no está
+    instalado, o se piden opciones que no soporta (por ejemplo, indentación en modo
+    debug), se usa la implementación de la biblioteca estándar.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"separators"} or kwargs.get("separators", (",", ":")) != (",", ":"):
+            return super().dumps(obj, **kwargs)
+        opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opciones |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=opciones).decode()
+        except (orjson.JSONEncodeError, TypeError):
+            # Por ejemplo, enteros de más de 64 bits: se delega en la biblioteca estándar.
+            return super().dumps(obj, **kwargs)
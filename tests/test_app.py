@@ -1,7 +1,19 @@
 # tests/test_app.py
+import csv
+import gzip
+import io
+import json
+import threading
+
 import pytest
-from app import app as flask_app, db
-from models import Producto
+from app import app as flask_app, create_app, db
+from config import Config
+from models import ENTERO_MAXIMO, Producto
+from perfilado import ENCABEZADO_INFORME, ENCABEZADO_PERFILADO, presupuesto_sql
+
+# Caché y métricas de la aplicación de pruebas (create_app las guarda en app.extensions).
+cache_productos = flask_app.extensions['cache_productos']
+metricas = flask_app.extensions['metricas']
 
 @pytest.fixture(scope='module')
 def app_fixture():
@@ -29,10 +41,11 @@ def runner(app_fixture):
 
 # --- Helper para limpiar la base de datos antes de ciertas pruebas ---
 def limpiar_db():
-    """Limpia la tabla de productos."""
+    """Limpia la tabla de productos y la caché en memoria."""
     with flask_app.app_context():
         Producto.query.delete()
         db.session.commit()
+    cache_productos.limpiar()
 
 # --- Funciones de Prueba ---
 
@@ -181,6 +194,41 @@ def test_actualizar_producto_datos_invalidos(client):
     assert "El precio debe ser un número no negativo" in response_json.get('error', '') or \
            "precio" in str(response_json.get('mensajes', {}))
 
+def test_validacion_de_escritura_en_una_pasada(client):
+    """Prueba que POST y PUT informan todos los errores por campo y que PUT ignora el ID del cuerpo."""
+    limpiar_db()
+    response = client.post('/productos', json={"nombre": "Negativo", "precio": -1.0, "stock": -2})
+    assert response.status_code == 400
+    assert response.json == {"error": "Datos de entrada inválidos", "mensajes": {
+        "precio": ["El precio no puede ser negativo"],
+        "stock": ["El stock no puede ser negativo"],
+    }}
+
+    producto_id = client.post('/productos', json={"nombre": "Original", "precio": 1.0, "stock": 1}).json['id']
+    response = client.put(f'/productos/{producto_id}', json={"id": producto_id + 100, "stock": 7, "otro": "x"})
+    assert response.status_code == 200
+    assert response.json == {"id": producto_id, "nombre": "Original", "descripcion": None, "precio": 1.0, "stock": 7}
+    # El stock tiene que ser un entero JSON: ni decimales (que se truncarían) ni texto.
+    for stock in ("muchos", "3", 1.7, True):
+        response = client.put(f'/productos/{producto_id}', json={"stock": stock})
+        assert response.status_code == 400
+        assert response.json['mensajes'] == {"stock": ["El stock debe ser un entero no negativo"]}
+    assert client.post('/productos', json={"nombre": "Decimal", "precio": 1.0, "stock": 1.7}).status_code == 400
+    assert client.get(f'/productos/{producto_id}').json['stock'] == 7
+
+def test_crear_producto_con_id_existente(client):
+    """Prueba que POST /productos con el ID de un producto existente responde 409 y no lo modifica."""
+    limpiar_db()
+    producto_id = client.post('/productos', json={"nombre": "Original", "precio": 1.0, "stock": 1}).json['id']
+    response = client.post('/productos', json={"id": producto_id, "nombre": "Otro", "precio": 2.0, "stock": 2})
+    assert response.status_code == 409
+    assert response.json == {"error": "ProductoExistente", "mensajes": {"id": ["Ya existe un producto con este ID."]}}
+    assert client.get(f'/productos/{producto_id}').json['nombre'] == "Original"
+
+    response = client.post('/productos', json={"id": producto_id + 10, "nombre": "Nuevo", "precio": 2.0, "stock": 2})
+    assert response.status_code == 201
+    assert response.json['id'] == producto_id + 10
+
 # --- Pruebas para DELETE /productos/<id> ---
 
 def test_eliminar_producto_existente(client):
@@ -222,4 +270,909 @@ def test_eliminar_producto_no_existente(client):
     assert response_delete.status_code == 404
     assert response_delete.content_type == 'application/json'
     assert 'error' in response_delete.json
-    assert response_delete.json['error'] == 'Producto no encontrado'
\ No newline at end of file
+    assert response_delete.json['error'] == 'Producto no encontrado'
+
+# --- Pruebas para la paginación por cursor de GET /productos ---
+
+def test_obtener_productos_paginados(client):
+    """Prueba GET /productos con limit y after_id recorriendo todas las páginas."""
+    limpiar_db()
+    ids_creados = []
+    for i in range(5):
+        response = client.post('/productos', json={"nombre": f"Producto {i}", "precio": 1.0 + i, "stock": i})
+        assert response.status_code == 201
+        ids_creados.append(response.json['id'])
+
+    response = client.get('/productos?limit=2')
+    assert response.status_code == 200
+    assert [p['id'] for p in response.json['productos']] == ids_creados[:2]
+    assert response.json['next_cursor'] == ids_creados[1]
+
+    ids_recorridos = []
+    cursor = 0
+    while cursor is not None:
+        response = client.get(f'/productos?limit=2&after_id={cursor}')
+        assert response.status_code == 200
+        ids_recorridos.extend(p['id'] for p in response.json['productos'])
+        cursor = response.json['next_cursor']
+    assert ids_recorridos == ids_creados
+
+def test_obtener_productos_paginacion_invalida(client):
+    """Prueba GET /productos con parámetros de paginación inválidos."""
+    response = client.get('/productos?limit=abc')
+    assert response.status_code == 400
+    assert response.json['error'] == 'SolicitudIncorrecta'
+
+    response = client.get('/productos?limit=0')
+    assert response.status_code == 400
+
+# --- Pruebas para el modo streaming (NDJSON) de GET /productos ---
+
+def test_obtener_productos_stream_ndjson(client):
+    """Prueba GET /productos?stream=1 y con Accept: application/x-ndjson."""
+    limpiar_db()
+    nombres = [f"Producto Stream {i}" for i in range(3)]
+    for nombre in nombres:
+        assert client.post('/productos', json={"nombre": nombre, "precio": 2.5, "stock": 1}).status_code == 201
+
+    for url, headers in (('/productos?stream=1', {}),
+                         ('/productos', {"Accept": "application/x-ndjson"})):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        lineas = response.get_data(as_text=True).splitlines()
+        productos = [json.loads(linea) for linea in lineas]
+        assert [p['nombre'] for p in productos] == nombres
+
+# --- Pruebas para POST /productos/bulk ---
+
+def test_crear_productos_bulk(client):
+    """Prueba POST /productos/bulk con una lista válida de productos."""
+    limpiar_db()
+    productos_data = [
+        {"nombre": "Bulk 1", "descripcion": "Primero", "precio": 1.5, "stock": 10},
+        {"nombre": "Bulk 2", "precio": 2.5, "stock": 20},
+        {"nombre": "Bulk 3", "precio": 3.5, "stock": 0},
+    ]
+    response = client.post('/productos/bulk', json=productos_data)
+    assert response.status_code == 201
+    assert response.json['creados'] == 3
+    ids = response.json['ids']
+    assert len(ids) == 3
+
+    for producto_id, producto_data in zip(ids, productos_data):
+        response_get = client.get(f'/productos/{producto_id}')
+        assert response_get.status_code == 200
+        assert response_get.json['nombre'] == producto_data['nombre']
+        assert response_get.json['descripcion'] == producto_data.get('descripcion')
+
+def test_crear_productos_bulk_errores_por_elemento(client):
+    """Prueba POST /productos/bulk con elementos inválidos: no se crea ninguno."""
+    limpiar_db()
+    productos_data = [
+        {"nombre": "Válido", "precio": 1.0, "stock": 1},
+        {"nombre": "Precio negativo", "precio": -1.0, "stock": 1},
+        {"nombre": "Sin stock", "precio": 1.0},
+    ]
+    response = client.post('/productos/bulk', json=productos_data)
+    assert response.status_code == 400
+    mensajes = response.json['mensajes']
+    assert set(mensajes) == {'1', '2'}
+    assert 'precio' in mensajes['1']
+    assert 'stock' in mensajes['2']
+
+    assert client.get('/productos').json == []
+
+def test_crear_productos_bulk_ids_existentes(client):
+    """Prueba que un ID explícito existente o repetido responde 409 por elemento y no crea ninguno."""
+    limpiar_db()
+    existente = client.post('/productos', json={"nombre": "Existente", "precio": 1.0, "stock": 1}).json['id']
+    response = client.post('/productos/bulk', json=[
+        {"nombre": "Nuevo", "precio": 1.0, "stock": 1},
+        {"id": existente, "nombre": "Choca", "precio": 1.0, "stock": 1},
+        {"id": existente + 5, "nombre": "Libre", "precio": 1.0, "stock": 1},
+        {"id": existente + 5, "nombre": "Repetido", "precio": 1.0, "stock": 1},
+    ])
+    assert response.status_code == 409
+    assert response.json == {"error": "ProductoExistente", "mensajes": {
+        "1": {"id": ["Ya existe un producto con este ID."]},
+        "3": {"id": ["El ID está repetido en la lista."]},
+    }}
+    assert [p['id'] for p in client.get('/productos').json] == [existente]
+
+    # Un ID explícito igual al que SQLite asigna a un elemento anterior sin ID.
+    response = client.post('/productos/bulk', json=[
+        {"nombre": "Sin ID", "precio": 1.0, "stock": 1},
+        {"id": existente + 1, "nombre": "Con ID", "precio": 1.0, "stock": 1},
+    ])
+    assert response.status_code == 409
+    assert [p['id'] for p in client.get('/productos').json] == [existente]
+
+    response = client.post('/productos/bulk', json=[{"id": existente + 5, "nombre": "Libre", "precio": 1.0, "stock": 1}])
+    assert response.status_code == 201
+    assert response.json['ids'] == [existente + 5]
+
+def test_crear_productos_bulk_cuerpo_invalido(client):
+    """Prueba POST /productos/bulk con un cuerpo que no es una lista."""
+    response = client.post('/productos/bulk', json={"nombre": "No es lista"})
+    assert response.status_code == 400
+    assert response.json['error'] == 'Datos de entrada inválidos'
+
+# --- Pruebas para PATCH /productos/bulk y DELETE /productos/bulk ---
+
+def test_actualizar_productos_bulk(client):
+    """Prueba PATCH /productos/bulk con actualizaciones parciales e IDs inexistentes."""
+    limpiar_db()
+    response = client.post('/productos/bulk', json=[
+        {"nombre": "Repricing 1", "precio": 10.0, "stock": 5},
+        {"nombre": "Repricing 2", "precio": 20.0, "stock": 6},
+    ])
+    id_1, id_2 = response.json['ids']
+
+    response = client.patch('/productos/bulk', json=[
+        {"id": id_1, "precio": 11.5},
+        {"id": id_2, "stock": 0, "nombre": "Repricing 2 bis"},
+        {"id": 99996, "precio": 1.0},
+    ])
+    assert response.status_code == 200
+    assert response.json['resultados'] == {
+        str(id_1): "actualizado",
+        str(id_2): "actualizado",
+        "99996": "no_encontrado",
+    }
+
+    producto_1 = client.get(f'/productos/{id_1}').json
+    assert producto_1['precio'] == 11.5
+    assert producto_1['stock'] == 5
+    producto_2 = client.get(f'/productos/{id_2}').json
+    assert producto_2['nombre'] == "Repricing 2 bis"
+    assert producto_2['stock'] == 0
+
+def test_actualizar_productos_bulk_datos_invalidos(client):
+    """Prueba PATCH /productos/bulk con un elemento inválido: no se modifica ninguno."""
+    limpiar_db()
+    response = client.post('/productos/bulk', json=[{"nombre": "Sin cambios", "precio": 10.0, "stock": 5}])
+    producto_id = response.json['ids'][0]
+
+    response = client.patch('/productos/bulk', json=[
+        {"id": producto_id, "precio": 12.0},
+        {"id": producto_id, "stock": -3},
+        {"precio": 1.0},
+    ])
+    assert response.status_code == 400
+    mensajes = response.json['mensajes']
+    assert 'stock' in mensajes['1'] and 'id' in mensajes['1']
+    assert 'id' in mensajes['2']
+    assert client.get(f'/productos/{producto_id}').json['precio'] == 10.0
+
+def test_eliminar_productos_bulk(client):
+    """Prueba DELETE /productos/bulk con IDs existentes e inexistentes."""
+    limpiar_db()
+    response = client.post('/productos/bulk', json=[
+        {"nombre": "Borrar 1", "precio": 1.0, "stock": 1},
+        {"nombre": "Borrar 2", "precio": 2.0, "stock": 2},
+        {"nombre": "Conservar", "precio": 3.0, "stock": 3},
+    ])
+    id_1, id_2, id_3 = response.json['ids']
+
+    response = client.delete('/productos/bulk', json={"ids": [id_1, id_2, 99995]})
+    assert response.status_code == 200
+    assert response.json['resultados'] == {str(id_1): "eliminado", str(id_2): "eliminado", "99995": "no_encontrado"}
+    assert [p['id'] for p in client.get('/productos').json] == [id_3]
+
+    response = client.delete('/productos/bulk', json={"ids": ["a"]})
+    assert response.status_code == 400
+
+# --- Pruebas para filtros y ordenamiento de GET /productos ---
+
+def _crear_catalogo_para_filtros(client):
+    productos_data = [
+        {"nombre": "Teclado Mecánico", "precio": 80.0, "stock": 2},
+        {"nombre": "Teclado Compacto", "precio": 45.0, "stock": 30},
+        {"nombre": "Mouse Óptico", "precio": 15.0, "stock": 0},
+        {"nombre": "Monitor", "precio": 300.0, "stock": 7},
+    ]
+    response = client.post('/productos/bulk', json=productos_data)
+    assert response.status_code == 201
+    return dict(zip((p['nombre'] for p in productos_data), response.json['ids']))
+
+def test_obtener_productos_filtrados(client):
+    """Prueba GET /productos con precio_min, precio_max, stock_lt y nombre_prefix."""
+    limpiar_db()
+    ids = _crear_catalogo_para_filtros(client)
+
+    response = client.get('/productos?precio_min=40&precio_max=100')
+    assert response.status_code == 200
+    assert [p['id'] for p in response.json] == [ids["Teclado Mecánico"], ids["Teclado Compacto"]]
+
+    response = client.get('/productos?stock_lt=5')
+    assert {p['nombre'] for p in response.json} == {"Teclado Mecánico", "Mouse Óptico"}
+
+    response = client.get('/productos?nombre_prefix=Teclado&stock_lt=10')
+    assert [p['nombre'] for p in response.json] == ["Teclado Mecánico"]
+
+    response = client.get('/productos?precio_min=abc')
+    assert response.status_code == 400
+
+def test_obtener_productos_ordenados_y_paginados(client):
+    """Prueba GET /productos con sort y paginación por cursor sobre una columna distinta de id."""
+    limpiar_db()
+    _crear_catalogo_para_filtros(client)
+
+    response = client.get('/productos?sort=-precio')
+    assert [p['precio'] for p in response.json] == [300.0, 80.0, 45.0, 15.0]
+
+    precios = []
+    cursor = 0
+    while cursor is not None:
+        response = client.get(f'/productos?sort=precio&limit=3&after_id={cursor}')
+        assert response.status_code == 200
+        precios.extend(p['precio'] for p in response.json['productos'])
+        cursor = response.json['next_cursor']
+    assert precios == [15.0, 45.0, 80.0, 300.0]
+
+    response = client.get('/productos?sort=color')
+    assert response.status_code == 400
+
+def test_cursor_de_orden_no_depende_de_la_fila(client):
+    """Prueba que el cursor de un orden distinto de id sigue valiendo si su producto se elimina o cambia."""
+    limpiar_db()
+    _crear_catalogo_para_filtros(client)
+
+    pagina = client.get('/productos?sort=precio&limit=2').json
+    assert [p['precio'] for p in pagina['productos']] == [15.0, 45.0]
+    cursor = pagina['next_cursor']
+    assert isinstance(cursor, str)
+
+    # El último producto de la página cambia de precio y luego se elimina: la página
+    # siguiente sigue siendo la de los productos posteriores a (45.0, id).
+    ultimo = pagina['productos'][1]['id']
+    client.put(f'/productos/{ultimo}', json={"precio": 500.0})
+    assert [p['precio'] for p in client.get(f'/productos?sort=precio&limit=2&after_id={cursor}').json['productos']] == [80.0, 300.0]
+    client.delete(f'/productos/{ultimo}')
+    siguiente = client.get(f'/productos?sort=precio&limit=2&after_id={cursor}').json
+    assert siguiente == {"productos": client.get('/productos?sort=precio').json[1:3], "next_cursor": None}
+
+    # El cursor solo vale para el mismo orden, y con otro orden no se acepta un id.
+    for ruta in (f'/productos?sort=nombre&limit=2&after_id={cursor}', '/productos?sort=precio&limit=2&after_id=3',
+                 '/productos?sort=precio&limit=2&after_id=no-es-un-cursor'):
+        response = client.get(ruta)
+        assert response.status_code == 400, ruta
+        assert response.json['error'] == "SolicitudIncorrecta"
+
+def test_filtros_usan_indices(app_fixture):
+    """Verifica con EXPLAIN QUERY PLAN que los filtros se resuelven con búsquedas por índice."""
+    from app import _consulta_productos_filtrada
+
+    casos = {
+        'precio_min=10&precio_max=50': 'ix_productos_precio',
+        'precio_min=10': 'ix_productos_precio',
+        'stock_lt=5': 'ix_productos_stock',
+        'nombre_prefix=Tec': 'ix_productos_nombre',
+        'sort=precio': 'ix_productos_precio',
+    }
+    for query_string, indice in casos.items():
+        with app_fixture.test_request_context(f'/productos?{query_string}'):
+            sentencia = _consulta_productos_filtrada().statement.compile(dialect=db.engine.dialect)
+            parametros = tuple(sentencia.params[nombre] for nombre in sentencia.positiontup)
+            with db.engine.connect() as conexion:
+                plan = conexion.exec_driver_sql(f"EXPLAIN QUERY PLAN {sentencia}", parametros).all()
+        detalle = " ".join(fila[-1] for fila in plan)
+        assert f"USING INDEX {indice}" in detalle, f"{query_string}: {detalle}"
+
+# --- Pruebas para GET /productos/search ---
+
+def test_buscar_productos(client):
+    """Prueba la búsqueda de texto y que el índice se mantiene al crear, actualizar y eliminar."""
+    limpiar_db()
+    response = client.post('/productos/bulk', json=[
+        {"nombre": "Teclado Mecánico", "descripcion": "Switches azules", "precio": 80.0, "stock": 2},
+        {"nombre": "Mouse Óptico", "descripcion": "Compatible con teclado inalámbrico", "precio": 15.0, "stock": 0},
+        {"nombre": "Monitor", "descripcion": "Panel IPS", "precio": 300.0, "stock": 7},
+    ])
+    id_teclado, id_mouse, id_monitor = response.json['ids']
+
+    response = client.get('/productos/search?q=teclado')
+    assert response.status_code == 200
+    # El producto con la palabra en el nombre (texto más corto) es más relevante.
+    assert [p['id'] for p in response.json['productos']] == [id_teclado, id_mouse]
+    assert response.json['next_offset'] is None
+
+    response = client.get('/productos/search?q=optico')
+    assert [p['id'] for p in response.json['productos']] == [id_mouse]
+
+    response = client.get('/productos/search?q=tecl&limit=1')
+    assert len(response.json['productos']) == 1
+    assert response.json['next_offset'] == 1
+
+    client.put(f'/productos/{id_monitor}', json={"nombre": "Monitor para teclado"})
+    client.delete(f'/productos/{id_mouse}')
+    response = client.get('/productos/search?q=teclado')
+    assert {p['id'] for p in response.json['productos']} == {id_teclado, id_monitor}
+
+    response = client.get('/productos/search?q=%22%20OR')
+    assert response.status_code == 200
+    response = client.get('/productos/search?q=')
+    assert response.status_code == 400
+
+# --- Pruebas para la caché de GET /productos/<id> ---
+
+def test_obtener_producto_usa_cache_e_invalida(client):
+    """Prueba que GET /productos/<id> se sirve desde la caché y que PUT/DELETE la invalidan."""
+    limpiar_db()
+    response = client.post('/productos', json={"nombre": "Producto Caché", "precio": 9.5, "stock": 3})
+    producto_id = response.json['id']
+
+    aciertos_iniciales = client.get('/productos/cache/estadisticas').json['aciertos']
+    assert client.get(f'/productos/{producto_id}').json['nombre'] == "Producto Caché"
+    assert client.get('/productos/cache/estadisticas').json['aciertos'] == aciertos_iniciales + 1
+
+    client.put(f'/productos/{producto_id}', json={"nombre": "Producto Caché Actualizado"})
+    assert client.get(f'/productos/{producto_id}').json['nombre'] == "Producto Caché Actualizado"
+
+    client.patch('/productos/bulk', json=[{"id": producto_id, "stock": 99}])
+    assert client.get(f'/productos/{producto_id}').json['stock'] == 99
+
+    client.delete(f'/productos/{producto_id}')
+    assert client.get(f'/productos/{producto_id}').status_code == 404
+
+# --- Pruebas para ETag y peticiones condicionales ---
+
+def test_obtener_producto_condicional(client):
+    """Prueba ETag, Last-Modified y respuestas 304 en GET /productos/<id>."""
+    limpiar_db()
+    producto_id = client.post('/productos', json={"nombre": "Condicional", "precio": 1.0, "stock": 1}).json['id']
+
+    response = client.get(f'/productos/{producto_id}')
+    etag = response.headers['ETag']
+    ultima_modificacion = response.headers['Last-Modified']
+
+    response = client.get(f'/productos/{producto_id}', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etag
+
+    # Sin caché (otro worker, o entrada expirada) el resultado debe ser el mismo.
+    cache_productos.limpiar()
+    response = client.get(f'/productos/{producto_id}', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = client.get(f'/productos/{producto_id}', headers={"If-Modified-Since": ultima_modificacion})
+    assert response.status_code == 304
+
+    client.put(f'/productos/{producto_id}', json={"stock": 2})
+    response = client.get(f'/productos/{producto_id}', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.json['stock'] == 2
+
+    # Un producto nuevo con el mismo ID no reutiliza el ETag del eliminado.
+    etag = response.headers['ETag']
+    client.delete(f'/productos/{producto_id}')
+    client.post('/productos/bulk', json=[{"id": producto_id, "nombre": "Recreado", "precio": 1.0, "stock": 2}])
+    response = client.get(f'/productos/{producto_id}', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json['nombre'] == "Recreado"
+
+def test_obtener_productos_condicional(client):
+    """Prueba el ETag de GET /productos y que cambia con cada escritura y con los parámetros."""
+    limpiar_db()
+    client.post('/productos', json={"nombre": "Lista 1", "precio": 1.0, "stock": 1})
+
+    etag = client.get('/productos').headers['ETag']
+    response = client.get('/productos', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = client.get('/productos?limit=1', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    client.post('/productos', json={"nombre": "Lista 2", "precio": 2.0, "stock": 2})
+    response = client.get('/productos', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json) == 2
+
+    etag = response.headers['ETag']
+    client.patch('/productos/bulk', json=[{"id": response.json[0]['id'], "precio": 3.0}])
+    assert client.get('/productos', headers={"If-None-Match": etag}).status_code == 200
+
+# --- Pruebas para POST /productos/<id>/reservar y /liberar ---
+
+def test_reservar_y_liberar_stock(client):
+    """Prueba reservar y liberar stock, incluidos stock insuficiente y producto inexistente."""
+    limpiar_db()
+    producto_id = client.post('/productos', json={"nombre": "Reserva", "precio": 5.0, "stock": 3}).json['id']
+
+    response = client.post(f'/productos/{producto_id}/reservar', json={"cantidad": 2})
+    assert response.status_code == 200
+    assert response.json == {"id": producto_id, "stock": 1}
+
+    response = client.post(f'/productos/{producto_id}/reservar', json={"cantidad": 2})
+    assert response.status_code == 409
+    assert response.json['error'] == 'StockInsuficiente'
+
+    response = client.post(f'/productos/{producto_id}/liberar', json={"cantidad": 4})
+    assert response.json == {"id": producto_id, "stock": 5}
+    assert client.get(f'/productos/{producto_id}').json['stock'] == 5
+
+    assert client.post('/productos/99994/reservar', json={"cantidad": 1}).status_code == 404
+    assert client.post('/productos/99994/liberar', json={"cantidad": 1}).status_code == 404
+    assert client.post(f'/productos/{producto_id}/reservar', json={"cantidad": 0}).status_code == 400
+
+def test_reservar_stock_concurrente(client):
+    """Varios hilos reservan el mismo producto a la vez: no se vende más stock del que hay."""
+    limpiar_db()
+    stock_inicial = 100
+    producto_id = client.post('/productos', json={"nombre": "SKU Popular", "precio": 5.0, "stock": stock_inicial}).json['id']
+
+    hilos, reservas_por_hilo = 8, 25
+    estados = []
+
+    def comprador():
+        cliente = flask_app.test_client()
+        for _ in range(reservas_por_hilo):
+            estados.append(cliente.post(f'/productos/{producto_id}/reservar', json={"cantidad": 1}).status_code)
+
+    trabajadores = [threading.Thread(target=comprador) for _ in range(hilos)]
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+
+    assert len(estados) == hilos * reservas_por_hilo
+    assert estados.count(200) == stock_inicial
+    assert estados.count(409) == hilos * reservas_por_hilo - stock_inicial
+    assert client.get(f'/productos/{producto_id}').json['stock'] == 0
+
+def test_metricas_de_peticiones_y_sql(client):
+    """Prueba que /metrics expone duración, respuestas por estado y sentencias SQL por ruta."""
+    limpiar_db()
+    creado = client.post('/productos', json={"nombre": "Medido", "precio": 1.0, "stock": 1}).json
+    peticiones_previas = metricas.duracion_peticiones.cantidad('GET', '/productos/<int:id>')
+    selects_previos = metricas.sentencias_sql.valor('SELECT')
+
+    client.get(f"/productos/{creado['id'] + 1000}")
+    assert metricas.duracion_peticiones.cantidad('GET', '/productos/<int:id>') == peticiones_previas + 1
+    assert metricas.respuestas.valor('GET', '/productos/<int:id>', '404') >= 1
+    assert metricas.sentencias_sql.valor('SELECT') > selects_previos
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    cuerpo = response.get_data(as_text=True)
+    assert 'productos_http_duracion_segundos_bucket{metodo="GET",ruta="/productos/<int:id>",le="+Inf"}' in cuerpo
+    assert 'productos_http_respuestas_total{metodo="POST",ruta="/productos",estado="201"}' in cuerpo
+    assert 'productos_sql_sentencias_total{operacion="INSERT"}' in cuerpo
+    # La única petición en curso es la propia consulta a /metrics.
+    assert 'productos_http_peticiones_en_curso{metodo="GET",ruta="/productos/<int:id>"} 0' in cuerpo
+
+def test_comando_init_db(runner):
+    """Prueba que `flask productos init-db` crea las tablas sin borrar los datos existentes."""
+    limpiar_db()
+    with flask_app.app_context():
+        db.session.add(Producto(nombre="Conservado", precio=1.0, stock=1))
+        db.session.commit()
+    resultado = runner.invoke(args=['productos', 'init-db'])
+    assert resultado.exit_code == 0
+    assert 'Base de datos inicializada' in resultado.output
+    with flask_app.app_context():
+        assert Producto.query.count() == 1
+
+def test_create_app_perfil_minimo():
+    """Prueba que create_app acepta una configuración sin Swagger ni métricas."""
+    class ConfigMinima(Config):
+        SWAGGER_HABILITADO = False
+        METRICAS_HABILITADAS = False
+
+    aplicacion = create_app(ConfigMinima)
+    cliente = aplicacion.test_client()
+    assert cliente.get('/apispec_1.json').status_code == 404
+    assert cliente.get('/metrics').status_code == 404
+    assert cliente.get('/productos?limit=1').status_code == 200
+    # La aplicación por defecto sí registra la documentación.
+    assert flask_app.test_client().get('/apispec_1.json').status_code == 200
+
+def test_especificacion_openapi_precalculada(client):
+    """Prueba que /apispec_1.json se sirve con ETag, variante gzip y 304."""
+    response = client.get('/apispec_1.json')
+    assert response.status_code == 200
+    assert '/productos' in response.json['paths']
+    assert 'Accept-Encoding' in response.headers['Vary']
+    etag = response.headers['ETag']
+
+    comprimida = client.get('/apispec_1.json', headers={'Accept-Encoding': 'gzip'})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert comprimida.headers['ETag'] == etag[:-1] + '-gz"'
+    assert gzip.decompress(comprimida.data) == response.data
+
+    assert client.get('/apispec_1.json', headers={'If-None-Match': etag}).status_code == 304
+    condicional = client.get('/apispec_1.json', headers={'Accept-Encoding': 'gzip', 'If-None-Match': comprimida.headers['ETag']})
+    assert condicional.status_code == 304
+    assert condicional.headers['ETag'] == comprimida.headers['ETag']
+
+def test_comando_openapi_y_archivo_pregenerado(runner, tmp_path):
+    """Prueba que `flask productos openapi` genera el archivo y que se sirve sin Flasgger."""
+    ruta = tmp_path / 'apispec_1.json'
+    resultado = runner.invoke(args=['productos', 'openapi', '--salida', str(ruta)])
+    assert resultado.exit_code == 0
+    assert '/productos' in json.loads(ruta.read_bytes())['paths']
+
+    class ConfigSinSwagger(Config):
+        SWAGGER_HABILITADO = False
+        OPENAPI_ARCHIVO = str(ruta)
+
+    cliente = create_app(ConfigSinSwagger).test_client()
+    response = cliente.get('/apispec_1.json')
+    assert response.status_code == 200
+    assert response.data == ruta.read_bytes()
+    assert cliente.get('/apidocs/').status_code == 404
+
+def test_estadisticas_inventario_incrementales(client):
+    """Prueba que las estadísticas se mantienen al crear, actualizar, reservar y eliminar."""
+    limpiar_db()
+    a = client.post('/productos', json={"nombre": "A", "precio": 5.0, "stock": 2}).json
+    b = client.post('/productos', json={"nombre": "B", "precio": 120.0, "stock": 0}).json
+    client.post('/productos/bulk', json=[{"nombre": "C", "precio": 7000.0, "stock": 1}])
+    client.put(f"/productos/{a['id']}", json={"precio": 60.0})
+    client.post(f"/productos/{a['id']}/reservar", json={"cantidad": 2})
+    client.put(f"/productos/{b['id']}", json={"stock": 3})
+    client.delete(f"/productos/{b['id']}")
+
+    estadisticas = client.get('/productos/estadisticas').json
+    assert estadisticas['cantidad_productos'] == 2
+    assert estadisticas['valor_inventario'] == 7000.0
+    assert estadisticas['sin_stock'] == 1
+    cantidades = {rango['limite_inferior']: rango['cantidad'] for rango in estadisticas['distribucion_precios']}
+    assert cantidades == {0: 0, 10: 0, 50: 1, 100: 0, 500: 0, 1000: 0, 5000: 1}
+
+def test_comandos_verificar_y_reconstruir_estadisticas(runner):
+    """Prueba que verificar-estadisticas detecta agregados desactualizados y reconstruir-estadisticas los corrige."""
+    limpiar_db()
+    with flask_app.app_context():
+        db.session.add(Producto(nombre="Verificado", precio=20.0, stock=4))
+        db.session.execute(db.text("UPDATE productos_estadisticas SET cantidad = 99"))
+        db.session.commit()
+
+    resultado = runner.invoke(args=['productos', 'verificar-estadisticas'])
+    assert resultado.exit_code == 1
+    assert 'cantidad_productos' in resultado.output
+
+    assert runner.invoke(args=['productos', 'reconstruir-estadisticas']).exit_code == 0
+    resultado = runner.invoke(args=['productos', 'verificar-estadisticas'])
+    assert resultado.exit_code == 0
+    assert 'coinciden' in resultado.output
+
+def test_comando_import_csv_con_rechazados(runner, client, tmp_path):
+    """Prueba la importación de un CSV en lotes: filas válidas, rechazadas, búsqueda y estadísticas."""
+    limpiar_db()
+    archivo = tmp_path / "catalogo.csv"
+    archivo.write_text(
+        "nombre,descripcion,precio,stock,proveedor\n"
+        "Tornillo,Tornillo de acero,0.5,100,ACME\n"
+        "Tuerca,,0.25,0,ACME\n"
+        ",Sin nombre,1.0,1,ACME\n"
+        "Arandela,Arandela plana,abc,5,ACME\n"
+        "Clavo,Clavo de acero,-1,5,ACME\n"
+        "Martillo,Martillo de acero,1200.0,3,ACME\n"
+        "Regla,Regla de 30 cm,2.0,1.5,ACME\n",
+        encoding="utf-8")
+    rechazados = tmp_path / "rechazados.ndjson"
+
+    resultado = runner.invoke(args=['productos', 'import', str(archivo), '--tamano-lote', '2',
+                                    '--rechazados', str(rechazados)])
+    assert resultado.exit_code == 0, resultado.output
+    assert 'Importadas: 3. Rechazadas: 4.' in resultado.output
+
+    errores = [json.loads(linea) for linea in rechazados.read_text(encoding="utf-8").splitlines()]
+    assert [error['linea'] for error in errores] == [4, 5, 6, 8]
+    assert 'precio' in errores[1]['errores']
+    assert errores[3]['errores'] == {"stock": ["El stock debe ser un entero no negativo"]}
+
+    productos = client.get('/productos?sort=id').json
+    assert [producto['nombre'] for producto in productos] == ["Tornillo", "Tuerca", "Martillo"]
+    assert productos[1]['descripcion'] is None
+    assert {p['nombre'] for p in client.get('/productos/search?q=acero').json['productos']} == {"Tornillo", "Martillo"}
+    estadisticas = client.get('/productos/estadisticas').json
+    assert estadisticas['cantidad_productos'] == 3
+    assert estadisticas['sin_stock'] == 1
+    assert runner.invoke(args=['productos', 'verificar-estadisticas']).exit_code == 0
+
+def test_comando_import_ndjson_upsert(runner, client, tmp_path):
+    """Prueba que --upsert actualiza los productos existentes por id y crea los demás."""
+    limpiar_db()
+    existente = client.post('/productos', json={"nombre": "Viejo", "precio": 10.0, "stock": 1}).json
+    archivo = tmp_path / "catalogo.ndjson"
+    archivo.write_text("\n".join([
+        json.dumps({"id": existente['id'], "nombre": "Nuevo", "precio": 20.0, "stock": 0}),
+        json.dumps({"nombre": "Otro", "precio": 5.0, "stock": 2}),
+        "{no es json",
+    ]) + "\n", encoding="utf-8")
+
+    resultado = runner.invoke(args=['productos', 'import', str(archivo), '--upsert'])
+    assert resultado.exit_code == 0, resultado.output
+    assert 'Importadas: 2. Rechazadas: 1.' in resultado.output
+    assert 'Línea 3 rechazada' in resultado.output
+
+    actualizado = client.get(f"/productos/{existente['id']}")
+    assert actualizado.json['nombre'] == "Nuevo"
+    assert client.get('/productos/estadisticas').json['cantidad_productos'] == 2
+    assert runner.invoke(args=['productos', 'verificar-estadisticas']).exit_code == 0
+
+def test_exportar_productos_csv(client):
+    """Prueba GET /productos/export: CSV en streaming, filtros, gzip opcional y ETag por codificación."""
+    limpiar_db()
+    client.post('/productos/bulk', json=[
+        {"nombre": "Lápiz, negro", "descripcion": "Dice \"HB\"", "precio": 1.5, "stock": 10},
+        {"nombre": "Goma", "precio": 0.75, "stock": 0},
+    ])
+    response = client.get('/productos/export?format=csv')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    filas = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert filas[0] == ['id', 'nombre', 'descripcion', 'precio', 'stock']
+    assert [fila[1:] for fila in filas[1:]] == [['Lápiz, negro', 'Dice "HB"', '1.5', '10'], ['Goma', '', '0.75', '0']]
+
+    filtrada = client.get('/productos/export?stock_lt=1')
+    assert len(filtrada.get_data(as_text=True).splitlines()) == 2
+
+    comprimida = client.get('/productos/export', headers={"Accept-Encoding": "gzip"})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(comprimida.data) == response.data
+    # Mismo sufijo de ETag que las respuestas comprimidas por compresion.py.
+    assert comprimida.headers['ETag'] == client.get('/productos/export').headers['ETag'][:-1] + '-gz"'
+    assert 'Accept-Encoding' in comprimida.headers['Vary']
+    no_modificada = client.get('/productos/export', headers={"Accept-Encoding": "gzip", "If-None-Match": comprimida.headers['ETag']})
+    assert no_modificada.status_code == 304
+    assert client.get('/productos/export', headers={"If-None-Match": comprimida.headers['ETag']}).status_code == 200
+
+    assert client.get('/productos/export?format=xml').status_code == 400
+
+def test_listado_comprimido_y_condicional(client):
+    """Prueba que GET /productos se comprime con gzip y que su ETag comprimido sirve para un 304."""
+    limpiar_db()
+    client.post('/productos/bulk', json=[{"nombre": f"Producto {n}", "precio": 1.0, "stock": n} for n in range(50)])
+    normal = client.get('/productos')
+    comprimida = client.get('/productos', headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(comprimida.data)) == normal.json
+    assert comprimida.headers['ETag'] == normal.headers['ETag'][:-1] + '-gz"'
+
+    condicional = client.get('/productos', headers={"Accept-Encoding": "gzip", "If-None-Match": comprimida.headers['ETag']})
+    assert condicional.status_code == 304
+    assert condicional.headers['ETag'] == comprimida.headers['ETag']
+
+def test_campos_parciales_en_listado_y_producto(client):
+    """Prueba ?fields= en GET /productos (todas sus formas) y GET /productos/<id>, con ETag propio."""
+    limpiar_db()
+    creados = [client.post('/productos', json={"nombre": f"P{n}", "descripcion": "x" * 200, "precio": n, "stock": n}).json
+               for n in range(1, 4)]
+
+    lista = client.get('/productos?fields=precio,nombre')
+    assert lista.json == [{"nombre": f"P{n}", "precio": float(n)} for n in range(1, 4)]
+    assert len(lista.data) < len(client.get('/productos').data) / 3
+
+    pagina = client.get('/productos?fields=nombre&limit=2').json
+    assert pagina['productos'] == [{"nombre": "P1"}, {"nombre": "P2"}]
+    assert pagina['next_cursor'] == creados[1]['id']
+    siguiente = client.get(f"/productos?fields=nombre&limit=2&after_id={pagina['next_cursor']}").json
+    assert siguiente == {"productos": [{"nombre": "P3"}], "next_cursor": None}
+
+    lineas = client.get('/productos?fields=id&stream=1').get_data(as_text=True).splitlines()
+    assert [json.loads(linea) for linea in lineas] == [{"id": producto['id']} for producto in creados]
+
+    id_producto = creados[0]['id']
+    completo = client.get(f'/productos/{id_producto}')
+    parcial = client.get(f'/productos/{id_producto}?fields=id,precio')
+    assert parcial.json == {"id": id_producto, "precio": 1.0}
+    assert parcial.headers['ETag'] != completo.headers['ETag']
+    assert client.get(f'/productos/{id_producto}?fields=id,precio',
+                      headers={"If-None-Match": parcial.headers['ETag']}).status_code == 304
+    assert client.get(f'/productos/{id_producto}?fields=id,nombre,descripcion,precio,stock').headers['ETag'] == completo.headers['ETag']
+
+    for ruta in ('/productos?fields=nombre,costo', f'/productos/{id_producto}?fields=', '/productos?fields=,'):
+        assert client.get(ruta).status_code == 400, ruta
+
+def test_cambios_desde_una_secuencia(client):
+    """Prueba GET /productos/cambios: altas, modificaciones, bajas con lápida, paginación y reutilización de ids."""
+    limpiar_db()
+    inicio = client.get('/productos/cambios?limit=1000').json
+    while inicio['hay_mas']:
+        inicio = client.get(f"/productos/cambios?since={inicio['ultima_secuencia']}&limit=1000").json
+    desde = inicio['ultima_secuencia']
+
+    a = client.post('/productos', json={"nombre": "A", "precio": 1.0, "stock": 1}).json
+    b = client.post('/productos', json={"nombre": "B", "precio": 2.0, "stock": 2}).json
+    c = client.post('/productos', json={"nombre": "C", "precio": 3.0, "stock": 3}).json
+    client.put(f"/productos/{a['id']}", json={"precio": 1.5})
+    client.post(f"/productos/{c['id']}/reservar", json={"cantidad": 1})
+    client.delete(f"/productos/{b['id']}")
+
+    respuesta = client.get(f'/productos/cambios?since={desde}').json
+    assert respuesta['hay_mas'] is False
+    resumen = [(cambio['tipo'], cambio.get('id') or cambio['producto']['id']) for cambio in respuesta['cambios']]
+    # Cada producto aparece una vez, en el orden de su última escritura.
+    assert resumen == [('upsert', a['id']), ('upsert', c['id']), ('delete', b['id'])]
+    assert respuesta['cambios'][0]['producto'] == {**a, "precio": 1.5}
+    assert respuesta['cambios'][1]['producto']['stock'] == 2
+    secuencias = [cambio['secuencia'] for cambio in respuesta['cambios']]
+    assert secuencias == sorted(secuencias) and secuencias[0] > desde
+    assert respuesta['ultima_secuencia'] == secuencias[-1]
+
+    # Paginación: la segunda página empieza después de la última secuencia recibida.
+    primera = client.get(f'/productos/cambios?since={desde}&limit=2').json
+    assert primera['hay_mas'] is True and len(primera['cambios']) == 2
+    segunda = client.get(f"/productos/cambios?since={primera['ultima_secuencia']}&limit=2").json
+    assert segunda['cambios'] == respuesta['cambios'][2:] and segunda['hay_mas'] is False
+
+    # Sin cambios nuevos, la respuesta está vacía y conserva la secuencia.
+    vacia = client.get(f"/productos/cambios?since={respuesta['ultima_secuencia']}").json
+    assert vacia == {"cambios": [], "ultima_secuencia": respuesta['ultima_secuencia'], "hay_mas": False}
+
+    # Un id eliminado que se vuelve a usar deja de figurar como eliminado.
+    client.delete(f"/productos/{c['id']}")
+    client.post('/productos/bulk', json=[{"id": c['id'], "nombre": "C2", "precio": 3.0, "stock": 3}])
+    ultimos = client.get(f"/productos/cambios?since={respuesta['ultima_secuencia']}").json['cambios']
+    assert [(cambio['tipo'], cambio.get('id') or cambio['producto']['id']) for cambio in ultimos][-1] == ('upsert', c['id'])
+    assert all(cambio['tipo'] == 'upsert' for cambio in ultimos)
+
+    assert client.get('/productos/cambios?since=-1').status_code == 400
+
+def test_etag_lista_cambia_al_eliminar(client):
+    """Prueba que el ETag de la lista (basado en el contador de escrituras) cambia con una baja."""
+    limpiar_db()
+    a = client.post('/productos', json={"nombre": "A", "precio": 1.0, "stock": 1}).json
+    client.post('/productos', json={"nombre": "B", "precio": 2.0, "stock": 2})
+    etag = client.get('/productos').headers['ETag']
+    assert client.get('/productos').headers['ETag'] == etag
+    client.delete(f"/productos/{a['id']}")
+    assert client.get('/productos').headers['ETag'] != etag
+
+def test_comando_import_asigna_secuencias(runner, client, tmp_path):
+    """Prueba que los productos importados en lote aparecen en GET /productos/cambios con secuencias nuevas."""
+    limpiar_db()
+    with flask_app.app_context():
+        desde = db.session.execute(db.text("SELECT valor FROM productos_secuencia")).scalar_one()
+    archivo = tmp_path / "catalogo.csv"
+    archivo.write_text("nombre,precio,stock\nA,1,1\nB,2,2\nC,3,3\n", encoding="utf-8")
+    assert runner.invoke(args=['productos', 'import', str(archivo), '--tamano-lote', '2']).exit_code == 0
+
+    cambios = client.get(f'/productos/cambios?since={desde}').json['cambios']
+    assert [cambio['producto']['nombre'] for cambio in cambios] == ["A", "B", "C"]
+    assert [cambio['secuencia'] for cambio in cambios] == [desde + 1, desde + 2, desde + 3]
+
+def test_obtener_productos_por_ids(client):
+    """Prueba GET /productos?ids= y POST /productos/ids: orden, repetidos, inexistentes, caché y campos."""
+    limpiar_db()
+    creados = [client.post('/productos', json={"nombre": f"P{n}", "precio": float(n), "stock": n}).json for n in range(1, 5)]
+    ids = [producto['id'] for producto in creados]
+    inexistente = ids[-1] + 1000
+    cache_productos.limpiar()
+    client.get(f'/productos/{ids[2]}')  # Queda en caché.
+
+    aciertos = cache_productos.estadisticas()['aciertos']
+    respuesta = client.get(f'/productos?ids={ids[2]},{ids[0]},{inexistente},{ids[0]}')
+    assert respuesta.status_code == 200
+    assert respuesta.json == {"productos": [creados[2], creados[0]], "no_encontrados": [inexistente]}
+    assert cache_productos.estadisticas()['aciertos'] == aciertos + 1
+
+    # Los leídos de la base quedan en caché y se sirven actualizados tras una escritura.
+    client.put(f'/productos/{ids[0]}', json={"precio": 9.5})
+    por_post = client.post('/productos/ids?fields=id,precio', json={"ids": [ids[0], ids[1], ids[3]]})
+    assert por_post.json == {
+        "productos": [{"id": ids[0], "precio": 9.5}, {"id": ids[1], "precio": 2.0}, {"id": ids[3], "precio": 4.0}],
+        "no_encontrados": [],
+    }
+
+    assert client.get('/productos?ids=1,a').status_code == 400
+    assert client.get('/productos?ids=0').status_code == 400
+    assert client.get('/productos?ids=').status_code == 400
+    assert client.post('/productos/ids', json={"ids": []}).status_code == 400
+    assert client.post('/productos/ids', json={"ids": [1, True]}).status_code == 400
+
+def test_enteros_fuera_de_rango_de_sqlite(client):
+    """Los IDs y enteros que no caben en un INTEGER de SQLite se rechazan en lugar de producir un 500."""
+    limpiar_db()
+    producto_id = client.post('/productos', json={"nombre": "Rango", "precio": 1.0, "stock": 1}).json['id']
+    enorme = 2**63
+    assert 2**63 - 1 == ENTERO_MAXIMO
+
+    for ruta in (f'/productos?ids={enorme}', f'/productos?ids=1,{enorme}', f'/productos?after_id={enorme}',
+                 f'/productos?stock_lt=-{enorme}', f'/productos?limit={enorme}', f'/productos/cambios?since={enorme}',
+                 f'/productos/search?q=rango&offset={enorme}'):
+        respuesta = client.get(ruta)
+        assert respuesta.status_code == 400, ruta
+        assert respuesta.json['error'] == "SolicitudIncorrecta"
+    assert client.get(f'/productos?after_id={ENTERO_MAXIMO}').status_code == 200
+
+    assert client.post('/productos/ids', json={"ids": [enorme]}).status_code == 400
+    assert client.post('/productos/ids', json={"ids": [1, -enorme]}).status_code == 400
+    assert client.delete('/productos/bulk', json={"ids": [enorme]}).status_code == 400
+    assert client.patch('/productos/bulk', json=[{"id": enorme, "stock": 1}]).status_code == 400
+    assert client.post('/productos/bulk', json=[{"id": enorme, "nombre": "X", "precio": 1.0, "stock": 1}]).status_code == 400
+    for id_no_positivo in (0, -1, -ENTERO_MAXIMO):
+        respuesta = client.post('/productos/bulk', json=[{"id": id_no_positivo, "nombre": "X", "precio": 1.0, "stock": 1}])
+        assert respuesta.status_code == 400
+        assert list(respuesta.json['mensajes']['0']) == ['id']
+    assert client.post('/productos', json={"nombre": "X", "precio": 1.0, "stock": enorme}).status_code == 400
+    assert client.put(f'/productos/{producto_id}', json={"stock": enorme}).status_code == 400
+    assert client.post(f'/productos/{producto_id}/reservar', json={"cantidad": enorme}).status_code == 400
+
+    # Un ID de la ruta fuera de rango no puede existir: 404 con cualquier método.
+    assert client.get(f'/productos/{enorme}').status_code == 404
+    assert client.put(f'/productos/{enorme}', json={"stock": 1}).status_code == 404
+    assert client.delete(f'/productos/{enorme}').status_code == 404
+    assert client.post(f'/productos/{enorme}/liberar', json={"cantidad": 1}).status_code == 404
+
+def test_presupuestos_sql_por_ruta(client):
+    """Prueba que las rutas principales no superan su presupuesto de sentencias SQL (sin N+1)."""
+    limpiar_db()
+    with presupuesto_sql(flask_app) as captura:
+        ids = client.post('/productos/bulk', json=[
+            {"nombre": f"Presupuesto {n}", "precio": float(n), "stock": n} for n in range(50)
+        ]).json['ids']
+        cache_productos.limpiar()
+        client.post('/productos', json={"id": ids[-1] + 1, "nombre": "Con ID", "precio": 1.0, "stock": 1})
+        client.get(f'/productos/{ids[0]}')
+        client.get('/productos')
+        client.get('/productos?limit=10&precio_min=5&sort=-precio')
+        client.get(f'/productos?ids={",".join(map(str, ids[:20]))}')
+        client.get('/productos/search?q=presupuesto')
+        client.get('/productos/cambios?since=0&limit=20')
+        client.get('/productos/estadisticas')
+        client.put(f'/productos/{ids[0]}', json={"stock": 1})
+        client.post(f'/productos/{ids[0]}/reservar', json={"cantidad": 1})
+        # Camino más caro de reservar: el UPDATE no modifica ninguna fila y se consulta el producto.
+        assert client.post(f'/productos/{ids[0]}/reservar', json={"cantidad": 1000}).status_code == 409
+        client.patch('/productos/bulk', json=[{"id": producto_id, "stock": 0} for producto_id in ids[:20]])
+        client.delete('/productos/bulk', json={"ids": ids[20:40]})
+        client.delete(f'/productos/{ids[1]}')
+    assert len(captura.por_peticion()) == 15
+    # La carga masiva de 50 productos es un único INSERT de varias filas.
+    assert sum(1 for sentencia in captura.sentencias
+               if sentencia.endpoint == 'productos.crear_productos_bulk' and sentencia.sql.startswith('INSERT INTO productos')) == 1
+
+    with pytest.raises(AssertionError, match='obtener_productos ejecutó 2 sentencias SQL'):
+        with presupuesto_sql(flask_app, maximo=1):
+            client.get('/productos?limit=5')
+
+def test_modo_perfilado(tmp_path):
+    """Prueba el informe de perfilado: solo con el token, con SQL, planes y funciones, o guardado en un directorio."""
+    class ConfigPerfilado(Config):
+        SWAGGER_HABILITADO = False
+        METRICAS_HABILITADAS = False
+        PERFILADO_HABILITADO = True
+        PERFILADO_TOKEN = 'secreto'
+
+    limpiar_db()
+    cliente = create_app(ConfigPerfilado).test_client()
+    cliente.post('/productos', json={"nombre": "Perfilado", "precio": 10.0, "stock": 1})
+
+    assert cliente.get('/productos?limit=5').json['productos'][0]['nombre'] == "Perfilado"
+    assert 'sql' not in cliente.get('/productos?limit=5', headers={ENCABEZADO_PERFILADO: 'otro'}).json
+
+    informe = cliente.get('/productos?limit=5&precio_min=1', headers={ENCABEZADO_PERFILADO: 'secreto'}).json
+    assert informe['endpoint'] == 'productos.obtener_productos'
+    assert informe['estado'] == 200
+    assert informe['sql']['cantidad'] == len(informe['sql']['sentencias']) == 2
+    assert informe['sql']['presupuesto'] == 2 and not informe['sql']['excede_presupuesto']
+    filas = informe['sql']['sentencias'][-1]
+    assert filas['parametros'][0] == 1.0
+    assert any('ix_productos_precio' in paso for paso in filas['plan'])
+    assert filas['recorridos_completos'] == []
+    assert any('obtener_productos' in funcion['funcion'] for funcion in informe['funciones'])
+    # El listado completo recorre la tabla entera, y el informe lo señala.
+    completo = cliente.get('/productos', headers={ENCABEZADO_PERFILADO: 'secreto'}).json
+    assert 'SCAN productos' in completo['sql']['sentencias'][-1]['recorridos_completos']
+
+    # Sin token configurado el encabezado no activa nada.
+    ConfigPerfilado.PERFILADO_TOKEN = None
+    assert 'sql' not in create_app(ConfigPerfilado).test_client().get('/productos?limit=1', headers={ENCABEZADO_PERFILADO: 'secreto'}).json
+
+    # Con un directorio, la respuesta no cambia y el informe queda guardado.
+    ConfigPerfilado.PERFILADO_TOKEN = 'secreto'
+    ConfigPerfilado.PERFILADO_DIRECTORIO = str(tmp_path)
+    respuesta = create_app(ConfigPerfilado).test_client().get('/productos?limit=5', headers={ENCABEZADO_PERFILADO: 'secreto'})
+    assert respuesta.json['productos'][0]['nombre'] == "Perfilado"
+    guardado = json.loads((tmp_path / respuesta.headers[ENCABEZADO_INFORME]).read_text(encoding='utf-8'))
+    assert guardado['sql']['cantidad'] == 2
@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from asgi import aplicacion, motor  # noqa: E402
+
+
+async def llamar_completo(metodo, ruta, cuerpo=None, query_string=b'', encabezados=()):
+    """Ejecuta una petición HTTP contra la aplicación ASGI y devuelve (estado, encabezados, cuerpo)."""
+    datos = b'' if cuerpo is None else (cuerpo if isinstance(cuerpo, bytes) else json.dumps(cuerpo).encode())
+    mensajes = []
+
+    async def receive():
+        return {"type": "http.request", "body": datos, "more_body": False}
+
+    async def send(mensaje):
+        mensajes.append(mensaje)
+
+    scope = {"type": "http", "method": metodo, "path": ruta, "query_string": query_string,
+             "headers": [(nombre.lower().encode(), valor.encode()) for nombre, valor in encabezados]}
+    await aplicacion(scope, receive, send)
+    return mensajes[0]["status"], {nombre.decode(): valor.decode() for nombre, valor in mensajes[0]["headers"]}, mensajes[1]["body"]
+
+async def llamar(metodo, ruta, cuerpo=None, query_string=b''):
+    """Ejecuta una petición HTTP contra la aplicación ASGI y devuelve (estado, JSON)."""
+    estado, _, cuerpo_respuesta = await llamar_completo(metodo, ruta, cuerpo, query_string)
+    return estado, json.loads(cuerpo_respuesta)
+
+async def iniciar():
+    mensajes = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+    respuestas = []
+
+    async def receive():
+        return next(mensajes)
+
+    async def send(mensaje):
+        respuestas.append(mensaje["type"])
+
+    await aplicacion({"type": "lifespan"}, receive, send)
+    return respuestas
+
+def test_asgi_crud_completo():
+    """Prueba las rutas CRUD de la aplicación ASGI y que sus respuestas coinciden con las de app.py."""
+    async def escenario():
+        assert await iniciar() == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+        estado, creado = await llamar("POST", "/productos", {"nombre": "ASGI", "descripcion": "Async", "precio": 3.5, "stock": 4})
+        assert estado == 201
+        assert creado == {"id": creado["id"], "nombre": "ASGI", "descripcion": "Async", "precio": 3.5, "stock": 4}
+        producto_id = creado["id"]
+
+        assert await llamar("GET", f"/productos/{producto_id}") == (200, creado)
+
+        estado, pagina = await llamar("GET", "/productos", query_string=f"limit=1&after_id={producto_id - 1}".encode())
+        assert estado == 200
+        assert pagina["productos"] == [creado]
+
+        estado, actualizado = await llamar("PUT", f"/productos/{producto_id}", {"precio": 4.0})
+        assert estado == 200
+        assert actualizado["precio"] == 4.0 and actualizado["nombre"] == "ASGI"
+
+        estado, error = await llamar("PUT", f"/productos/{producto_id}", {"stock": -1})
+        assert estado == 400
+        assert error == {"error": "Datos de entrada inválidos", "mensajes": {"stock": ["El stock no puede ser negativo"]}}
+
+        estado, error = await llamar("POST", "/productos", {"id": producto_id, "nombre": "Otro", "precio": 1.0, "stock": 1})
+        assert estado == 409
+        assert error == {"error": "ProductoExistente", "mensajes": {"id": ["Ya existe un producto con este ID."]}}
+
+        estado, error = await llamar("POST", "/productos", {"nombre": "Sin precio"})
+        assert estado == 400
+        assert error["error"] == "Datos de entrada inválidos" and "precio" in error["mensajes"]
+
+        assert await llamar("POST", "/productos", b"{no es json") == (400, {"error": "SolicitudIncorrecta", "mensaje": "Failed to decode JSON object."})
+        assert (await llamar("PATCH", f"/productos/{producto_id}"))[0] == 405
+
+        assert await llamar("DELETE", f"/productos/{producto_id}") == (200, {"mensaje": "Producto eliminado correctamente"})
+        assert await llamar("GET", f"/productos/{producto_id}") == (404, {"error": "RecursoNoEncontrado", "mensaje": "Producto no encontrado."})
+        assert (await llamar("GET", "/otra-ruta"))[0] == 404
+
+        await motor.dispose()
+
+    asyncio.run(escenario())
+
+def test_asgi_listado_igual_que_wsgi():
+    """GET /productos de la aplicación ASGI acepta los mismos parámetros que app.py y devuelve el mismo cuerpo y ETag."""
+    from app import app as flask_app
+
+    async def escenario():
+        for nombre, precio, stock in [("ASGI Teclado", 80.0, 2), ("ASGI Mouse", 15.0, 0), ("ASGI Monitor", 300.0, 7)]:
+            assert (await llamar("POST", "/productos", {"nombre": nombre, "precio": precio, "stock": stock}))[0] == 201
+
+        cliente = flask_app.test_client()
+        consultas = [
+            "", "nombre_prefix=ASGI&sort=-precio", "nombre_prefix=ASGI&precio_min=10&precio_max=100",
+            "nombre_prefix=ASGI&stock_lt=5&fields=nombre,stock", "nombre_prefix=ASGI&sort=precio&limit=1",
+            "sort=nombre&limit=2&after_id=1", "limit=", "sort=color", "precio_min=abc", "fields=color",
+            "limit=0", "sort=precio&after_id=999999999",
+        ]
+        for query_string in consultas:
+            estado, encabezados, cuerpo = await llamar_completo("GET", "/productos", query_string=query_string.encode())
+            respuesta = cliente.get(f"/productos?{query_string}")
+            assert (estado, json.loads(cuerpo)) == (respuesta.status_code, respuesta.json), query_string
+            assert encabezados.get("etag") == respuesta.headers.get("ETag"), query_string
+
+        # Paginación completa con orden por una columna distinta del id.
+        vistos, cursor = [], None
+        while True:
+            query_string = "nombre_prefix=ASGI&sort=precio&limit=2" + (f"&after_id={cursor}" if cursor else "")
+            estado, pagina = await llamar("GET", "/productos", query_string=query_string.encode())
+            vistos += [producto["precio"] for producto in pagina["productos"]]
+            cursor = pagina["next_cursor"]
+            if cursor is None:
+                break
+        assert vistos == [15.0, 80.0, 300.0]
+
+        # ETag y 304, con las mismas reglas que app.py.
+        estado, encabezados, _ = await llamar_completo("GET", "/productos", query_string=b"limit=5")
+        assert "last-modified" in encabezados
+        estado, encabezados_304, cuerpo = await llamar_completo(
+            "GET", "/productos", query_string=b"limit=5", encabezados=[("If-None-Match", encabezados["etag"])])
+        assert (estado, cuerpo, encabezados_304["etag"]) == (304, b"", encabezados["etag"])
+        estado, _, _ = await llamar_completo(
+            "GET", "/productos", query_string=b"limit=5", encabezados=[("If-Modified-Since", encabezados["last-modified"])])
+        assert estado == 304
+
+        # Enteros que no caben en un INTEGER de SQLite: 400 en la query string, 404 en la ruta.
+        assert (await llamar("GET", "/productos", query_string=f"after_id={2**63}".encode()))[0] == 400
+        assert (await llamar("GET", f"/productos/{2**63}"))[0] == 404
+        assert (await llamar("POST", "/productos", {"nombre": "X", "precio": 1.0, "stock": 2**63}))[0] == 400
+
+        # Los modos que solo atiende la aplicación WSGI se rechazan en lugar de ignorarse.
+        for query_string in (b"ids=1,2", b"stream=1"):
+            estado, error = await llamar("GET", "/productos", query_string=query_string)
+            assert estado == 400 and error["error"] == "SolicitudIncorrecta"
+
+        await motor.dispose()
+
+    asyncio.run(escenario())
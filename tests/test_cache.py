@@ -0,0 +1,56 @@
+from cache import CacheLRU
+
+
+class RelojFalso:
+    """Reloj controlable para probar la expiración sin esperar."""
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_cache_guardar_y_obtener():
+    """Prueba aciertos y fallos básicos."""
+    cache = CacheLRU(tamano_maximo=2, ttl_segundos=10)
+    assert cache.obtener(1) is None
+    cache.guardar(1, {"id": 1})
+    assert cache.obtener(1) == {"id": 1}
+    estadisticas = cache.estadisticas()
+    assert estadisticas['aciertos'] == 1
+    assert estadisticas['fallos'] == 1
+    assert estadisticas['entradas'] == 1
+
+def test_cache_desaloja_la_menos_usada():
+    """Prueba que al superar el tamaño máximo se desaloja la entrada menos usada recientemente."""
+    cache = CacheLRU(tamano_maximo=2, ttl_segundos=10)
+    cache.guardar(1, "uno")
+    cache.guardar(2, "dos")
+    cache.obtener(1)  # 2 pasa a ser la menos usada
+    cache.guardar(3, "tres")
+    assert cache.obtener(2) is None
+    assert cache.obtener(1) == "uno"
+    assert cache.obtener(3) == "tres"
+    assert cache.estadisticas()['desalojos'] == 1
+
+def test_cache_expira_por_ttl():
+    """Prueba que las entradas expiran al cumplirse el TTL."""
+    reloj = RelojFalso()
+    cache = CacheLRU(tamano_maximo=10, ttl_segundos=5, reloj=reloj)
+    cache.guardar(1, "uno")
+    reloj.ahora = 4.9
+    assert cache.obtener(1) == "uno"
+    reloj.ahora = 5.0
+    assert cache.obtener(1) is None
+    assert cache.estadisticas()['expiraciones'] == 1
+
+def test_cache_invalidar_y_deshabilitada():
+    """Prueba la invalidación y que con tamaño 0 la caché no guarda nada."""
+    cache = CacheLRU(tamano_maximo=10, ttl_segundos=5)
+    cache.guardar(1, "uno")
+    cache.invalidar(1)
+    assert cache.obtener(1) is None
+
+    deshabilitada = CacheLRU(tamano_maximo=0, ttl_segundos=5)
+    deshabilitada.guardar(1, "uno")
+    assert deshabilitada.obtener(1) is None
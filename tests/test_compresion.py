@@ -0,0 +1,115 @@
+import gzip
+
+from flask import Flask, Response, jsonify, request
+
+from compresion import CompresionRespuestas
+
+
+def crear_app_compresion(tamano_minimo=100):
+    """Aplicación mínima con la compresión instalada y rutas de distintos tipos."""
+    app = Flask(__name__)
+    compresion = CompresionRespuestas(tamano_minimo, nivel_gzip=6, nivel_brotli=4, cache_tamano=8, cache_ttl=60)
+    compresion.instrumentar_aplicacion(app)
+
+    @app.route('/grande')
+    def grande():
+        respuesta = jsonify([{"nombre": f"Producto {numero}"} for numero in range(50)])
+        respuesta.set_etag("v1")
+        if request.if_none_match.contains("v1"):
+            return Response(status=304, headers={"ETag": '"v1"'})
+        return respuesta
+
+    @app.route('/etag-repetido')
+    def etag_repetido():
+        # El ETag no cambia aunque el cuerpo sí: la caché no puede confiar solo en él.
+        version = request.args.get('version', '1')
+        respuesta = jsonify([{"version": version, "numero": numero} for numero in range(50)])
+        respuesta.set_etag("fijo")
+        return respuesta
+
+    @app.route('/chica')
+    def chica():
+        return jsonify({"ok": True})
+
+    @app.route('/binaria')
+    def binaria():
+        return Response(b"\x00" * 1000, mimetype='application/octet-stream')
+
+    @app.route('/stream')
+    def stream():
+        return Response((linea for linea in ["a" * 500, "b" * 500]), mimetype='text/plain')
+
+    return app, compresion
+
+
+def test_comprime_con_gzip_y_agrega_sufijo_al_etag():
+    """Prueba que una respuesta grande se comprime, con Vary y un ETag propio de la codificación."""
+    app, _ = crear_app_compresion()
+    cliente = app.test_client()
+    sin_comprimir = cliente.get('/grande')
+    comprimida = cliente.get('/grande', headers={"Accept-Encoding": "gzip"})
+
+    assert 'Content-Encoding' not in sin_comprimir.headers
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(comprimida.data) == sin_comprimir.data
+    assert int(comprimida.headers['Content-Length']) == len(comprimida.data)
+    assert comprimida.headers['ETag'] == '"v1-gz"'
+    assert 'Accept-Encoding' in comprimida.headers['Vary']
+    assert 'Accept-Encoding' in sin_comprimir.headers['Vary']
+
+def test_reutiliza_el_cuerpo_comprimido_mientras_no_cambie_el_etag():
+    """Prueba que la segunda respuesta con el mismo ETag sale de la caché de cuerpos comprimidos."""
+    app, compresion = crear_app_compresion()
+    cliente = app.test_client()
+    primera = cliente.get('/grande', headers={"Accept-Encoding": "gzip"})
+    segunda = cliente.get('/grande', headers={"Accept-Encoding": "gzip"})
+    assert primera.data == segunda.data
+    assert compresion.cache.estadisticas()["aciertos"] == 1
+    assert compresion.cache.estadisticas()["entradas"] == 1
+
+def test_cuerpo_distinto_con_el_mismo_etag_no_sale_de_la_cache():
+    """Prueba que la caché de cuerpos comprimidos no devuelve otro cuerpo aunque la ruta y el ETag se repitan."""
+    app, compresion = crear_app_compresion()
+    cliente = app.test_client()
+    primera = cliente.get('/etag-repetido?version=1', headers={"Accept-Encoding": "gzip"})
+    segunda = cliente.get('/etag-repetido?version=2', headers={"Accept-Encoding": "gzip"})
+    assert primera.headers['ETag'] == segunda.headers['ETag']
+    assert gzip.decompress(primera.data) == cliente.get('/etag-repetido?version=1').data
+    assert gzip.decompress(segunda.data) == cliente.get('/etag-repetido?version=2').data
+    assert compresion.cache.estadisticas()["aciertos"] == 0
+
+def test_if_none_match_con_sufijo_responde_304():
+    """Prueba que el ETag con sufijo de codificación sirve para peticiones condicionales."""
+    app, _ = crear_app_compresion()
+    respuesta = app.test_client().get('/grande', headers={"Accept-Encoding": "gzip", "If-None-Match": '"v1-gz"'})
+    assert respuesta.status_code == 304
+    assert respuesta.headers['ETag'] == '"v1-gz"'
+
+def test_if_none_match_con_sufijo_de_otra_codificacion_responde_200():
+    """Prueba que solo se quita el sufijo de la codificación negociada para la respuesta."""
+    app, _ = crear_app_compresion()
+    cliente = app.test_client()
+    # Sin Accept-Encoding la representación es la sin comprimir ("v1"), no la "-gz".
+    respuesta = cliente.get('/grande', headers={"If-None-Match": '"v1-gz"'})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] == '"v1"'
+    respuesta = cliente.get('/grande', headers={"Accept-Encoding": "gzip", "If-None-Match": '"v1-br"'})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] == '"v1-gz"'
+
+def test_no_comprime_respuestas_chicas_binarias_ni_en_streaming():
+    """Prueba que se respetan el tamaño mínimo, el tipo de contenido y las respuestas en streaming."""
+    app, _ = crear_app_compresion()
+    cliente = app.test_client()
+    for ruta in ('/chica', '/binaria', '/stream'):
+        respuesta = cliente.get(ruta, headers={"Accept-Encoding": "gzip"})
+        assert 'Content-Encoding' not in respuesta.headers, ruta
+
+def test_sin_codificacion_aceptable_no_comprime():
+    """Prueba que gzip;q=0 o una codificación desconocida dejan la respuesta sin comprimir."""
+    app, _ = crear_app_compresion()
+    cliente = app.test_client()
+    for encabezado in ('gzip;q=0', 'compress', 'identity'):
+        respuesta = cliente.get('/grande', headers={"Accept-Encoding": encabezado})
+        assert 'Content-Encoding' not in respuesta.headers, encabezado
+        assert respuesta.headers['ETag'] == '"v1"'
@@ -0,0 +1,65 @@
+import threading
+
+from sqlalchemy import create_engine, insert, select, update, func
+from sqlalchemy.exc import OperationalError
+
+from config import ProductionConfig
+from models import db, Producto, configurar_pragmas_sqlite
+
+
+def crear_motor(ruta, opciones, pragmas):
+    """Crea un motor SQLite con las opciones y PRAGMA de un perfil, y las tablas de la aplicación."""
+    motor = create_engine(f"sqlite:///{ruta}", **opciones)
+    configurar_pragmas_sqlite(motor, pragmas)
+    db.metadata.create_all(motor)
+    return motor
+
+def ejecutar_carga_mixta(motor, lectores=4, escritores=4, operaciones=100):
+    """
+    Ejecuta lectores y escritores en paralelo sobre la tabla de productos.
+    Devuelve la lista de errores de bloqueo. El rendimiento de cada perfil se
+    compara en benchmarks/bench_concurrencia.py, no en las pruebas.
+    """
+    errores = []
+    productos = Producto.__table__
+
+    def escritor(numero):
+        for i in range(operaciones):
+            try:
+                with motor.begin() as conexion:
+                    producto_id = conexion.execute(
+                        insert(productos).returning(productos.c.id),
+                        {"nombre": f"Escritor {numero} - {i}", "precio": 1.0, "stock": i}
+                    ).scalar_one()
+                    conexion.execute(update(productos).where(productos.c.id == producto_id).values(stock=productos.c.stock + 1))
+            except OperationalError as err:
+                errores.append(str(err))
+
+    def lector():
+        for _ in range(operaciones):
+            try:
+                with motor.connect() as conexion:
+                    conexion.execute(select(func.count()).select_from(productos)).scalar_one()
+                    conexion.execute(select(productos).where(productos.c.stock < 10).limit(20)).all()
+            except OperationalError as err:
+                errores.append(str(err))
+
+    hilos = [threading.Thread(target=escritor, args=(n,)) for n in range(escritores)]
+    hilos += [threading.Thread(target=lector) for _ in range(lectores)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return errores
+
+def test_perfil_produccion_sin_bloqueos(tmp_path):
+    """Con el perfil de producción, lectores y escritores concurrentes no producen 'database is locked'."""
+    motor = crear_motor(tmp_path / "produccion.db", ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS, ProductionConfig.SQLITE_PRAGMAS)
+    with motor.connect() as conexion:
+        assert conexion.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conexion.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+
+    assert ejecutar_carga_mixta(motor) == []
+    with motor.connect() as conexion:
+        assert conexion.execute(select(func.count()).select_from(Producto.__table__)).scalar_one() == 4 * 100
+    motor.dispose()
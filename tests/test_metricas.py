@@ -0,0 +1,41 @@
+from metricas import Contador, Histograma, Medidor, RegistroMetricas
+
+
+def test_contador_y_medidor_con_etiquetas():
+    """Prueba que los contadores y medidores se exponen por combinación de etiquetas."""
+    registro = RegistroMetricas()
+    contador = registro.registrar(Contador('peticiones_total', 'Peticiones.', ('ruta',)))
+    medidor = registro.registrar(Medidor('en_curso', 'En curso.'))
+    contador.incrementar('/a')
+    contador.incrementar('/a')
+    contador.incrementar('/b')
+    medidor.incrementar()
+    medidor.incrementar()
+    medidor.decrementar()
+
+    lineas = registro.exponer().splitlines()
+    assert '# TYPE peticiones_total counter' in lineas
+    assert 'peticiones_total{ruta="/a"} 2' in lineas
+    assert 'peticiones_total{ruta="/b"} 1' in lineas
+    assert '# TYPE en_curso gauge' in lineas
+    assert 'en_curso 1' in lineas
+
+def test_histograma_buckets_acumulativos():
+    """Prueba que los buckets se exponen acumulados, con +Inf, suma y cantidad."""
+    histograma = Histograma('duracion', 'Duración.', ('ruta',), buckets=(0.1, 1))
+    histograma.observar(0.05, '/a')
+    histograma.observar(0.5, '/a')
+    histograma.observar(3, '/a')
+
+    lineas = histograma.exponer()
+    assert 'duracion_bucket{ruta="/a",le="0.1"} 1' in lineas
+    assert 'duracion_bucket{ruta="/a",le="1"} 2' in lineas
+    assert 'duracion_bucket{ruta="/a",le="+Inf"} 3' in lineas
+    assert 'duracion_sum{ruta="/a"} 3.55' in lineas
+    assert 'duracion_count{ruta="/a"} 3' in lineas
+
+def test_etiquetas_escapadas():
+    """Prueba que las comillas y barras en los valores de etiquetas se escapan."""
+    contador = Contador('c', 'C.', ('valor',))
+    contador.incrementar('a"b\\c')
+    assert 'c{valor="a\\"b\\\\c"} 1' in contador.exponer()
@@ -0,0 +1,64 @@
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import app as flask_app, db
+from models import Producto
+from schemas import productos_schema
+from serializacion import COLUMNAS_PRODUCTO, ProveedorJSONRapido, compilar_mapeador, fila_a_producto, proyeccion_productos
+
+
+def test_compilar_mapeador():
+    """Prueba que el mapeador asigna cada posición de la fila a su campo."""
+    mapeador = compilar_mapeador(("a", "b"))
+    assert mapeador((1, "x")) == {"a": 1, "b": "x"}
+    assert mapeador((1, "x", "extra")) == {"a": 1, "b": "x"}
+
+def test_ruta_rapida_igual_a_productos_schema():
+    """La ruta rápida (tuplas + mapeador) produce exactamente lo mismo que productos_schema.dump()."""
+    with flask_app.app_context():
+        db.create_all()
+        Producto.query.delete()
+        db.session.add_all([
+            Producto(nombre="Teclado", descripcion="Con ñ y acentos: óptico", precio=10.5, stock=3),
+            Producto(nombre="Mouse", descripcion=None, precio=7, stock=0),
+        ])
+        db.session.commit()
+
+        esperado = productos_schema.dump(Producto.query.order_by(Producto.id).all())
+        filas = db.session.execute(db.select(*COLUMNAS_PRODUCTO).order_by(Producto.id)).all()
+        obtenido = [fila_a_producto(fila) for fila in filas]
+
+        Producto.query.delete()
+        db.session.commit()
+
+    assert [list(p.items()) for p in obtenido] == [list(p.items()) for p in esperado]
+    assert [type(v) for p in obtenido for v in p.values()] == [type(v) for p in esperado for v in p.values()]
+    assert json.dumps(obtenido) == json.dumps(esperado)
+
+def test_proveedor_json_rapido_mismos_bytes():
+    """El proveedor rápido genera los mismos bytes que el de Flask para datos ASCII, y JSON equivalente para el resto."""
+    rapido = ProveedorJSONRapido(flask_app)
+    por_defecto = DefaultJSONProvider(flask_app)
+    datos = [{"id": 1, "nombre": "Teclado", "descripcion": None, "precio": 10.5, "stock": 3}]
+    assert rapido.dumps(datos, separators=(",", ":")) == por_defecto.dumps(datos, separators=(",", ":"))
+
+    datos_unicode = {"nombre": "Óptico \u2028 😀", "descripcion": "Año \"ñ\"\n"}
+    assert json.loads(rapido.dumps(datos_unicode)) == json.loads(por_defecto.dumps(datos_unicode))
+
+def test_proyeccion_productos_en_cache_y_con_id_para_el_cursor():
+    """Prueba que la proyección se construye una vez por combinación y siempre selecciona el id."""
+    proyeccion = proyeccion_productos(('nombre', 'precio'))
+    assert proyeccion is proyeccion_productos(('nombre', 'precio'))
+    assert proyeccion.campos == ('nombre', 'precio')
+    assert proyeccion.columnas == (Producto.nombre, Producto.precio, Producto.id)
+    assert proyeccion.posicion_id == 2
+    assert proyeccion.mapeador(("Lápiz", 1.5, 7)) == {"nombre": "Lápiz", "precio": 1.5}
+    assert proyeccion_productos(('id', 'stock')).posicion_id == 0
+
+    # Con un orden distinto de id también se selecciona esa columna, para el cursor.
+    ordenada = proyeccion_productos(('nombre',), 'precio')
+    assert ordenada.columnas == (Producto.nombre, Producto.id, Producto.precio)
+    assert (ordenada.posicion_id, ordenada.posicion_orden) == (1, 2)
+    assert ordenada.mapeador(("Lápiz", 7, 1.5)) == {"nombre": "Lápiz"}
+    assert proyeccion_productos(('nombre', 'precio'), 'precio').posicion_orden == 1